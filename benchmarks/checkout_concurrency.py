@@ -0,0 +1,170 @@
+"""Бенчмарк: синхронный и асинхронный endpoint оплаты при медленном Stripe.
+
+Синхронный путь моделирует gunicorn с --workers N: одновременно
+обрабатывается не больше N запросов. Асинхронный путь выполняет все
+запросы в одном процессе и одном event loop, как uvicorn-воркер.
+Stripe заменяется локальным сервером с задержкой --latency.
+
+Запуск из корня проекта (создает и удаляет тестовую БД):
+
+    python benchmarks/checkout_concurrency.py --requests 200 --latency 0.3
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "stripe_payment.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection, connections  # noqa: E402
+from django.test import AsyncClient, Client, override_settings  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from payments.fake_stripe import FakeStripe  # noqa: E402
+from payments.metrics import registry  # noqa: E402
+from payments.models import Item, Order, OrderItem  # noqa: E402
+
+
+def create_orders(count: int) -> list[int]:
+    """Создает заказы с товарами в двух валютах.
+
+    Payment Intent сохраняется в заказе и повторно не создается, поэтому
+    каждая оплата в бенчмарке идет по своему заказу.
+    """
+    items = [
+        Item.objects.create(
+            name=f"Bench item {index}",
+            description="",
+            price=1000 + index,
+            currency=currency,
+        )
+        for index, currency in enumerate(["usd", "eur", "usd"])
+    ]
+    order_ids = []
+    for _ in range(count):
+        order = Order.objects.create(payment_currency="usd")
+        for index, item in enumerate(items):
+            OrderItem.objects.create(order=order, item=item, quantity=index + 1)
+        order_ids.append(order.id)
+    return order_ids
+
+
+def checkout_urls(name: str, order_ids: list[int]) -> list[str]:
+    """Возвращает URL оплаты для каждого заказа."""
+    return [reverse(f"payments:{name}", args=[order_id]) for order_id in order_ids]
+
+
+def summarize(name: str, latencies: list[float], elapsed: float) -> dict:
+    """Считает пропускную способность и перцентили задержки."""
+    ordered = sorted(latencies)
+    return {
+        "path": name,
+        "requests": len(ordered),
+        "elapsed_s": round(elapsed, 2),
+        "rps": round(len(ordered) / elapsed, 1),
+        "p50_ms": round(statistics.median(ordered) * 1000),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1] * 1000),
+    }
+
+
+def run_sync(urls: list[str], workers: int) -> dict:
+    """Выполняет запросы к синхронному endpoint из workers потоков."""
+
+    def checkout(url: str) -> float:
+        started = time.perf_counter()
+        response = Client().get(url)
+        assert response.status_code == 200, response.content
+        connections.close_all()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = list(pool.map(checkout, urls))
+    return summarize(
+        f"sync, {workers} workers", latencies, time.perf_counter() - started
+    )
+
+
+async def run_async(urls: list[str], concurrency: int) -> dict:
+    """Выполняет запросы к асинхронному endpoint в одном event loop."""
+    client = AsyncClient()
+    limit = asyncio.Semaphore(concurrency)
+
+    async def checkout(url: str) -> float:
+        async with limit:
+            started = time.perf_counter()
+            response = await client.get(url)
+            assert response.status_code == 200, response.content
+            return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(checkout(url) for url in urls))
+    return summarize(
+        f"async, 1 process, concurrency {concurrency}",
+        list(latencies),
+        time.perf_counter() - started,
+    )
+
+
+def main() -> None:
+    """Запускает оба сценария и печатает таблицу результатов."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.3, help="секунды")
+    parser.add_argument("--sync-workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    fake_stripe = FakeStripe(latency=args.latency).start()
+    try:
+        order_ids = create_orders(args.requests * 2)
+        sync_urls = checkout_urls(
+            "create_order_checkout_session", order_ids[: args.requests]
+        )
+        async_urls = checkout_urls(
+            "create_order_checkout_session_async", order_ids[args.requests :]
+        )
+        with override_settings(
+            STRIPE_SECRET_KEY="sk_test_benchmark", STRIPE_API_BASE=fake_stripe.url
+        ):
+            results = [
+                run_sync(sync_urls, args.sync_workers),
+                asyncio.run(run_async(async_urls, args.concurrency)),
+            ]
+        counters = registry.snapshot()["counters"]
+    finally:
+        fake_stripe.stop()
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print(f"Stripe latency: {args.latency * 1000:.0f} ms, requests: {args.requests}")
+    header = f"{'path':<40}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'total s':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(
+            f"{row['path']:<40}{row['rps']:>8}{row['p50_ms']:>9}"
+            f"{row['p95_ms']:>9}{row['elapsed_s']:>9}"
+        )
+    print(
+        "Stripe connections: "
+        f"opened {counters.get('stripe.connections_opened', 0)}, "
+        f"reused {counters.get('stripe.connections_reused', 0)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""Нагрузочный бенчмарк воронки покупки.
+
+Каждый покупатель проходит путь сайта со своей сессией: главная →
+добавление товаров в корзину → корзина → смена валюты → оформление
+заказа → страница заказа → создание платежа. Покупатели работают
+параллельно. Для каждого endpoint считаются RPS, перцентили задержки,
+доля ошибок и число запросов к БД. Результат пишется в JSON, чтобы
+сравнивать прогоны между коммитами.
+
+По умолчанию приложение запускается в процессе бенчмарка на отдельной
+тестовой БД, а Stripe заменяется фиктивным API:
+
+    python benchmarks/purchase_funnel.py --shoppers 200 --concurrency 16 \\
+        --output funnel.json --compare baseline.json
+
+С --base-url нагружается запущенный сервер (например, docker-compose
+с STRIPE_API_BASE на run_fake_stripe). Запросы к БД в этом режиме
+не считаются.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "stripe_payment.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+import httpx  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from payments.fake_stripe import FakeStripe, Latency  # noqa: E402
+from payments.models import Item  # noqa: E402
+
+ORDER_URL = re.compile(r"/order/(?P<id>\d+)/$")
+FUNNEL = [
+    "index",
+    "add_to_cart",
+    "view_cart",
+    "change_currency",
+    "checkout_cart",
+    "order_detail",
+    "buy_order",
+]
+
+
+@dataclass(frozen=True)
+class Sample:
+    """Один запрос покупателя."""
+
+    endpoint: str
+    seconds: float
+    ok: bool
+    queries: int | None
+
+
+@dataclass(frozen=True)
+class Response:
+    """Ответ сервера, независимо от способа отправки запроса."""
+
+    status: int
+    location: str
+    body: bytes
+
+
+class InProcessSession:
+    """Сессия покупателя через тестовый клиент Django в этом процессе."""
+
+    def __init__(self) -> None:
+        self._client = Client()
+
+    def get(self, path: str) -> tuple[Response, int]:
+        """Выполняет GET и возвращает ответ и число запросов к БД."""
+        queries = 0
+
+        def count(execute: Callable, sql: str, params: Any, many: bool, context: dict):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            response = self._client.get(path)
+        return (
+            Response(
+                response.status_code, response.get("Location", ""), response.content
+            ),
+            queries,
+        )
+
+    def close(self) -> None:
+        """Закрывает соединение с БД потока покупателя."""
+        connections.close_all()
+
+
+class HTTPSession:
+    """Сессия покупателя через HTTP к запущенному серверу."""
+
+    def __init__(self, base_url: str) -> None:
+        self._client = httpx.Client(base_url=base_url, timeout=30)
+
+    def get(self, path: str) -> tuple[Response, None]:
+        """Выполняет GET; запросы к БД снаружи не видны."""
+        response = self._client.get(path)
+        return (
+            Response(
+                response.status_code,
+                response.headers.get("Location", ""),
+                response.content,
+            ),
+            None,
+        )
+
+    def close(self) -> None:
+        """Закрывает соединения клиента."""
+        self._client.close()
+
+
+def shop(session: Any, item_ids: list[int], rng: random.Random) -> list[Sample]:
+    """Проходит воронку покупки одним покупателем."""
+    samples: list[Sample] = []
+
+    def step(endpoint: str, path: str, expected: int) -> Response | None:
+        started = time.perf_counter()
+        try:
+            response, queries = session.get(path)
+        except httpx.HTTPError:
+            samples.append(Sample(endpoint, time.perf_counter() - started, False, None))
+            return None
+        ok = response.status == expected
+        samples.append(Sample(endpoint, time.perf_counter() - started, ok, queries))
+        return response if ok else None
+
+    try:
+        if step("index", "/", 200) is None:
+            return samples
+        for item_id in rng.sample(item_ids, rng.randint(1, min(3, len(item_ids)))):
+            step("add_to_cart", f"/cart/add/{item_id}/", 302)
+        step("view_cart", "/cart/", 200)
+        step("change_currency", f"/cart/currency/{rng.choice(['usd', 'eur'])}/", 302)
+
+        checkout = step("checkout_cart", "/cart/checkout/", 302)
+        match = ORDER_URL.search(checkout.location) if checkout else None
+        if match is None:
+            return samples
+        order_id = match["id"]
+        step("order_detail", f"/order/{order_id}/", 200)
+        payment = step("buy_order", f"/buy-order/{order_id}/", 200)
+        if payment is not None and "clientSecret" not in json.loads(payment.body):
+            samples[-1] = Sample("buy_order", samples[-1].seconds, False, None)
+    finally:
+        session.close()
+    return samples
+
+
+def run_shoppers(
+    make_session: Callable[[], Any],
+    item_ids: list[int],
+    shoppers: int,
+    concurrency: int,
+    seed: int,
+) -> tuple[list[Sample], float]:
+    """Запускает покупателей параллельно и собирает запросы."""
+    seeds = random.Random(seed)
+    rngs = [random.Random(seeds.random()) for _ in range(shoppers)]
+
+    def one(rng: random.Random) -> list[Sample]:
+        return shop(make_session(), item_ids, rng)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, rngs))
+    elapsed = time.perf_counter() - started
+    return [sample for result in results for sample in result], elapsed
+
+
+def percentile(ordered: list[float], percent: float) -> float:
+    """Перцентиль по методу ближайшего ранга."""
+    rank = max(1, math.ceil(len(ordered) * percent / 100))
+    return ordered[rank - 1]
+
+
+def summarize(samples: list[Sample], elapsed: float) -> dict[str, dict]:
+    """Статистика по endpoint и по всем запросам."""
+    groups: dict[str, list[Sample]] = defaultdict(list)
+    for sample in samples:
+        groups[sample.endpoint].append(sample)
+    groups["total"] = samples
+
+    report = {}
+    for endpoint in [*FUNNEL, "total"]:
+        group = groups.get(endpoint)
+        if not group:
+            continue
+        latencies = sorted(sample.seconds * 1000 for sample in group)
+        queries = [sample.queries for sample in group if sample.queries is not None]
+        errors = sum(not sample.ok for sample in group)
+        report[endpoint] = {
+            "requests": len(group),
+            "errors": errors,
+            "error_rate": round(errors / len(group), 4),
+            "rps": round(len(group) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p90_ms": round(percentile(latencies, 90), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+            "max_ms": round(latencies[-1], 1),
+            "queries_avg": round(sum(queries) / len(queries), 2) if queries else None,
+            "queries_max": max(queries) if queries else None,
+        }
+    return report
+
+
+def git_commit() -> str | None:
+    """Текущий коммит репозитория, если он доступен."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: dict[str, dict], baseline: dict | None) -> None:
+    """Печатает таблицу результатов и изменения относительно baseline."""
+    header = (
+        f"{'endpoint':<16}{'req':>6}{'err %':>7}{'rps':>8}{'p50 ms':>9}"
+        f"{'p99 ms':>9}{'queries':>9}"
+    )
+    if baseline:
+        header += f"{'Δp50':>9}{'Δp99':>9}{'Δqueries':>10}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, row in report.items():
+        queries = "-" if row["queries_avg"] is None else row["queries_avg"]
+        line = (
+            f"{endpoint:<16}{row['requests']:>6}{row['error_rate'] * 100:>7.1f}"
+            f"{row['rps']:>8}{row['p50_ms']:>9}{row['p99_ms']:>9}{queries:>9}"
+        )
+        before = (baseline or {}).get(endpoint)
+        if before:
+            line += (
+                f"{_change(before['p50_ms'], row['p50_ms']):>9}"
+                f"{_change(before['p99_ms'], row['p99_ms']):>9}"
+                f"{_delta(before['queries_avg'], row['queries_avg']):>10}"
+            )
+        print(line)
+
+
+def _change(before: float, after: float) -> str:
+    """Относительное изменение в процентах."""
+    if not before:
+        return "-"
+    return f"{(after - before) / before * 100:+.0f}%"
+
+
+def _delta(before: float | None, after: float | None) -> str:
+    """Абсолютное изменение числа запросов."""
+    if before is None or after is None:
+        return "-"
+    return f"{after - before:+.2f}"
+
+
+def seed_catalog(count: int) -> list[int]:
+    """Создает товары в двух валютах."""
+    return [
+        Item.objects.create(
+            name=f"Funnel item {index}",
+            description="",
+            price=500 + index * 10,
+            currency="usd" if index % 2 else "eur",
+        ).id
+        for index in range(count)
+    ]
+
+
+def remote_item_ids(base_url: str) -> list[int]:
+    """ID товаров запущенного сервера из API каталога."""
+    response = httpx.get(
+        f"{base_url}/api/items/", params={"format": "json", "fields": "id"}
+    )
+    response.raise_for_status()
+    return [row["id"] for row in response.json()]
+
+
+def main() -> None:
+    """Запускает воронку, печатает таблицу и сохраняет JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shoppers", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument(
+        "--stripe-latency", default="lognormal:0.1:0.5", help="см. run_fake_stripe"
+    )
+    parser.add_argument("--stripe-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--base-url", help="URL запущенного сервера")
+    parser.add_argument("--output", type=Path, help="файл для результатов JSON")
+    parser.add_argument("--compare", type=Path, help="JSON предыдущего прогона")
+    args = parser.parse_args()
+
+    if args.base_url:
+        base_url = args.base_url.rstrip("/")
+        item_ids = remote_item_ids(base_url)
+        samples, elapsed = run_shoppers(
+            lambda: HTTPSession(base_url),
+            item_ids,
+            args.shoppers,
+            args.concurrency,
+            args.seed,
+        )
+        database = None
+    else:
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0)
+        fake_stripe = FakeStripe(
+            latency=Latency.parse(args.stripe_latency),
+            error_rate=args.stripe_error_rate,
+            seed=args.seed,
+        ).start()
+        try:
+            item_ids = seed_catalog(args.items)
+            connections.close_all()
+            with override_settings(
+                STRIPE_SECRET_KEY="sk_test_benchmark",
+                STRIPE_API_BASE=fake_stripe.url,
+            ):
+                samples, elapsed = run_shoppers(
+                    InProcessSession,
+                    item_ids,
+                    args.shoppers,
+                    args.concurrency,
+                    args.seed,
+                )
+            database = connection.vendor
+        finally:
+            fake_stripe.stop()
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    report = summarize(samples, elapsed)
+    baseline = None
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())["endpoints"]
+    print(
+        f"{args.shoppers} shoppers, concurrency {args.concurrency}, "
+        f"{elapsed:.2f} s, target {args.base_url or 'in-process'}"
+    )
+    print_report(report, baseline)
+
+    if args.output:
+        result = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.now(UTC).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "target": args.base_url or "in-process",
+                "database": database,
+                "elapsed_s": round(elapsed, 2),
+                "params": {
+                    key: str(value) if isinstance(value, Path) else value
+                    for key, value in vars(args).items()
+                },
+            },
+            "endpoints": report,
+        }
+        args.output.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
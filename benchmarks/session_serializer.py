@@ -0,0 +1,87 @@
+"""Бенчмарк: размер и скорость сериализации сессий с корзиной.
+
+Сравнивает стандартный JSONSerializer Django с CompactSessionSerializer
+на сессиях с корзиной разного размера: размер строки session_data
+(после подписи и сжатия, как в таблице django_session) и время
+кодирования и декодирования одной сессии.
+
+Запуск из корня проекта (БД не нужна):
+
+    python benchmarks/session_serializer.py --lines 0 1 10 100
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "stripe_payment.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core import signing  # noqa: E402
+
+from payments.sessions import CompactSessionSerializer  # noqa: E402
+
+SERIALIZERS = {
+    "json": signing.JSONSerializer,
+    "compact": CompactSessionSerializer,
+}
+
+
+def make_session(lines: int) -> dict:
+    """Сессия вошедшего покупателя с корзиной из lines строк."""
+    return {
+        "_auth_user_id": "42",
+        "_auth_user_backend": "django.contrib.auth.backends.ModelBackend",
+        "_auth_user_hash": "0" * 64,
+        "payment_currency": "eur",
+        "pending_order_id": 1234,
+        "cart": {str(1000 + i): {"quantity": i % 3 + 1} for i in range(lines)},
+    }
+
+
+def measure(serializer: type, session: dict, number: int) -> dict:
+    """Размер session_data и время кодирования/декодирования в микросекундах."""
+    encoded = serializer().dumps(session)
+    assert serializer().loads(encoded) == session
+    stored = signing.dumps(session, serializer=serializer, compress=True)
+    encode = timeit.timeit(lambda: serializer().dumps(session), number=number)
+    decode = timeit.timeit(lambda: serializer().loads(encoded), number=number)
+    return {
+        "raw_bytes": len(encoded),
+        "stored_bytes": len(stored),
+        "encode_us": encode / number * 1e6,
+        "decode_us": decode / number * 1e6,
+    }
+
+
+def main() -> None:
+    """Печатает таблицу сравнения сериализаторов."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, nargs="+", default=[0, 1, 10, 100])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(
+        f"{'lines':>5} {'serializer':<10} {'raw B':>7} {'stored B':>9} "
+        f"{'encode us':>10} {'decode us':>10}"
+    )
+    print("-" * 56)
+    for lines in args.lines:
+        session = make_session(lines)
+        for name, serializer in SERIALIZERS.items():
+            result = measure(serializer, session, args.number)
+            print(
+                f"{lines:>5} {name:<10} {result['raw_bytes']:>7} "
+                f"{result['stored_bytes']:>9} {result['encode_us']:>10.1f} "
+                f"{result['decode_us']:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
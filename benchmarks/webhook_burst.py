@@ -0,0 +1,153 @@
+"""Бенчмарк: всплеск webhook-событий Stripe и разбор входящей очереди.
+
+Отправляет подписанные события на /stripe/webhook/ из нескольких потоков
+(часть событий доставляется повторно, как при ретраях Stripe), измеряет
+время ответа endpoint, затем время разбора очереди drain_inbox.
+
+Запуск из корня проекта (создает и удаляет тестовую БД):
+
+    python benchmarks/webhook_burst.py --events 2000 --duplicates 0.2
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "stripe_payment.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection, connections  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from payments.models import Order, StripeEvent  # noqa: E402
+from payments.webhooks import drain_inbox  # noqa: E402
+
+SECRET = "whsec_benchmark"
+EVENT_TYPES = ["payment_intent.succeeded", "payment_intent.payment_failed"]
+
+
+def create_orders(count: int) -> list[Order]:
+    """Создает заказы с сохраненным Payment Intent."""
+    Order.objects.bulk_create(
+        Order(payment_currency="usd", payment_intent_id=f"pi_bench_{index}")
+        for index in range(count)
+    )
+    return list(Order.objects.order_by("id"))
+
+
+def signed_payloads(
+    orders: list[Order], events: int, duplicates: float
+) -> list[tuple[bytes, str]]:
+    """Подписанные события; доля duplicates доставляется повторно."""
+    created = int(time.time())
+    payloads = []
+    for index in range(events):
+        order = orders[index % len(orders)]
+        body = json.dumps(
+            {
+                "id": f"evt_bench_{index}",
+                "object": "event",
+                "type": random.choice(EVENT_TYPES),
+                "created": created,
+                "data": {
+                    "object": {
+                        "id": order.payment_intent_id,
+                        "metadata": {"order_id": str(order.id)},
+                    }
+                },
+            }
+        ).encode()
+        signed = f"{created}.".encode() + body
+        digest = hmac.new(SECRET.encode(), signed, hashlib.sha256).hexdigest()
+        payloads.append((body, f"t={created},v1={digest}"))
+    payloads += random.sample(payloads, int(events * duplicates))
+    random.shuffle(payloads)
+    return payloads
+
+
+def deliver(payloads: list[tuple[bytes, str]], workers: int) -> dict:
+    """Отправляет события на endpoint и возвращает статистику ответов."""
+    url = reverse("payments:stripe_webhook")
+
+    def post(payload: tuple[bytes, str]) -> float:
+        body, signature = payload
+        started = time.perf_counter()
+        response = Client().post(
+            url, body, content_type="application/json", HTTP_STRIPE_SIGNATURE=signature
+        )
+        assert response.status_code == 200, response.content
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = sorted(pool.map(post, payloads))
+    elapsed = time.perf_counter() - started
+    connections.close_all()
+    return {
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 2),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1),
+    }
+
+
+def main() -> None:
+    """Запускает прием и разбор очереди и печатает результаты."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--duplicates", type=float, default=0.2, help="доля")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        with override_settings(STRIPE_WEBHOOK_SECRET=SECRET):
+            payloads = signed_payloads(
+                create_orders(args.orders), args.events, args.duplicates
+            )
+            ack = deliver(payloads, args.workers)
+            stored = StripeEvent.objects.count()
+
+            started = time.perf_counter()
+            result = drain_inbox(args.batch_size)
+            drain_s = time.perf_counter() - started
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print(
+        f"Delivered {ack['requests']} requests ({args.events} events, "
+        f"{ack['requests'] - args.events} duplicates), {args.workers} workers"
+    )
+    print(
+        f"ack: {ack['rps']} rps, p50 {ack['p50_ms']} ms, p99 {ack['p99_ms']} ms, "
+        f"total {ack['elapsed_s']} s"
+    )
+    print(f"inbox: {stored} events stored")
+    print(
+        f"drain: {result.processed} processed, {result.failed} failed "
+        f"in {drain_s:.2f} s ({result.processed / drain_s:.0f} events/s, "
+        f"batch {args.batch_size})"
+    )
+
+
+if __name__ == "__main__":
+    main()
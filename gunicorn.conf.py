@@ -0,0 +1,61 @@
+"""Настройки gunicorn: подготовка воркера после загрузки приложения."""
+
+import logging
+import os
+
+logger = logging.getLogger("gunicorn.error")
+
+# Кеши, которые живут в памяти одного процесса: с ними версия каталога,
+# страницы витрины и корзины не видны остальным воркерам
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def on_starting(server):
+    """Не дает запустить несколько воркеров с кешем в памяти процесса."""
+    if server.cfg.workers <= 1:
+        return
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "stripe_payment.settings")
+    from django.conf import settings
+
+    aliases = {"default", settings.CART_CACHE_ALIAS}
+    for alias in sorted(aliases):
+        backend = settings.CACHES.get(alias, {}).get("BACKEND")
+        if backend in PROCESS_LOCAL_CACHES:
+            raise RuntimeError(
+                f"Кеш {alias!r} ({backend}) не общий для {server.cfg.workers} "
+                "воркеров: укажите CACHE_BACKEND (например, RedisCache) "
+                "или запустите один воркер"
+            )
+
+
+def post_worker_init(worker):  # noqa: ARG001
+    """Готовит воркер до первого запроса.
+
+    Открывает пул соединений с Postgres, загружает индекс каталога
+    и создает HTTP-клиент Stripe с пулом соединений: пулы создаются
+    после fork, поэтому соединения не разделяются между воркерами.
+    """
+    from django.db import DatabaseError
+
+    from payments.catalog import get_catalog_index
+    from payments.db_pool import warm_up_pools
+    from payments.stripe_client import get_stripe_client
+
+    warm_up_pools()
+    try:
+        get_catalog_index().load()
+    except DatabaseError:
+        logger.exception("Не удалось загрузить индекс каталога")
+    get_stripe_client()
+
+
+def worker_exit(server, worker):  # noqa: ARG001
+    """Закрывает соединения с Stripe и Postgres при остановке воркера."""
+    from payments.db_pool import close_pools
+    from payments.stripe_client import close_stripe_client
+
+    close_stripe_client()
+    close_pools()
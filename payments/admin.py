@@ -1,6 +1,22 @@
-from django.contrib import admin
-
-from .models import Discount, Item, Order, OrderItem, Tax
+from typing import Any
+
+from django.contrib import admin, messages
+from django.db.models import ForeignKey, QuerySet
+from django.forms import ModelChoiceField
+from django.http import HttpRequest
+
+from .models import (
+    Discount,
+    ExchangeRate,
+    Item,
+    Order,
+    OrderItem,
+    StripeCoupon,
+    StripeEvent,
+    Tax,
+)
+from .pricing import format_amount
+from .webhooks import replay_events
 
 
 @admin.register(Item)
@@ -10,6 +26,7 @@ class ItemAdmin(admin.ModelAdmin):
     list_display = ("name", "price_display", "currency", "description")
     search_fields = ("name", "description")
     list_filter = ("currency", "price")
+    readonly_fields = ("price_usd", "price_eur", "price_rate_version")
 
     def price_display(self, obj: Item) -> str:
         """Отображает цену с валютой."""
@@ -34,6 +51,67 @@ class TaxAdmin(admin.ModelAdmin):
     search_fields = ("percent",)
 
 
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    """Админ-панель для управления курсами валют."""
+
+    list_display = ("base_currency", "quote_currency", "rate", "effective_from")
+    list_filter = ("base_currency", "quote_currency")
+    date_hierarchy = "effective_from"
+
+
+@admin.register(StripeCoupon)
+class StripeCouponAdmin(admin.ModelAdmin):
+    """Админ-панель реестра купонов Stripe (купоны создаются автоматически)."""
+
+    list_display = ("coupon_id", "percent", "duration", "name", "created_at")
+    list_filter = ("duration",)
+    search_fields = ("coupon_id", "name")
+    readonly_fields = ("percent", "duration", "coupon_id", "created_at")
+
+    def has_add_permission(self, request: HttpRequest) -> bool:  # noqa: ARG002
+        """Купоны создаются через Stripe, а не вручную."""
+        return False
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    """Админ-панель входящей очереди webhook-событий Stripe."""
+
+    list_display = (
+        "event_id",
+        "type",
+        "received_at",
+        "processed_at",
+        "attempts",
+        "last_error",
+    )
+    list_filter = ("type", ("processed_at", admin.EmptyFieldListFilter))
+    search_fields = ("event_id",)
+    readonly_fields = (
+        "event_id",
+        "type",
+        "payload",
+        "received_at",
+        "processed_at",
+        "attempts",
+        "last_error",
+    )
+    actions = ("replay",)
+
+    def has_add_permission(self, request: HttpRequest) -> bool:  # noqa: ARG002
+        """События поступают только от Stripe."""
+        return False
+
+    @admin.action(description="Обработать повторно")
+    def replay(self, request: HttpRequest, queryset: QuerySet[StripeEvent]) -> None:
+        """Возвращает выбранные события в очередь."""
+        count = replay_events(queryset)
+        self.message_user(
+            request, f"Возвращено в очередь событий: {count}", messages.SUCCESS
+        )
+
+
 class OrderItemInline(admin.TabularInline):
     """Inline для управления товарами в заказе."""
 
@@ -41,6 +119,19 @@ class OrderItemInline(admin.TabularInline):
     extra = 1
     fields = ("item", "quantity")
 
+    def formfield_for_foreignkey(
+        self, db_field: ForeignKey, request: HttpRequest, **kwargs: Any
+    ) -> ModelChoiceField | None:
+        """Загружает список товаров один раз для всех строк заказа.
+
+        Без этого каждая строка inline заново выполняет запрос
+        к товарам при отрисовке своего выпадающего списка.
+        """
+        formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == "item" and formfield is not None:
+            formfield.choices = list(formfield.choices)
+        return formfield
+
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
@@ -49,26 +140,49 @@ class OrderAdmin(admin.ModelAdmin):
     list_display = (
         "id",
         "created_at",
+        "status",
+        "paid_at",
         "get_items_count",
         "total_price_display",
         "discount",
         "tax",
+        "rate_version",
     )
-    list_filter = ("created_at", "discount", "tax")
+    list_filter = ("status", "created_at", "discount", "tax")
     inlines = [OrderItemInline]
-    readonly_fields = ("created_at",)
+    readonly_fields = (
+        "created_at",
+        "status",
+        "paid_at",
+        "subtotal",
+        "discount_amount",
+        "tax_amount",
+        "total",
+        "rate_version",
+        "payment_intent_id",
+        "payment_intent_amount",
+        "payment_intent_currency",
+    )
+    exclude = ("payment_intent_client_secret",)
+
+    def get_queryset(self, request: HttpRequest) -> QuerySet[Order]:
+        """Загружает скидки, налоги и строки заказов без N+1 запросов."""
+        return (
+            super()
+            .get_queryset(request)
+            .select_related("discount", "tax")
+            .prefetch_related("order_items__item")
+        )
 
     def get_items_count(self, obj: Order) -> int:
         """Возвращает количество товаров в заказе."""
-        return sum(oi.quantity for oi in obj.order_items.all())
+        return sum(order_item.quantity for order_item in obj.order_items.all())
 
     get_items_count.short_description = "Товаров"
 
     def total_price_display(self, obj: Order) -> str:
-        """Отображает общую стоимость заказа."""
-        total = obj.get_total_price()
-        currency = obj.get_currency()
-        symbol = "$" if currency == "usd" else "€"
-        return f"{symbol}{total / 100:.2f}"
+        """Отображает сохраненную общую стоимость заказа."""
+        return format_amount(obj.total, obj.payment_currency)
 
     total_price_display.short_description = "Итого"
+    total_price_display.admin_order_field = "total"
@@ -4,3 +4,20 @@ from django.apps import AppConfig
 class PaymentsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "payments"
+
+    def ready(self) -> None:
+        """Подключает обработчики сигналов приложения.
+
+        Кеши процесса регистрируют обработчики setting_changed рядом
+        со своими функциями reset_*, поэтому их модули импортируются здесь.
+        """
+        from . import (  # noqa: F401
+            cart_store,
+            catalog,
+            db_router,
+            rates,
+            signals,
+            storefront,
+            stripe_calls,
+            stripe_client,
+        )
@@ -0,0 +1,103 @@
+"""Корзина: загрузка товаров, выбор валюты и оформление заказа."""
+
+from typing import Any
+
+from django.db import transaction
+from django.http import HttpRequest
+
+from .cart_store import CART_SESSION_KEY, get_cart_store  # noqa: F401
+from .models import Item, Order, OrderItem
+from .pricing import price_cart
+
+DEFAULT_CURRENCY = "usd"
+
+
+def _parse_item_id(item_id: str) -> int | None:
+    """Возвращает ID товара из ключа корзины или None для битого ключа."""
+    try:
+        return int(item_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_quantity(quantity: Any) -> int | None:
+    """Возвращает количество из строки корзины или None, если оно некорректно."""
+    if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity < 1:
+        return None
+    return quantity
+
+
+def load_cart(request: HttpRequest) -> tuple[list[tuple[Item, int]], list[str]]:
+    """Загружает товары корзины одним запросом.
+
+    Возвращает пары (товар, количество) в порядке корзины и ключи
+    удаленных строк. Товары, удаленные из каталога после добавления
+    в корзину, и строки с некорректным количеством убираются из корзины.
+    """
+    store = get_cart_store()
+    cart = store.lines(request)
+    if not cart:
+        return [], []
+
+    ids = {item_id: _parse_item_id(item_id) for item_id in cart}
+    items = Item.objects.in_bulk([pk for pk in ids.values() if pk is not None])
+
+    entries = []
+    removed = []
+    for item_id, data in cart.items():
+        item = items.get(ids[item_id])
+        quantity = _parse_quantity(data)
+        if item is None or quantity is None:
+            removed.append(item_id)
+        else:
+            entries.append((item, quantity))
+
+    if removed:
+        store.remove(request, *removed)
+
+    return entries, removed
+
+
+def get_cart_currency(request: HttpRequest, entries: list[tuple[Item, int]]) -> str:
+    """Возвращает валюту корзины: выбранную или валюту первого товара."""
+    selected = request.session.get("payment_currency")
+    if selected:
+        return selected
+    if entries:
+        return entries[0][0].currency
+    return DEFAULT_CURRENCY
+
+
+def merge_entries(entries: list[tuple[Item, int]]) -> list[tuple[Item, int]]:
+    """Объединяет позиции с одним товаром, сохраняя порядок первых вхождений."""
+    items: dict[int, Item] = {}
+    quantities: dict[int, int] = {}
+    for item, quantity in entries:
+        items.setdefault(item.pk, item)
+        quantities[item.pk] = quantities.get(item.pk, 0) + quantity
+    return [(items[pk], quantity) for pk, quantity in quantities.items()]
+
+
+@transaction.atomic
+def create_order(entries: list[tuple[Item, int]], payment_currency: str) -> Order:
+    """Создает заказ с позициями корзины в одной транзакции.
+
+    Позиции вставляются одним bulk_create, а итоги рассчитываются
+    заранее по тем же правилам, что и корзина, поэтому количество
+    запросов не зависит от размера корзины. Повторы одного товара
+    объединяются в одну строку с суммарным количеством: строка заказа
+    уникальна по (order, item).
+    """
+    entries = merge_entries(entries)
+    pricing = price_cart(entries, payment_currency)
+    order = Order.objects.create(
+        payment_currency=payment_currency,
+        subtotal=pricing.total,
+        total=pricing.total,
+        rate_version=pricing.rate_version,
+    )
+    OrderItem.objects.bulk_create(
+        OrderItem(order=order, item=item, quantity=quantity)
+        for item, quantity in entries
+    )
+    return order
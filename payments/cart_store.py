@@ -0,0 +1,440 @@
+"""Хранилища строк корзины: сессия, общий кеш или таблица CartLine.
+
+Хранилище выбирается настройкой CART_STORE. Корзины в кеше и в БД
+определяются по cookie CART_COOKIE_NAME, которую выставляет
+CartCookieMiddleware, поэтому изменение корзины не записывает сессию.
+"""
+
+import re
+import secrets
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import IntegrityError, transaction
+from django.db.models import F, QuerySet
+from django.dispatch import receiver
+from django.http import HttpRequest
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import CartLine
+
+CART_SESSION_KEY = "cart"
+
+CART_KEY_PREFIX = "payments:cart"
+
+# Блокировка списка товаров корзины в кеше: через сколько секунд она
+# истекает, если держатель завис, сколько секунд ее ждут (дольше срока
+# жизни, чтобы дождаться истечения брошенной блокировки) и как часто
+# ждущие проверяют ключ
+CART_LOCK_TIMEOUT = 5
+CART_LOCK_WAIT = 2 * CART_LOCK_TIMEOUT
+CART_LOCK_POLL_INTERVAL = 0.01
+
+
+class CartLocked(Exception):
+    """Блокировку корзины не удалось получить за CART_LOCK_WAIT секунд."""
+
+
+_CART_ID_RE = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+def get_cart_id(request: HttpRequest, create: bool = False) -> str | None:
+    """Возвращает ID корзины из cookie, при create=True выдает новый."""
+    cart_id = getattr(request, "cart_id", None)
+    if cart_id is not None:
+        return cart_id
+    cookie = request.COOKIES.get(settings.CART_COOKIE_NAME, "")
+    if _CART_ID_RE.match(cookie):
+        request.cart_id = cookie
+    elif create:
+        request.cart_id = secrets.token_urlsafe(24)
+    return getattr(request, "cart_id", None)
+
+
+def _mark_modified(request: HttpRequest) -> None:
+    """Отмечает, что cookie корзины нужно выставить или продлить."""
+    request.cart_modified = True
+
+
+class CartStore:
+    """Базовый класс хранилища корзины.
+
+    Строки корзины — количества по ID товара в порядке добавления.
+    Ключи lines() — строки, а количество возвращается в том виде,
+    в каком сохранено: проверяет его load_cart.
+    """
+
+    def lines(self, request: HttpRequest) -> dict[str, Any]:
+        """Возвращает строки корзины {ID товара: количество}."""
+        raise NotImplementedError
+
+    def count(self, request: HttpRequest) -> int:
+        """Возвращает число строк корзины."""
+        return len(self.lines(request))
+
+    def add(self, request: HttpRequest, item_id: int) -> None:
+        """Увеличивает количество товара на 1 или добавляет строку."""
+        raise NotImplementedError
+
+    def change(self, request: HttpRequest, item_id: int, delta: int) -> None:
+        """Меняет количество товара, уже лежащего в корзине.
+
+        Строка с количеством 0 и меньше удаляется.
+        """
+        raise NotImplementedError
+
+    def remove(self, request: HttpRequest, *item_ids: int | str) -> None:
+        """Удаляет строки товаров из корзины."""
+        raise NotImplementedError
+
+    def replace(self, request: HttpRequest, lines: dict[int, int]) -> None:
+        """Заменяет содержимое корзины."""
+        raise NotImplementedError
+
+    def clear(self, request: HttpRequest) -> None:
+        """Очищает корзину."""
+        raise NotImplementedError
+
+
+class SessionCartStore(CartStore):
+    """Корзина в сессии: {"ID товара": {"quantity": количество}}.
+
+    Любое изменение переписывает сессию целиком; хранилище по умолчанию,
+    совместимое с уже сохраненными корзинами.
+    """
+
+    def _cart(self, request: HttpRequest) -> dict[str, Any]:
+        return request.session.get(CART_SESSION_KEY, {})
+
+    def lines(self, request: HttpRequest) -> dict[str, Any]:
+        """Возвращает строки корзины из сессии."""
+        return {
+            key: data.get("quantity") if isinstance(data, dict) else None
+            for key, data in self._cart(request).items()
+        }
+
+    def count(self, request: HttpRequest) -> int:
+        """Возвращает число строк корзины."""
+        return len(self._cart(request))
+
+    def add(self, request: HttpRequest, item_id: int) -> None:
+        """Увеличивает количество товара в сессии."""
+        cart = self._cart(request)
+        line = cart.setdefault(str(item_id), {"quantity": 0})
+        line["quantity"] += 1
+        request.session[CART_SESSION_KEY] = cart
+
+    def change(self, request: HttpRequest, item_id: int, delta: int) -> None:
+        """Меняет количество товара в сессии."""
+        cart = self._cart(request)
+        line = cart.get(str(item_id))
+        if line is None:
+            return
+        line["quantity"] += delta
+        if line["quantity"] <= 0:
+            del cart[str(item_id)]
+        request.session[CART_SESSION_KEY] = cart
+
+    def remove(self, request: HttpRequest, *item_ids: int | str) -> None:
+        """Удаляет строки из сессии."""
+        cart = self._cart(request)
+        keys = [str(item_id) for item_id in item_ids if str(item_id) in cart]
+        if not keys:
+            return
+        for key in keys:
+            del cart[key]
+        request.session[CART_SESSION_KEY] = cart
+
+    def replace(self, request: HttpRequest, lines: dict[int, int]) -> None:
+        """Записывает новую корзину в сессию."""
+        request.session[CART_SESSION_KEY] = {
+            str(item_id): {"quantity": quantity} for item_id, quantity in lines.items()
+        }
+
+    def clear(self, request: HttpRequest) -> None:
+        """Удаляет корзину из сессии."""
+        request.session.pop(CART_SESSION_KEY, None)
+
+
+class CacheCartStore(CartStore):
+    """Корзина в кеше Django: ключ на каждую строку и список ID товаров.
+
+    Количество меняется атомарными incr/decr бэкенда, а список товаров
+    переписывается, только когда строка появляется или удаляется, под
+    блокировкой корзины в том же кеше: иначе два параллельных добавления
+    разных товаров теряют одну строку. Для одного процесса подходит
+    LocMemCache, для нескольких воркеров и серверов нужен общий бэкенд
+    (RedisCache, PyMemcacheCache) в CART_CACHE_ALIAS.
+    """
+
+    def __init__(self, alias: str | None = None, timeout: int | None = None) -> None:
+        self.cache = caches[alias or settings.CART_CACHE_ALIAS]
+        self.timeout = settings.CART_TTL if timeout is None else timeout
+
+    def _index_key(self, cart_id: str) -> str:
+        return f"{CART_KEY_PREFIX}:{cart_id}"
+
+    def _line_key(self, cart_id: str, item_id: int | str) -> str:
+        return f"{CART_KEY_PREFIX}:{cart_id}:{item_id}"
+
+    def _lock_key(self, cart_id: str) -> str:
+        return f"{CART_KEY_PREFIX}:{cart_id}:lock"
+
+    @contextmanager
+    def _locked(self, cart_id: str) -> Iterator[None]:
+        """Держит блокировку списка товаров корзины на время изменения.
+
+        Блокировка берется атомарным cache.add. Блокировку зависшего
+        воркера освобождает истечение ключа через CART_LOCK_TIMEOUT секунд.
+        Если за CART_LOCK_WAIT секунд получить ее так и не удалось,
+        выбрасывается CartLocked: изменение без блокировки могло бы
+        потерять строку.
+        """
+        key = self._lock_key(cart_id)
+        token = secrets.token_hex(8)
+        deadline = time.monotonic() + CART_LOCK_WAIT
+        while not self.cache.add(key, token, CART_LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                raise CartLocked(f"Корзина {cart_id} занята другим запросом")
+            time.sleep(CART_LOCK_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            if self.cache.get(key) == token:
+                self.cache.delete(key)
+
+    def _item_ids(self, cart_id: str) -> list[int]:
+        return self.cache.get(self._index_key(cart_id)) or []
+
+    def _set_item_ids(self, cart_id: str, item_ids: list[int]) -> None:
+        if item_ids:
+            self.cache.set(self._index_key(cart_id), item_ids, self.timeout)
+        else:
+            self.cache.delete(self._index_key(cart_id))
+
+    def lines(self, request: HttpRequest) -> dict[str, Any]:
+        """Читает корзину двумя запросами к кешу.
+
+        Строка, истекшая раньше списка товаров, возвращается
+        с количеством None, и load_cart удаляет ее из списка.
+        """
+        cart_id = get_cart_id(request)
+        item_ids = self._item_ids(cart_id) if cart_id else []
+        if not item_ids:
+            return {}
+        keys = {item_id: self._line_key(cart_id, item_id) for item_id in item_ids}
+        quantities = self.cache.get_many(keys.values())
+        return {str(item_id): quantities.get(key) for item_id, key in keys.items()}
+
+    def count(self, request: HttpRequest) -> int:
+        """Возвращает число строк по списку товаров."""
+        cart_id = get_cart_id(request)
+        return len(self._item_ids(cart_id)) if cart_id else 0
+
+    def add(self, request: HttpRequest, item_id: int) -> None:
+        """Атомарно увеличивает строку или создает ее вместе с записью в списке."""
+        cart_id = get_cart_id(request, create=True)
+        key = self._line_key(cart_id, item_id)
+        if self.cache.add(key, 1, self.timeout):
+            try:
+                with self._locked(cart_id):
+                    item_ids = self._item_ids(cart_id)
+                    if item_id not in item_ids:
+                        self._set_item_ids(cart_id, [*item_ids, item_id])
+            except CartLocked:
+                # Строка вне списка товаров потерялась бы для всех добавлений
+                self.cache.delete(key)
+                raise
+        else:
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                # Строка истекла между add и incr
+                self.cache.set(key, 1, self.timeout)
+            self.cache.touch(key, self.timeout)
+            self.cache.touch(self._index_key(cart_id), self.timeout)
+        _mark_modified(request)
+
+    def change(self, request: HttpRequest, item_id: int, delta: int) -> None:
+        """Атомарно меняет количество существующей строки."""
+        cart_id = get_cart_id(request)
+        if cart_id is None:
+            return
+        try:
+            quantity = self.cache.incr(self._line_key(cart_id, item_id), delta)
+        except ValueError:
+            return
+        if quantity <= 0:
+            self.remove(request, item_id)
+        _mark_modified(request)
+
+    def remove(self, request: HttpRequest, *item_ids: int | str) -> None:
+        """Удаляет ключи строк и убирает товары из списка."""
+        cart_id = get_cart_id(request)
+        if cart_id is None or not item_ids:
+            return
+        removed = {int(item_id) for item_id in item_ids if str(item_id).isdigit()}
+        with self._locked(cart_id):
+            self.cache.delete_many(
+                [self._line_key(cart_id, item_id) for item_id in item_ids]
+            )
+            self._set_item_ids(
+                cart_id,
+                [
+                    item_id
+                    for item_id in self._item_ids(cart_id)
+                    if item_id not in removed
+                ],
+            )
+        _mark_modified(request)
+
+    def replace(self, request: HttpRequest, lines: dict[int, int]) -> None:
+        """Записывает корзину одним set_many."""
+        cart_id = get_cart_id(request, create=True)
+        with self._locked(cart_id):
+            self.clear(request)
+            self.cache.set_many(
+                {
+                    self._line_key(cart_id, item_id): quantity
+                    for item_id, quantity in lines.items()
+                },
+                self.timeout,
+            )
+            self._set_item_ids(cart_id, list(lines))
+        _mark_modified(request)
+
+    def clear(self, request: HttpRequest) -> None:
+        """Удаляет список товаров и все строки корзины."""
+        cart_id = get_cart_id(request)
+        if cart_id is None:
+            return
+        self.cache.delete_many(
+            [
+                self._index_key(cart_id),
+                *(
+                    self._line_key(cart_id, item_id)
+                    for item_id in self._item_ids(cart_id)
+                ),
+            ]
+        )
+
+
+class DatabaseCartStore(CartStore):
+    """Корзина в таблице CartLine: строка на товар.
+
+    Резервный вариант для развертываний без общего кеша: изменение
+    количества — один UPDATE небольшой строки вместо перезаписи сессии.
+    Брошенные корзины удаляет команда clear_expired_carts.
+    """
+
+    def __init__(self, timeout: int | None = None) -> None:
+        self.timeout = settings.CART_TTL if timeout is None else timeout
+
+    def _lines(self, request: HttpRequest, create: bool = False) -> QuerySet:
+        return CartLine.objects.filter(cart_id=get_cart_id(request, create=create))
+
+    def lines(self, request: HttpRequest) -> dict[str, Any]:
+        """Читает строки корзины одним запросом."""
+        if get_cart_id(request) is None:
+            return {}
+        rows = self._lines(request).order_by("id").values_list("item_id", "quantity")
+        return {str(item_id): quantity for item_id, quantity in rows}
+
+    def count(self, request: HttpRequest) -> int:
+        """Возвращает число строк корзины."""
+        if get_cart_id(request) is None:
+            return 0
+        return self._lines(request).count()
+
+    def add(self, request: HttpRequest, item_id: int) -> None:
+        """Увеличивает количество UPDATE-ом или вставляет новую строку."""
+        lines = self._lines(request, create=True).filter(item_id=item_id)
+        now = timezone.now()
+        if not lines.update(quantity=F("quantity") + 1, updated_at=now):
+            try:
+                with transaction.atomic():
+                    CartLine.objects.create(
+                        cart_id=request.cart_id, item_id=item_id, updated_at=now
+                    )
+            except IntegrityError:
+                # Параллельный запрос уже вставил строку
+                lines.update(quantity=F("quantity") + 1, updated_at=now)
+        _mark_modified(request)
+
+    def change(self, request: HttpRequest, item_id: int, delta: int) -> None:
+        """Меняет количество одним UPDATE, обнулившуюся строку удаляет."""
+        if get_cart_id(request) is None:
+            return
+        lines = self._lines(request).filter(item_id=item_id)
+        if delta < 0:
+            lines.filter(quantity__lte=-delta).delete()
+        lines.update(quantity=F("quantity") + delta, updated_at=timezone.now())
+        _mark_modified(request)
+
+    def remove(self, request: HttpRequest, *item_ids: int | str) -> None:
+        """Удаляет строки товаров одним DELETE."""
+        if get_cart_id(request) is None or not item_ids:
+            return
+        self._lines(request).filter(item_id__in=item_ids).delete()
+        _mark_modified(request)
+
+    def replace(self, request: HttpRequest, lines: dict[int, int]) -> None:
+        """Заменяет строки корзины в одной транзакции."""
+        cart_id = get_cart_id(request, create=True)
+        now = timezone.now()
+        with transaction.atomic():
+            CartLine.objects.filter(cart_id=cart_id).delete()
+            CartLine.objects.bulk_create(
+                CartLine(
+                    cart_id=cart_id, item_id=item_id, quantity=quantity, updated_at=now
+                )
+                for item_id, quantity in lines.items()
+            )
+        _mark_modified(request)
+
+    def clear(self, request: HttpRequest) -> None:
+        """Удаляет все строки корзины."""
+        if get_cart_id(request) is not None:
+            self._lines(request).delete()
+
+    def clear_expired(self) -> int:
+        """Удаляет строки корзин, не менявшихся дольше CART_TTL."""
+        cutoff = timezone.now() - timedelta(seconds=self.timeout)
+        deleted, _ = CartLine.objects.filter(updated_at__lt=cutoff).delete()
+        return deleted
+
+
+_store: CartStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_cart_store() -> CartStore:
+    """Возвращает хранилище корзины текущего процесса из настройки CART_STORE."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = import_string(settings.CART_STORE)()
+    return _store
+
+
+def reset_cart_store() -> None:
+    """Удаляет хранилище корзины, например после изменения настроек."""
+    global _store
+    with _store_lock:
+        _store = None
+
+
+@receiver(setting_changed)
+def cart_settings_changed(setting: str, **kwargs: Any) -> None:  # noqa: ARG001
+    """Пересоздает хранилище корзины при изменении настроек CART_*."""
+    if setting.startswith("CART_"):
+        reset_cart_store()
@@ -0,0 +1,164 @@
+"""Индекс ID товаров каталога в памяти процесса."""
+
+import json
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .models import Item
+from .pagination import SORTS
+
+# Поля товара, доступные через API каталога
+CATALOG_API_FIELDS = (
+    "id",
+    "name",
+    "description",
+    "price",
+    "currency",
+    "price_usd",
+    "price_eur",
+)
+
+# Ключ общего кеша со счетчиком версий каталога. Любое изменение товара
+# увеличивает версию, и воркеры перечитывают индекс и список товаров.
+CATALOG_VERSION_KEY = "payments:catalog:version"
+
+
+def get_catalog_version() -> int:
+    """Возвращает текущую версию каталога из общего кеша."""
+    return cache.get(CATALOG_VERSION_KEY, 0)
+
+
+def bump_catalog_version() -> None:
+    """Увеличивает версию каталога, чтобы воркеры перечитали индекс."""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, 1, timeout=None)
+
+
+class CatalogIndex:
+    """Множество ID существующих товаров для проверок без обращения к БД.
+
+    Индекс перечитывается, если изменилась версия каталога в общем кеше
+    или он старше max_age секунд. При промахе наличие товара проверяется
+    в БД, так как товар мог появиться после загрузки индекса.
+    """
+
+    def __init__(self, max_age: float) -> None:
+        self.max_age = max_age
+        self._ids: frozenset[int] | None = None
+        self._version: int | None = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self) -> frozenset[int]:
+        """Загружает ID всех товаров одним запросом."""
+        with self._lock:
+            version = get_catalog_version()
+            ids = frozenset(Item.objects.values_list("pk", flat=True))
+            self._ids = ids
+            self._version = version
+            self._loaded_at = time.monotonic()
+            return ids
+
+    def invalidate(self) -> None:
+        """Сбрасывает индекс, следующее обращение перечитает его."""
+        with self._lock:
+            self._ids = None
+
+    def contains(self, item_id: int) -> bool:
+        """Проверяет, существует ли товар с указанным ID."""
+        if item_id in self._current_ids():
+            return True
+
+        exists = Item.objects.filter(pk=item_id).exists()
+        if exists:
+            with self._lock:
+                if self._ids is not None:
+                    self._ids = self._ids | {item_id}
+        return exists
+
+    def _current_ids(self) -> frozenset[int]:
+        """Возвращает актуальный индекс, перечитывая устаревший."""
+        ids = self._ids
+        if (
+            ids is None
+            or time.monotonic() - self._loaded_at >= self.max_age
+            or self._version != get_catalog_version()
+        ):
+            return self.load()
+        return ids
+
+
+_index: CatalogIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_catalog_index() -> CatalogIndex:
+    """Возвращает индекс каталога текущего процесса."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = CatalogIndex(max_age=settings.CATALOG_INDEX_MAX_AGE)
+    return _index
+
+
+def item_exists(item_id: int) -> bool:
+    """Проверяет существование товара по индексу процесса."""
+    return get_catalog_index().contains(item_id)
+
+
+def reset_catalog_index() -> None:
+    """Удаляет индекс каталога, например после изменения настроек."""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+@receiver(setting_changed)
+def catalog_index_settings_changed(setting: str, **kwargs: Any) -> None:  # noqa: ARG001
+    """Пересоздает индекс каталога при изменении настроек CATALOG_INDEX_*."""
+    if setting.startswith("CATALOG_INDEX_"):
+        reset_catalog_index()
+
+
+def stream_catalog(
+    fields: tuple[str, ...], sort: str, chunk_size: int, using: str | None = None
+) -> Iterator[dict[str, Any]]:
+    """Читает товары серверным курсором пачками по chunk_size строк.
+
+    Генератор выполняется уже после ответа view, когда состояние
+    маршрутизации запроса сброшено, поэтому алиас базы для чтения
+    передается в using заранее.
+    """
+    rows = (
+        Item.objects.using(using)
+        .order_by(*SORTS[sort])
+        .values(*fields)
+        .iterator(chunk_size=chunk_size)
+    )
+    yield from rows
+
+
+def as_ndjson(rows: Iterable[dict[str, Any]]) -> Iterator[str]:
+    """Сериализует строки в NDJSON: один JSON-объект на строку."""
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def as_json_array(rows: Iterable[dict[str, Any]]) -> Iterator[str]:
+    """Сериализует строки в JSON-массив по частям."""
+    yield "["
+    separator = ""
+    for row in rows:
+        yield separator + json.dumps(row, ensure_ascii=False)
+        separator = ","
+    yield "]"
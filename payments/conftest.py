@@ -1,13 +1,74 @@
 from decimal import Decimal
+from unittest.mock import AsyncMock
 
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 
+from payments.cart_store import reset_cart_store
+from payments.catalog import reset_catalog_index
+from payments.coupons import reset_coupon_registry
+from payments.db_router import reset_replica_set
+from payments.metrics import registry
 from payments.models import Discount, Item, Order, OrderItem, Tax
+from payments.rates import get_rate_table, reset_rate_cache
+from payments.storefront import reset_storefront_cache
+from payments.stripe_calls import reset_circuit_breaker
+from payments.stripe_client import reset_stripe_client
 
 User = get_user_model()
 
 
+@pytest.fixture(autouse=True)
+def _reset_rate_cache():
+    """Сбрасывает кеш курсов, чтобы тесты не влияли друг на друга."""
+    reset_rate_cache()
+    yield
+    reset_rate_cache()
+
+
+@pytest.fixture(autouse=True)
+def _reset_catalog_index():
+    """Сбрасывает индекс каталога, список товаров, корзины и общий кеш между тестами."""
+    reset_catalog_index()
+    reset_storefront_cache()
+    reset_cart_store()
+    cache.clear()
+    yield
+    reset_catalog_index()
+    reset_storefront_cache()
+    reset_cart_store()
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def _reset_stripe_client():
+    """Сбрасывает клиент Stripe, circuit breaker, купоны и метрики между тестами."""
+    reset_stripe_client()
+    reset_circuit_breaker()
+    reset_coupon_registry()
+    registry.reset()
+    yield
+    reset_stripe_client()
+    reset_circuit_breaker()
+    reset_coupon_registry()
+    registry.reset()
+
+
+@pytest.fixture(autouse=True)
+def _reset_replica_set():
+    """Сбрасывает реплики и кеш их отставания между тестами."""
+    reset_replica_set()
+    yield
+    reset_replica_set()
+
+
+@pytest.fixture
+def rate_table(db):  # noqa: ARG001
+    """Загружает курсы в кеш процесса заранее."""
+    return get_rate_table()
+
+
 @pytest.fixture
 def item_usd(db):  # noqa: ARG001
     """Создает тестовый товар в USD."""
@@ -105,6 +166,15 @@ def mock_stripe_payment_intent(mocker):
     return mock
 
 
+@pytest.fixture
+def mock_stripe_payment_intent_async(mocker):
+    """Мокает Stripe PaymentIntent.create_async."""
+    mock = mocker.patch("stripe.PaymentIntent.create_async", new_callable=AsyncMock)
+    mock.return_value.client_secret = "pi_test_secret_async"
+    mock.return_value.id = "pi_test_async"
+    return mock
+
+
 @pytest.fixture
 def mock_stripe_coupon(mocker):
     """Мокает Stripe Coupon.create."""
@@ -0,0 +1,131 @@
+"""Купоны Stripe: реестр созданных купонов с кешем в памяти воркера."""
+
+import threading
+from decimal import Decimal
+
+import stripe
+from django.db import transaction
+
+from .metrics import registry
+from .models import StripeCoupon
+from .stripe_calls import call_stripe
+
+COUPON_NAME_MAX_LENGTH = 40
+
+
+def normalize_percent(percent: Decimal | float | str) -> Decimal:
+    """Приводит процент скидки к виду, в котором он хранится в БД."""
+    return Decimal(str(percent)).quantize(Decimal("0.01"))
+
+
+def coupon_id_for(percent: Decimal, duration: str) -> str:
+    """Детерминированный ID купона в Stripe для процента и срока действия.
+
+    Один и тот же ID при повторном создании не дает Stripe завести дубликат,
+    даже если запись в БД не сохранилась после успешного ответа Stripe.
+    """
+    return f"discount-{percent:f}-{duration}".replace(".", "_")
+
+
+def create_coupon_in_stripe(coupon: StripeCoupon) -> str:
+    """Создает купон в Stripe и возвращает его ID.
+
+    Если купон с таким ID уже есть в Stripe, используется существующий.
+    """
+    try:
+        created = call_stripe(
+            stripe.Coupon.create,
+            id=coupon.coupon_id,
+            name=coupon.name or coupon.coupon_id,
+            percent_off=float(coupon.percent),
+            duration=coupon.duration,
+            idempotency_key=f"coupon-{coupon.coupon_id}",
+        )
+    except stripe.InvalidRequestError as error:
+        if error.code != "resource_already_exists":
+            raise
+        return coupon.coupon_id
+    registry.increment("coupons.created")
+    return created.id
+
+
+class CouponRegistry:
+    """ID купонов Stripe по (процент, срок действия) в памяти воркера.
+
+    Повторный запрос того же купона не обращается ни к БД, ни к Stripe.
+    Новый купон создается внутри транзакции вместе с записью StripeCoupon:
+    уникальное ограничение (percent, duration) не дает параллельным
+    воркерам создать второй купон, проигравший получает запись победителя.
+    """
+
+    def __init__(self) -> None:
+        self._ids: dict[tuple[Decimal, str], str] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self, percent: Decimal | float | str, duration: str = "once", name: str = ""
+    ) -> str:
+        """Возвращает ID купона, создавая его при первом обращении."""
+        key = (normalize_percent(percent), duration)
+        coupon_id = self._ids.get(key)
+        if coupon_id is not None:
+            registry.increment("coupons.cache_hits")
+            return coupon_id
+
+        coupon_id = self._load_or_create(*key, name=name)
+        with self._lock:
+            self._ids[key] = coupon_id
+        return coupon_id
+
+    def invalidate(self) -> None:
+        """Сбрасывает кеш, следующие обращения перечитают реестр из БД."""
+        with self._lock:
+            self._ids.clear()
+
+    @staticmethod
+    def _load_or_create(percent: Decimal, duration: str, name: str) -> str:
+        """Находит купон в реестре или создает его в Stripe."""
+        existing = (
+            StripeCoupon.objects.filter(percent=percent, duration=duration)
+            .values_list("coupon_id", flat=True)
+            .first()
+        )
+        if existing is not None:
+            return existing
+
+        with transaction.atomic():
+            coupon, created = StripeCoupon.objects.get_or_create(
+                percent=percent,
+                duration=duration,
+                defaults={
+                    "coupon_id": coupon_id_for(percent, duration),
+                    "name": name[:COUPON_NAME_MAX_LENGTH],
+                },
+            )
+            if created:
+                stripe_id = create_coupon_in_stripe(coupon)
+                if stripe_id != coupon.coupon_id:
+                    coupon.coupon_id = stripe_id
+                    coupon.save(update_fields=["coupon_id"])
+        return coupon.coupon_id
+
+
+_registry: CouponRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_coupon_registry() -> CouponRegistry:
+    """Возвращает реестр купонов текущего процесса."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = CouponRegistry()
+    return _registry
+
+
+def reset_coupon_registry() -> None:
+    """Удаляет кеш купонов процесса."""
+    global _registry
+    with _registry_lock:
+        _registry = None
@@ -0,0 +1,80 @@
+"""Пул соединений Postgres воркера: прогрев при старте и метрики.
+
+Пул создает бэкенд Django по OPTIONS["pool"] подключения (см.
+DATABASES в настройках) отдельно в каждом процессе. Без прогрева пул
+открывается на первом запросе, и этот запрос ждет установки соединения.
+"""
+
+import logging
+import time
+from typing import Any
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Имя в метриках и ключ статистики psycopg_pool
+POOL_STATS = (
+    ("checkouts", "requests_num"),
+    ("waits", "requests_queued"),
+    ("wait_ms", "requests_wait_ms"),
+    ("timeouts", "requests_errors"),
+    ("size", "pool_size"),
+    ("available", "pool_available"),
+    ("waiting", "requests_waiting"),
+    ("min_size", "pool_min"),
+    ("max_size", "pool_max"),
+    ("connections_opened", "connections_num"),
+    ("connections_ms", "connections_ms"),
+    ("connections_errors", "connections_errors"),
+    ("connections_lost", "connections_lost"),
+    ("returns_bad", "returns_bad"),
+)
+
+
+def _pooled_connections() -> list[Any]:
+    """Возвращает подключения, для которых включен OPTIONS["pool"]."""
+    return [
+        connection
+        for connection in connections.all()
+        if getattr(connection, "pool", None) is not None
+    ]
+
+
+def warm_up_pools(timeout: float | None = None) -> None:
+    """Открывает пулы и ждет min_size соединений в каждом.
+
+    Вызывается в воркере после fork. Ошибка подключения не мешает
+    запуску воркера: psycopg закрывает пул, не дождавшийся соединений,
+    поэтому он удаляется, и бэкенд создаст новый на первом запросе.
+    """
+    if timeout is None:
+        timeout = settings.DB_POOL_WARMUP_TIMEOUT
+    for connection in _pooled_connections():
+        started = time.perf_counter()
+        try:
+            connection.pool.open(wait=True, timeout=timeout)
+        except Exception:
+            registry.increment("db_pool.warmup_errors")
+            logger.exception("Не удалось прогреть пул соединений %s", connection.alias)
+            connection.close_pool()
+        else:
+            registry.observe("db_pool.warmup", time.perf_counter() - started)
+
+
+def pool_stats() -> dict[str, dict[str, int]]:
+    """Возвращает накопленную статистику пулов по подключениям."""
+    stats = {}
+    for connection in _pooled_connections():
+        raw = connection.pool.get_stats()
+        stats[connection.alias] = {name: raw.get(key, 0) for name, key in POOL_STATS}
+    return stats
+
+
+def close_pools() -> None:
+    """Закрывает пулы при остановке воркера."""
+    for connection in _pooled_connections():
+        connection.close_pool()
@@ -0,0 +1,178 @@
+"""Маршрутизация чтений на реплики Postgres с гарантией read-your-writes.
+
+Чтения уходят на реплику только в безопасных запросах (GET, HEAD,
+OPTIONS), которые пропустил ReplicaPinMiddleware. Все остальное — записи,
+транзакции, команды manage.py, фоновые задачи — работает с default.
+После первой записи запрос до конца читает из default, а клиент получает
+cookie DATABASE_REPLICA_PIN_COOKIE, и его запросы DATABASE_REPLICA_PIN_SECONDS
+секунд тоже читают из default, пока реплики догоняют основную БД.
+"""
+
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.dispatch import receiver
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Отставание реплики Postgres в секундах; 0, если реплика проиграла
+# весь полученный WAL или это не реплика
+LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float8,
+            'Infinity'::float8
+        )
+    END
+"""
+
+
+@dataclass(slots=True)
+class RoutingState:
+    """Состояние маршрутизации текущего запроса."""
+
+    # Можно ли читать с реплик
+    replica_reads: bool
+    # Была ли в запросе запись в default
+    wrote: bool = False
+    # БД для чтений, выбранная на первом чтении: запрос не переходит
+    # между репликами с разным отставанием
+    read_alias: str | None = None
+
+
+# Состояние задается ReplicaPinMiddleware на время запроса. Объект
+# изменяемый, чтобы запись в sync_to_async была видна middleware
+routing_state: ContextVar[RoutingState | None] = ContextVar(
+    "db_routing_state", default=None
+)
+
+
+class ReplicaSet:
+    """Реплики воркера и кеш их отставания.
+
+    Отставание каждой реплики проверяется не чаще раза в check_interval
+    секунд. Реплика, отстающая больше max_lag или недоступная, не получает
+    чтений, пока следующая проверка не покажет, что она догнала default.
+    """
+
+    def __init__(
+        self, aliases: list[str], max_lag: float, check_interval: float
+    ) -> None:
+        self.aliases = list(aliases)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        # Алиас реплики -> (время проверки по time.monotonic(), отставание)
+        self._lag: dict[str, tuple[float, float]] = {}
+
+    def measure_lag(self, alias: str) -> float:
+        """Запрашивает отставание реплики; inf, если она недоступна."""
+        connection = connections[alias]
+        if connection.vendor != "postgresql":
+            return 0.0
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(LAG_QUERY)
+                return float(cursor.fetchone()[0])
+        except DatabaseError:
+            registry.increment("db.replica_errors")
+            logger.warning("Реплика %s недоступна", alias, exc_info=True)
+            return float("inf")
+
+    def lag(self, alias: str) -> float:
+        """Возвращает отставание реплики, проверяя его по расписанию."""
+        now = time.monotonic()
+        checked = self._lag.get(alias)
+        if checked is not None and now - checked[0] < self.check_interval:
+            return checked[1]
+        lag = self.measure_lag(alias)
+        self._lag[alias] = (now, lag)
+        return lag
+
+    def choose(self) -> str:
+        """Выбирает реплику для чтения или default, если все отстают."""
+        healthy = [alias for alias in self.aliases if self.lag(alias) <= self.max_lag]
+        if not healthy:
+            registry.increment("db.replica_fallbacks")
+            return DEFAULT_DB_ALIAS
+        registry.increment("db.replica_requests")
+        return random.choice(healthy)  # noqa: S311
+
+
+_replica_set: ReplicaSet | None = None
+_replica_set_lock = threading.Lock()
+
+
+def get_replica_set() -> ReplicaSet:
+    """Возвращает реплики текущего процесса."""
+    global _replica_set
+    if _replica_set is None:
+        with _replica_set_lock:
+            if _replica_set is None:
+                _replica_set = ReplicaSet(
+                    settings.DATABASE_REPLICAS,
+                    max_lag=settings.DATABASE_REPLICA_MAX_LAG,
+                    check_interval=settings.DATABASE_REPLICA_LAG_CHECK_INTERVAL,
+                )
+    return _replica_set
+
+
+def reset_replica_set() -> None:
+    """Удаляет реплики процесса вместе с кешем отставания."""
+    global _replica_set
+    with _replica_set_lock:
+        _replica_set = None
+
+
+@receiver(setting_changed)
+def replica_settings_changed(setting: str, **kwargs: Any) -> None:  # noqa: ARG001
+    """Пересоздает набор реплик при изменении настроек DATABASE_REPLICA*."""
+    if setting.startswith("DATABASE_REPLICA"):
+        reset_replica_set()
+
+
+class ReplicaRouter:
+    """Роутер БД для DATABASE_ROUTERS: чтения на реплики, записи в default."""
+
+    def db_for_read(self, model: type, **hints: Any) -> str:  # noqa: ARG002
+        """Возвращает реплику для безопасного запроса без записей."""
+        state = routing_state.get()
+        if (
+            state is None
+            or not state.replica_reads
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        if state.read_alias is None:
+            replicas = get_replica_set()
+            state.read_alias = (
+                replicas.choose() if replicas.aliases else DEFAULT_DB_ALIAS
+            )
+        return state.read_alias
+
+    def db_for_write(self, model: type, **hints: Any) -> str:  # noqa: ARG002
+        """Возвращает default и переключает запрос на чтение из default."""
+        state = routing_state.get()
+        if state is not None:
+            state.replica_reads = False
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1: Any, obj2: Any, **hints: Any) -> bool:  # noqa: ARG002
+        """Разрешает связи: на репликах те же данные, что и в default."""
+        return True
+
+    def allow_migrate(self, db: str, app_label: str, **hints: Any) -> bool:  # noqa: ARG002
+        """Запрещает миграции на репликах: они получают схему из WAL."""
+        return db not in get_replica_set().aliases
@@ -0,0 +1,382 @@
+"""Локальная замена Stripe API для нагрузочного тестирования без сети.
+
+Реализует подмножество API, которое использует проект: создание, обновление
+и получение Payment Intent, создание и получение купонов. Задержка ответов,
+доля ошибок 500 и ответов 429 настраиваются. Приложение направляется на
+сервер настройкой STRIPE_API_BASE, запуск — командой run_fake_stripe.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qsl
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+INTENT_PATH = re.compile(r"^/v1/payment_intents/(?P<id>[\w-]+)$")
+COUPON_PATH = re.compile(r"^/v1/coupons/(?P<id>[\w-]+)$")
+
+
+@dataclass(frozen=True)
+class Latency:
+    """Распределение задержки ответа в секундах.
+
+    fixed — всегда value; uniform — равномерно от value до high;
+    exponential — со средним value; lognormal — с медианой value
+    и разбросом sigma (длинный хвост, как у реальной сети).
+    """
+
+    distribution: str = "fixed"
+    value: float = 0.0
+    high: float = 0.0
+    sigma: float = 0.5
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        """Разбирает строку вида 0.1, uniform:0.05:0.3 или lognormal:0.1:0.8."""
+        name, _, rest = spec.partition(":")
+        if not rest:
+            name, rest = "fixed", spec
+        if name not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Неизвестное распределение задержки: {name}")
+        try:
+            numbers = [float(part) for part in rest.split(":")]
+        except ValueError as error:
+            raise ValueError(f"Некорректная задержка: {spec}") from error
+        if any(number < 0 for number in numbers) or len(numbers) > 2:
+            raise ValueError(f"Некорректная задержка: {spec}")
+
+        value = numbers[0]
+        if name == "uniform":
+            high = numbers[1] if len(numbers) > 1 else value
+            return cls(name, value=value, high=max(high, value))
+        if name == "lognormal" and len(numbers) > 1:
+            return cls(name, value=value, sigma=numbers[1])
+        return cls(name, value=value)
+
+    def sample(self, rng: random.Random) -> float:
+        """Случайная задержка одного ответа."""
+        if self.distribution == "uniform":
+            return rng.uniform(self.value, self.high)
+        if self.distribution == "exponential":
+            return rng.expovariate(1 / self.value) if self.value else 0.0
+        if self.distribution == "lognormal":
+            return rng.lognormvariate(0, self.sigma) * self.value
+        return self.value
+
+    def __str__(self) -> str:
+        if self.distribution == "uniform":
+            return f"uniform {self.value * 1000:.0f}-{self.high * 1000:.0f} ms"
+        if self.distribution == "lognormal":
+            return f"lognormal median {self.value * 1000:.0f} ms, sigma {self.sigma}"
+        return f"{self.distribution} {self.value * 1000:.0f} ms"
+
+
+def decode_form(body: str) -> dict[str, Any]:
+    """Разбирает form-encoded тело запроса Stripe во вложенный словарь.
+
+    Ключи вида metadata[order_id] превращаются в {"metadata": {"order_id": ...}}.
+    """
+    params: dict[str, Any] = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        parts = key.replace("]", "").split("[")
+        target = params
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return params
+
+
+class StripeError(Exception):
+    """Ответ с ошибкой в формате Stripe API."""
+
+    def __init__(
+        self, status: int, message: str, code: str = "", param: str = ""
+    ) -> None:
+        super().__init__(message)
+        self.status = status
+        self.body: dict[str, Any] = {
+            "type": ("invalid_request_error" if status < 500 else "api_error"),
+            "message": message,
+        }
+        if code:
+            self.body["code"] = code
+        if param:
+            self.body["param"] = param
+
+
+def _amount(params: dict[str, Any]) -> int:
+    """Сумма Payment Intent в минимальных единицах валюты."""
+    value = params.get("amount", "")
+    if not str(value).isdigit() or int(value) < 1:
+        raise StripeError(
+            400, "Invalid positive integer", "parameter_invalid_integer", "amount"
+        )
+    return int(value)
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    """Обрабатывает запросы к фиктивному Stripe API."""
+
+    server: "FakeStripe"
+    # Keep-alive, как у Stripe: клиент может повторно использовать соединение
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Возвращает сохраненный объект."""
+        self._handle("GET")
+
+    def do_POST(self) -> None:  # noqa: N802
+        """Создает или обновляет объект."""
+        self._handle("POST")
+
+    def _handle(self, method: str) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        params = decode_form(self.rfile.read(length).decode())
+        time.sleep(self.server.next_latency())
+        try:
+            status, body = self.server.dispatch(
+                method,
+                self.path.split("?", 1)[0],
+                params,
+                authorization=self.headers.get("Authorization", ""),
+                idempotency_key=self.headers.get("Idempotency-Key", ""),
+            )
+        except StripeError as error:
+            status, body = error.status, {"error": error.body}
+        self._send(status, body)
+
+    def _send(self, status: int, body: dict[str, Any]) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("Request-Id", f"req_{uuid.uuid4().hex[:14]}")
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        """Не пишет access-лог в консоль."""
+
+
+class FakeStripe(ThreadingHTTPServer):
+    """HTTP-сервер фиктивного Stripe, хранящий объекты в памяти.
+
+    Повтор запроса с тем же Idempotency-Key возвращает сохраненный ответ,
+    как в Stripe. Искусственные сбои (500 и 429) не сохраняются, поэтому
+    повтор после них выполняется заново.
+    """
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(
+        self,
+        latency: Latency | float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int | None = None,
+    ) -> None:
+        super().__init__((host, port), FakeStripeHandler)
+        if not isinstance(latency, Latency):
+            latency = Latency(value=latency)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.objects: dict[str, dict[str, Any]] = {}
+        self.requests: Counter[str] = Counter()
+        self._idempotent: dict[str, tuple[str, dict, int, dict]] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """Базовый URL для STRIPE_API_BASE."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeStripe":
+        """Запускает сервер в фоновом потоке."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """Останавливает сервер и закрывает сокет."""
+        self.shutdown()
+        self.server_close()
+
+    def next_latency(self) -> float:
+        """Задержка очередного ответа."""
+        with self._lock:
+            return self.latency.sample(self._rng)
+
+    def _fault(self) -> StripeError | None:
+        """Искусственный сбой с заданной вероятностью."""
+        with self._lock:
+            roll = self._rng.random()
+            if roll < self.rate_limit_rate:
+                self.requests["rate_limited"] += 1
+                return StripeError(429, "Too many requests", "rate_limit")
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.requests["errors"] += 1
+                return StripeError(500, "An unknown error occurred")
+        return None
+
+    def dispatch(
+        self,
+        method: str,
+        path: str,
+        params: dict[str, Any],
+        authorization: str = "",
+        idempotency_key: str = "",
+    ) -> tuple[int, dict[str, Any]]:
+        """Выполняет запрос и возвращает статус и тело ответа."""
+        if not authorization.startswith("Bearer sk_"):
+            raise StripeError(401, "Invalid API Key provided")
+        fault = self._fault()
+        if fault is not None:
+            raise fault
+
+        request = f"{method} {path}"
+        if method == "POST" and idempotency_key:
+            with self._lock:
+                saved = self._idempotent.get(idempotency_key)
+            if saved is not None:
+                saved_request, saved_params, status, body = saved
+                if (saved_request, saved_params) != (request, params):
+                    error = StripeError(
+                        400,
+                        "Keys for idempotent requests can only be used "
+                        "with the same parameters they were first used with.",
+                    )
+                    error.body["type"] = "idempotency_error"
+                    raise error
+                with self._lock:
+                    self.requests["idempotent_replays"] += 1
+                return status, body
+
+        try:
+            status, body = 200, self._route(method, path, params)
+        except StripeError as error:
+            status, body = error.status, {"error": error.body}
+        if method == "POST" and idempotency_key:
+            with self._lock:
+                self._idempotent[idempotency_key] = (request, params, status, body)
+        return status, body
+
+    def _route(self, method: str, path: str, params: dict[str, Any]) -> dict:
+        if path == "/v1/payment_intents" and method == "POST":
+            return self.create_payment_intent(params)
+        if path == "/v1/coupons" and method == "POST":
+            return self.create_coupon(params)
+        if match := INTENT_PATH.match(path):
+            if method == "POST":
+                return self.update_payment_intent(match["id"], params)
+            return self.retrieve(match["id"], "payment_intent")
+        if match := COUPON_PATH.match(path):
+            return self.retrieve(match["id"], "coupon")
+        raise StripeError(404, f"Unrecognized request URL ({method}: {path})")
+
+    def _store(self, obj: dict[str, Any], create: bool = False) -> dict[str, Any]:
+        with self._lock:
+            if create and obj["id"] in self.objects:
+                raise StripeError(
+                    400,
+                    f"{obj['object'].capitalize()} already exists.",
+                    "resource_already_exists",
+                    "id",
+                )
+            self.objects[obj["id"]] = obj
+            self.requests[obj["object"]] += 1
+        return obj
+
+    def retrieve(self, object_id: str, kind: str) -> dict[str, Any]:
+        """Возвращает объект по ID."""
+        obj = self.objects.get(object_id)
+        if obj is None or obj["object"] != kind:
+            raise StripeError(
+                404, f"No such {kind}: '{object_id}'", "resource_missing", "id"
+            )
+        return obj
+
+    def create_payment_intent(self, params: dict[str, Any]) -> dict[str, Any]:
+        """POST /v1/payment_intents."""
+        amount = _amount(params)
+        if not params.get("currency"):
+            raise StripeError(
+                400,
+                "Missing required param: currency.",
+                "parameter_missing",
+                "currency",
+            )
+        intent_id = f"pi_{uuid.uuid4().hex[:24]}"
+        return self._store(
+            {
+                "id": intent_id,
+                "object": "payment_intent",
+                "amount": amount,
+                "currency": params["currency"].lower(),
+                "client_secret": f"{intent_id}_secret_{uuid.uuid4().hex[:16]}",
+                "description": params.get("description"),
+                "metadata": params.get("metadata", {}),
+                "status": "requires_payment_method",
+                "created": int(time.time()),
+                "livemode": False,
+            },
+            create=True,
+        )
+
+    def update_payment_intent(
+        self, intent_id: str, params: dict[str, Any]
+    ) -> dict[str, Any]:
+        """POST /v1/payment_intents/{id}."""
+        intent = dict(self.retrieve(intent_id, "payment_intent"))
+        if "amount" in params:
+            intent["amount"] = _amount(params)
+        if params.get("currency"):
+            intent["currency"] = params["currency"].lower()
+        if "description" in params:
+            intent["description"] = params["description"]
+        intent["metadata"] = {**intent["metadata"], **params.get("metadata", {})}
+        return self._store(intent)
+
+    def create_coupon(self, params: dict[str, Any]) -> dict[str, Any]:
+        """POST /v1/coupons."""
+        coupon_id = params.get("id") or uuid.uuid4().hex[:8]
+        try:
+            percent_off = float(params["percent_off"])
+        except (KeyError, ValueError) as error:
+            raise StripeError(
+                400, "Invalid percent_off", "parameter_invalid", "percent_off"
+            ) from error
+        if not 0 < percent_off <= 100:
+            raise StripeError(
+                400,
+                "Invalid percent_off: must be between 0 and 100",
+                "parameter_invalid",
+                "percent_off",
+            )
+        return self._store(
+            {
+                "id": coupon_id,
+                "object": "coupon",
+                "name": params.get("name"),
+                "percent_off": percent_off,
+                "duration": params.get("duration", "once"),
+                "valid": True,
+                "created": int(time.time()),
+                "livemode": False,
+            },
+            create=True,
+        )
@@ -0,0 +1,42 @@
+"""Команда применения актуальных курсов валют к заказам."""
+
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from payments.catalog import bump_catalog_version
+from payments.models import Item
+from payments.rates import get_rate_cache
+from payments.totals import DEFAULT_BATCH_SIZE, reprice_for_current_rates
+
+
+class Command(BaseCommand):
+    """Перечитывает курсы и пересчитывает цены товаров и заказы по ним.
+
+    Нужна для курсов, запланированных на будущее, и для файлового
+    источника, изменения которого не вызывают сигналов.
+    """
+
+    help = "Пересчитывает заказы по актуальной версии курсов валют"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Добавляет аргументы команды."""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Количество заказов, обрабатываемых за один пакет",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: ARG002
+        """Выполняет пересчет."""
+        table = get_rate_cache().refresh()
+        items = Item.objects.refresh_price_matrix(table)
+        bump_catalog_version()
+        updated = reprice_for_current_rates(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Версия курсов: {table.version}, обновлено товаров: {items}, "
+                f"заказов: {updated}"
+            )
+        )
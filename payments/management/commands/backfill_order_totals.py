@@ -0,0 +1,33 @@
+"""Команда заполнения хранимых итогов заказов."""
+
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from payments.models import Order
+from payments.totals import DEFAULT_BATCH_SIZE, recalculate_totals
+
+
+class Command(BaseCommand):
+    """Пересчитывает subtotal, discount_amount, tax_amount и total заказов.
+
+    Оплаченные и возвращенные заказы не пересчитываются.
+    """
+
+    help = "Пересчитывает и сохраняет итоговые суммы неоплаченных заказов"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Добавляет аргументы команды."""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Количество заказов, обрабатываемых за один пакет",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: ARG002
+        """Выполняет пересчет итогов."""
+        updated = recalculate_totals(
+            Order.objects.unsettled(), batch_size=options["batch_size"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Обновлено заказов: {updated}"))
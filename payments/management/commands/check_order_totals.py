@@ -0,0 +1,60 @@
+"""Команда проверки согласованности хранимых итогов заказов."""
+
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from payments.models import Order
+from payments.totals import (
+    DEFAULT_BATCH_SIZE,
+    find_inconsistent_totals,
+    recalculate_orders_by_id,
+)
+
+
+class Command(BaseCommand):
+    """Сравнивает сохраненные итоги заказов с рассчитанными по позициям.
+
+    Оплаченные и возвращенные заказы не проверяются: их итоги равны сумме
+    платежа, даже если цены или курсы с тех пор изменились.
+    """
+
+    help = "Проверяет, что итоги неоплаченных заказов совпадают с расчетом"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Добавляет аргументы команды."""
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Исправить найденные расхождения",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Количество заказов, обрабатываемых за один пакет",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: ARG002
+        """Выполняет проверку."""
+        mismatches = list(
+            find_inconsistent_totals(
+                Order.objects.unsettled(), batch_size=options["batch_size"]
+            )
+        )
+        for mismatch in mismatches:
+            self.stdout.write(
+                f"Заказ #{mismatch.order_id}: "
+                f"сохранено {mismatch.stored}, ожидается {mismatch.expected}"
+            )
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("Расхождений не найдено"))
+            return
+
+        if options["fix"]:
+            fixed = recalculate_orders_by_id(m.order_id for m in mismatches)
+            self.stdout.write(self.style.SUCCESS(f"Исправлено заказов: {fixed}"))
+            return
+
+        raise CommandError(f"Найдено расхождений: {len(mismatches)}")
@@ -0,0 +1,18 @@
+"""Команда удаления брошенных корзин из таблицы CartLine."""
+
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from payments.cart_store import DatabaseCartStore
+
+
+class Command(BaseCommand):
+    """Удаляет строки корзин, не менявшихся дольше CART_TTL."""
+
+    help = "Удаляет брошенные корзины хранилища DatabaseCartStore"
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: ARG002
+        """Удаляет устаревшие строки и печатает их количество."""
+        deleted = DatabaseCartStore().clear_expired()
+        self.stdout.write(f"Удалено строк корзин: {deleted}")
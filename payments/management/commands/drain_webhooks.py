@@ -0,0 +1,48 @@
+"""Команда обработки входящей очереди webhook-событий Stripe."""
+
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from payments.webhooks import DEFAULT_BATCH_SIZE, drain_inbox
+
+
+class Command(BaseCommand):
+    """Применяет сохраненные события Stripe к заказам."""
+
+    help = "Обрабатывает входящую очередь webhook-событий Stripe"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Добавляет аргументы команды."""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Количество событий, обрабатываемых в одной транзакции",
+        )
+        parser.add_argument(
+            "--follow",
+            action="store_true",
+            help="Не завершаться, а ждать новые события",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Пауза в секундах, когда очередь пуста (с --follow)",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: ARG002
+        """Разбирает очередь один раз или непрерывно."""
+        while True:
+            result = drain_inbox(options["batch_size"])
+            if result.processed or result.failed or not options["follow"]:
+                self.stdout.write(
+                    f"Обработано событий: {result.processed}, "
+                    f"с ошибкой: {result.failed}"
+                )
+            if not options["follow"]:
+                return
+            if not (result.processed or result.failed):
+                time.sleep(options["interval"])
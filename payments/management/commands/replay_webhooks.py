@@ -0,0 +1,83 @@
+"""Команда повторной обработки webhook-событий Stripe."""
+
+from datetime import datetime
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.utils import timezone
+
+from payments.models import StripeEvent
+from payments.webhooks import DEFAULT_BATCH_SIZE, drain_inbox, replay_events
+
+
+def _parse_since(value: str) -> datetime:
+    """Разбирает дату в формате ISO 8601."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError as error:
+        raise CommandError(f"Некорректная дата: {value}") from error
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    """Возвращает сохраненные события в очередь обработки."""
+
+    help = "Повторно обрабатывает webhook-события Stripe из входящей очереди"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Добавляет аргументы команды."""
+        parser.add_argument(
+            "--event-id",
+            action="append",
+            default=[],
+            help="ID события Stripe (можно указать несколько раз)",
+        )
+        parser.add_argument("--type", help="Тип события, например charge.refunded")
+        parser.add_argument(
+            "--since",
+            help="Только события, полученные не раньше даты (ISO 8601)",
+        )
+        parser.add_argument(
+            "--failed",
+            action="store_true",
+            help="Только события, обработка которых завершилась ошибкой",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Все события (без фильтров)",
+        )
+        parser.add_argument(
+            "--drain",
+            action="store_true",
+            help="Сразу обработать возвращенные события",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: ARG002
+        """Выполняет повтор."""
+        events = StripeEvent.objects.all()
+        if options["event_id"]:
+            events = events.filter(event_id__in=options["event_id"])
+        if options["type"]:
+            events = events.filter(type=options["type"])
+        if options["since"]:
+            events = events.filter(received_at__gte=_parse_since(options["since"]))
+        if options["failed"]:
+            events = events.exclude(last_error="")
+
+        has_filter = any(
+            options[name] for name in ("event_id", "type", "since", "failed")
+        )
+        if not has_filter and not options["all"]:
+            raise CommandError("Укажите фильтр событий или --all")
+
+        count = replay_events(events)
+        self.stdout.write(self.style.SUCCESS(f"Возвращено в очередь: {count}"))
+
+        if options["drain"]:
+            result = drain_inbox(DEFAULT_BATCH_SIZE)
+            self.stdout.write(
+                f"Обработано событий: {result.processed}, с ошибкой: {result.failed}"
+            )
@@ -0,0 +1,80 @@
+"""Команда запуска локальной замены Stripe API."""
+
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from payments.fake_stripe import FakeStripe, Latency
+
+DEFAULT_PORT = 12111
+
+
+class Command(BaseCommand):
+    """Запускает фиктивный Stripe API для нагрузочного тестирования.
+
+    Приложение направляется на сервер переменной окружения
+    STRIPE_API_BASE, например http://127.0.0.1:12111.
+    """
+
+    help = "Запускает локальный фиктивный Stripe API с настраиваемыми сбоями"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Добавляет аргументы команды."""
+        parser.add_argument("--host", default="127.0.0.1", help="Адрес сервера")
+        parser.add_argument(
+            "--port", type=int, default=DEFAULT_PORT, help="Порт сервера"
+        )
+        parser.add_argument(
+            "--latency",
+            default="0",
+            help=(
+                "Задержка ответа в секундах: 0.1, uniform:0.05:0.3, "
+                "exponential:0.1 или lognormal:0.1:0.8"
+            ),
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0.0,
+            help="Доля запросов, на которые отвечать 500",
+        )
+        parser.add_argument(
+            "--rate-limit-rate",
+            type=float,
+            default=0.0,
+            help="Доля запросов, на которые отвечать 429",
+        )
+        parser.add_argument(
+            "--seed", type=int, help="Зерно генератора задержек и сбоев"
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: ARG002
+        """Запускает сервер до прерывания."""
+        try:
+            latency = Latency.parse(options["latency"])
+        except ValueError as error:
+            raise CommandError(str(error)) from error
+        for name in ("error_rate", "rate_limit_rate"):
+            if not 0 <= options[name] <= 1:
+                raise CommandError(f"--{name.replace('_', '-')} должна быть от 0 до 1")
+
+        server = FakeStripe(
+            latency=latency,
+            error_rate=options["error_rate"],
+            rate_limit_rate=options["rate_limit_rate"],
+            host=options["host"],
+            port=options["port"],
+            seed=options["seed"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Фиктивный Stripe API: {server.url}")
+            + f"\nЗадержка: {latency}, ошибки 500: {options['error_rate']:.0%}, "
+            f"ответы 429: {options['rate_limit_rate']:.0%}"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Обработано запросов: {dict(server.requests)}")
@@ -0,0 +1,93 @@
+"""Метрики процесса: счетчики и длительности операций в памяти воркера."""
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass
+class Timing:
+    """Накопленная статистика длительности операции."""
+
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def add(self, seconds: float) -> None:
+        """Учитывает одно измерение."""
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> dict[str, float]:
+        """Возвращает статистику в миллисекундах."""
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "avg_ms": round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class MetricsRegistry:
+    """Потокобезопасный реестр счетчиков и длительностей.
+
+    Значения живут в памяти процесса, каждый воркер ведет свои метрики.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: dict[str, int] = {}
+        self._timings: dict[str, Timing] = {}
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """Увеличивает счетчик."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Записывает длительность операции."""
+        with self._lock:
+            self._timings.setdefault(name, Timing()).add(seconds)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Измеряет длительность блока, в том числе завершившегося ошибкой."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def counter(self, name: str) -> int:
+        """Возвращает текущее значение счетчика."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def timing(self, name: str) -> dict[str, float]:
+        """Возвращает статистику длительности операции."""
+        with self._lock:
+            return self._timings.get(name, Timing()).as_dict()
+
+    def snapshot(self) -> dict[str, Any]:
+        """Возвращает копию всех метрик для выдачи в JSON."""
+        with self._lock:
+            return {
+                "counters": dict(sorted(self._counters.items())),
+                "timings": {
+                    name: timing.as_dict()
+                    for name, timing in sorted(self._timings.items())
+                },
+            }
+
+    def reset(self) -> None:
+        """Обнуляет все метрики."""
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,78 @@
+"""Middleware приложения payments."""
+
+from collections.abc import Callable
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+
+from .db_router import RoutingState, get_replica_set, routing_state
+from .metrics import registry
+
+# Запросы, которые не должны ничего менять и могут читать с реплик
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class CartCookieMiddleware:
+    """Выставляет cookie с ID корзины после изменения корзины.
+
+    Нужна хранилищам корзины в кеше и в БД: cookie продлевается при каждом
+    изменении, как сессия, и живет столько же, сколько сама корзина.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        """Выполняет запрос и выставляет cookie, если корзина изменилась."""
+        response = self.get_response(request)
+        if getattr(request, "cart_modified", False):
+            response.set_cookie(
+                settings.CART_COOKIE_NAME,
+                request.cart_id,
+                max_age=settings.CART_TTL,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+class ReplicaPinMiddleware:
+    """Включает чтение с реплик для безопасных запросов.
+
+    Запрос с cookie DATABASE_REPLICA_PIN_COOKIE читает из default: клиент
+    недавно что-то записал, и реплика может этого еще не видеть. Cookie
+    выставляется после любой записи в default и живет
+    DATABASE_REPLICA_PIN_SECONDS. Middleware стоит перед SessionMiddleware,
+    чтобы сохранение сессии тоже считалось записью. Без DATABASE_REPLICAS
+    запрос проходит без изменений.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        """Выполняет запрос с состоянием маршрутизации и продлевает cookie."""
+        if not get_replica_set().aliases:
+            return self.get_response(request)
+        pinned = settings.DATABASE_REPLICA_PIN_COOKIE in request.COOKIES
+        if pinned:
+            registry.increment("db.pinned_requests")
+        state = RoutingState(
+            replica_reads=request.method in SAFE_METHODS and not pinned
+        )
+        token = routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        if state.wrote:
+            response.set_cookie(
+                settings.DATABASE_REPLICA_PIN_COOKIE,
+                "1",
+                max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
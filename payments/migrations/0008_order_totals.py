@@ -0,0 +1,98 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:33
+
+from django.db import migrations, models
+
+# Курс EUR к USD, действовавший до появления таблицы курсов (0009)
+EUR_TO_USD_RATE = 1.1
+
+BATCH_SIZE = 500
+
+
+def convert_price(price, currency, target_currency):
+    """Конвертируем цену по фиксированному курсу, отбрасывая дробную часть."""
+    if currency == target_currency:
+        return price
+    if (currency, target_currency) == ("eur", "usd"):
+        return int(price * EUR_TO_USD_RATE)
+    if (currency, target_currency) == ("usd", "eur"):
+        return int(price / EUR_TO_USD_RATE)
+    return price
+
+
+def fill_order_totals(apps, schema_editor):
+    """Заполняем итоги существующих заказов так же, как их считал Order.get_*."""
+    Order = apps.get_model("payments", "Order")
+
+    orders = (
+        Order.objects.select_related("discount", "tax")
+        .prefetch_related("order_items__item")
+        .order_by("pk")
+    )
+    batch = []
+    for order in orders.iterator(chunk_size=BATCH_SIZE):
+        subtotal = sum(
+            convert_price(line.item.price, line.item.currency, order.payment_currency)
+            * line.quantity
+            for line in order.order_items.all()
+        )
+        discount_amount = 0
+        if order.discount is not None:
+            discount_amount = int(subtotal * (order.discount.percent / 100))
+        tax_amount = 0
+        if order.tax is not None:
+            tax_amount = int((subtotal - discount_amount) * (order.tax.percent / 100))
+        order.subtotal = subtotal
+        order.discount_amount = discount_amount
+        order.tax_amount = tax_amount
+        order.total = subtotal - discount_amount + tax_amount
+        batch.append(order)
+        if len(batch) >= BATCH_SIZE:
+            Order.objects.bulk_update(
+                batch, ["subtotal", "discount_amount", "tax_amount", "total"]
+            )
+            batch = []
+    Order.objects.bulk_update(
+        batch, ["subtotal", "discount_amount", "tax_amount", "total"]
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0007_order_payment_currency"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="discount_amount",
+            field=models.IntegerField(
+                default=0,
+                help_text="Сумма скидки в центах (пересчитывается автоматически)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="subtotal",
+            field=models.IntegerField(
+                default=0,
+                help_text="Сумма товаров в центах (пересчитывается автоматически)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="tax_amount",
+            field=models.IntegerField(
+                default=0,
+                help_text="Сумма налога в центах (пересчитывается автоматически)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="total",
+            field=models.IntegerField(
+                default=0,
+                help_text="Итоговая сумма в центах (пересчитывается автоматически)",
+            ),
+        ),
+        migrations.RunPython(fill_order_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:38
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0008_order_totals"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="rate_version",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Версия курсов валют, по которой рассчитаны итоги заказа",
+                null=True,
+            ),
+        ),
+        migrations.CreateModel(
+            name="ExchangeRate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "base_currency",
+                    models.CharField(help_text="Исходная валюта", max_length=3),
+                ),
+                (
+                    "quote_currency",
+                    models.CharField(
+                        help_text="Валюта, в которую выполняется конвертация",
+                        max_length=3,
+                    ),
+                ),
+                (
+                    "rate",
+                    models.DecimalField(
+                        decimal_places=6,
+                        help_text="Сколько единиц quote_currency стоит единица base_currency",
+                        max_digits=12,
+                    ),
+                ),
+                (
+                    "effective_from",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        help_text="Дата начала действия курса",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Курс валют",
+                "verbose_name_plural": "Курсы валют",
+                "ordering": ["-effective_from", "-id"],
+                "constraints": [
+                    models.CheckConstraint(
+                        condition=models.Q(("rate__gt", 0)),
+                        name="exchange_rate_positive",
+                    )
+                ],
+            },
+        ),
+    ]
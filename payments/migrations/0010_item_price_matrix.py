@@ -0,0 +1,98 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:42
+
+from django.db import migrations, models
+from django.db.models import BigIntegerField, Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast, Floor
+from django.utils import timezone
+
+PRICE_COLUMNS = {"usd": "price_usd", "eur": "price_eur"}
+
+# Курсы по умолчанию на момент миграции: (base, quote) -> единиц quote за base
+DEFAULT_RATES = {("eur", "usd"): 1.1}
+
+
+def current_rates(ExchangeRate):
+    """Собираем действующие курсы и их версию (ID последней вступившей записи)."""
+    rates = dict(DEFAULT_RATES)
+    version = 0
+    effective = ExchangeRate.objects.filter(effective_from__lte=timezone.now())
+    for row in effective.order_by("effective_from", "id"):
+        rates[(row.base_currency, row.quote_currency)] = float(row.rate)
+        version = row.id
+    return version, rates
+
+
+def price_in_currency(target_currency, rates):
+    """Цена товара в целевой валюте с отбрасыванием дробной части."""
+    float_price = Cast(F("price"), FloatField())
+    direct = [
+        When(
+            Q(currency=base),
+            then=Cast(Floor(float_price * Value(rate)), BigIntegerField()),
+        )
+        for (base, quote), rate in rates.items()
+        if quote == target_currency
+    ]
+    inverse = [
+        When(
+            Q(currency=quote),
+            then=Cast(Floor(float_price / Value(rate)), BigIntegerField()),
+        )
+        for (base, quote), rate in rates.items()
+        if base == target_currency
+    ]
+    return Case(
+        When(Q(currency=target_currency), then=Cast(F("price"), BigIntegerField())),
+        *direct,
+        *inverse,
+        default=Cast(F("price"), BigIntegerField()),
+        output_field=BigIntegerField(),
+    )
+
+
+def fill_price_matrix(apps, schema_editor):
+    """Заполняем цены товаров в валютах по действующим курсам."""
+    ExchangeRate = apps.get_model("payments", "ExchangeRate")
+    Item = apps.get_model("payments", "Item")
+
+    version, rates = current_rates(ExchangeRate)
+    Item.objects.update(
+        price_rate_version=version,
+        **{
+            column: price_in_currency(currency, rates)
+            for currency, column in PRICE_COLUMNS.items()
+        },
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0009_exchange_rates"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="item",
+            name="price_eur",
+            field=models.BigIntegerField(
+                default=0, help_text="Цена в центах EUR (пересчитывается автоматически)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="price_rate_version",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Версия курсов, по которой рассчитаны цены в валютах",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="price_usd",
+            field=models.BigIntegerField(
+                default=0, help_text="Цена в центах USD (пересчитывается автоматически)"
+            ),
+        ),
+        migrations.RunPython(fill_price_matrix, migrations.RunPython.noop),
+    ]
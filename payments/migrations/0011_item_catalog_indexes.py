@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0010_item_price_matrix"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="item",
+            options={
+                "ordering": ["name", "id"],
+                "verbose_name": "Товар",
+                "verbose_name_plural": "Товары",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(fields=["name", "id"], name="item_name_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                fields=["price_usd", "id"], name="item_price_usd_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                fields=["currency", "name", "id"], name="item_currency_name_id_idx"
+            ),
+        ),
+    ]
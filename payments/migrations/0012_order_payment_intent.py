@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0011_item_catalog_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="payment_intent_amount",
+            field=models.IntegerField(
+                blank=True,
+                help_text="Сумма в центах, на которую выставлен Payment Intent",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="payment_intent_client_secret",
+            field=models.CharField(
+                blank=True,
+                help_text="client_secret Stripe Payment Intent",
+                max_length=255,
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="payment_intent_currency",
+            field=models.CharField(
+                blank=True, help_text="Валюта Payment Intent", max_length=3
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="payment_intent_id",
+            field=models.CharField(
+                blank=True, help_text="ID Stripe Payment Intent заказа", max_length=255
+            ),
+        ),
+    ]
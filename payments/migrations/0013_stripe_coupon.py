@@ -0,0 +1,67 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0012_order_payment_intent"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StripeCoupon",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "percent",
+                    models.DecimalField(
+                        decimal_places=2,
+                        help_text="Процент скидки купона",
+                        max_digits=5,
+                    ),
+                ),
+                (
+                    "duration",
+                    models.CharField(
+                        choices=[("once", "Однократно"), ("forever", "Бессрочно")],
+                        default="once",
+                        help_text="Срок действия купона в Stripe",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "coupon_id",
+                    models.CharField(
+                        help_text="ID купона в Stripe", max_length=64, unique=True
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        blank=True, help_text="Название купона", max_length=40
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Купон Stripe",
+                "verbose_name_plural": "Купоны Stripe",
+                "ordering": ["percent", "duration"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("percent", "duration"),
+                        name="stripe_coupon_percent_duration_uniq",
+                    )
+                ],
+            },
+        ),
+    ]
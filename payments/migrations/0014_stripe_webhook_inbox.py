@@ -0,0 +1,88 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0013_stripe_coupon"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="paid_at",
+            field=models.DateTimeField(
+                blank=True, help_text="Дата оплаты по данным Stripe", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Ожидает оплаты"),
+                    ("paid", "Оплачен"),
+                    ("failed", "Ошибка оплаты"),
+                    ("refunded", "Возвращен"),
+                ],
+                default="pending",
+                help_text="Статус оплаты (обновляется по webhook Stripe)",
+                max_length=10,
+            ),
+        ),
+        migrations.CreateModel(
+            name="StripeEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "event_id",
+                    models.CharField(
+                        help_text="ID события в Stripe", max_length=255, unique=True
+                    ),
+                ),
+                ("type", models.CharField(help_text="Тип события", max_length=100)),
+                (
+                    "payload",
+                    models.TextField(help_text="Тело запроса Stripe без изменений"),
+                ),
+                ("received_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "processed_at",
+                    models.DateTimeField(
+                        blank=True, help_text="Дата успешной обработки", null=True
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Количество попыток обработки"
+                    ),
+                ),
+                (
+                    "last_error",
+                    models.TextField(blank=True, help_text="Ошибка последней попытки"),
+                ),
+            ],
+            options={
+                "verbose_name": "Событие Stripe",
+                "verbose_name_plural": "События Stripe",
+                "ordering": ["-id"],
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("processed_at__isnull", True)),
+                        fields=["id"],
+                        name="stripe_event_pending_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0014_stripe_webhook_inbox"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CartLine",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "cart_id",
+                    models.CharField(help_text="ID корзины из cookie", max_length=64),
+                ),
+                ("quantity", models.PositiveIntegerField(default=1)),
+                ("updated_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="payments.item"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Строка корзины",
+                "verbose_name_plural": "Строки корзины",
+                "indexes": [
+                    models.Index(fields=["updated_at"], name="cart_line_updated_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("cart_id", "item"), name="cart_line_cart_item_uniq"
+                    )
+                ],
+            },
+        ),
+    ]
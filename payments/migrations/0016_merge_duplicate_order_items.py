@@ -0,0 +1,34 @@
+# Generated manually - миграция данных
+
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_order_items(apps, schema_editor):
+    """Объединяет повторяющиеся строки заказа с одним товаром.
+
+    Количество суммируется в строке с наименьшим ID, поэтому итоги
+    заказов не меняются.
+    """
+    OrderItem = apps.get_model("payments", "OrderItem")
+    duplicates = list(
+        OrderItem.objects.values("order_id", "item_id")
+        .annotate(lines=Count("id"), quantity_sum=Sum("quantity"), keep_id=Min("id"))
+        .filter(lines__gt=1)
+        .order_by()
+    )
+    for row in duplicates:
+        OrderItem.objects.filter(pk=row["keep_id"]).update(quantity=row["quantity_sum"])
+        OrderItem.objects.filter(
+            order_id=row["order_id"], item_id=row["item_id"]
+        ).exclude(pk=row["keep_id"]).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0015_cart_line"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_order_items, migrations.RunPython.noop),
+    ]
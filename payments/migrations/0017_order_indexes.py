@@ -0,0 +1,109 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Индексы, которые Django создал для внешних ключей Order.discount, Order.tax
+# и OrderItem.order
+FK_INDEXES = [
+    ("payments_order_discount_id_f51972c1", '"payments_order" ("discount_id")'),
+    ("payments_order_tax_id_19e026aa", '"payments_order" ("tax_id")'),
+    ("payments_orderitem_order_id_4cc4fe53", '"payments_orderitem" ("order_id")'),
+]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0016_merge_duplicate_order_items"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="order_created_at_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                condition=models.Q(("discount__isnull", False)),
+                fields=["discount", "-created_at", "-id"],
+                name="order_discount_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                condition=models.Q(("tax__isnull", False)),
+                fields=["tax", "-created_at", "-id"],
+                name="order_tax_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                condition=models.Q(("payment_intent_id", ""), _negated=True),
+                fields=["payment_intent_id"],
+                name="order_payment_intent_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="orderitem",
+            constraint=models.UniqueConstraint(
+                fields=("order", "item"), name="order_item_order_item_uniq"
+            ),
+        ),
+        # Индексы внешних ключей заменены индексами выше. AlterField
+        # пересоздал бы сами внешние ключи с проверкой всей таблицы,
+        # поэтому в БД удаляются только индексы
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="order",
+                    name="discount",
+                    field=models.ForeignKey(
+                        blank=True,
+                        db_index=False,
+                        help_text="Скидка на заказ",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="orders",
+                        to="payments.discount",
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="order",
+                    name="tax",
+                    field=models.ForeignKey(
+                        blank=True,
+                        db_index=False,
+                        help_text="Налог на заказ",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="orders",
+                        to="payments.tax",
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="orderitem",
+                    name="order",
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="order_items",
+                        to="payments.order",
+                    ),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    sql=[f'DROP INDEX IF EXISTS "{name}"' for name, _ in FK_INDEXES],
+                    reverse_sql=[
+                        f'CREATE INDEX "{name}" ON {columns}'
+                        for name, columns in FK_INDEXES
+                    ],
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0017_order_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogRevision",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("revision", models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Ревизия каталога",
+                "verbose_name_plural": "Ревизии каталога",
+            },
+        ),
+    ]
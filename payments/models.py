@@ -1,7 +1,71 @@
-from django.db import models
-
+from typing import Any
 
-class Item(models.Model):
+from django.db import models
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .pricing import (
+    OrderPricing,
+    converted_price_expression,
+    format_amount,
+    percent_amount_expression,
+    price_in_currency_expression,
+    price_order,
+)
+from .rates import RateTable, get_rate_table
+
+
+class PricingInputsTrackingMixin:
+    """Отслеживает изменения полей, от которых зависит стоимость заказов."""
+
+    PRICING_INPUT_FIELDS: tuple[str, ...] = ()
+
+    @classmethod
+    def from_db(cls, db: str | None, field_names: Any, values: Any) -> Any:
+        """Загружает объект и запоминает исходные значения полей."""
+        instance = super().from_db(db, field_names, values)
+        instance.mark_pricing_inputs_saved()
+        return instance
+
+    def _get_pricing_inputs(self) -> tuple[Any, ...]:
+        """Возвращает текущие значения отслеживаемых полей."""
+        return tuple(self.__dict__.get(field) for field in self.PRICING_INPUT_FIELDS)
+
+    def pricing_inputs_changed(self) -> bool:
+        """Проверяет, изменились ли отслеживаемые поля с момента загрузки."""
+        loaded = getattr(self, "_loaded_pricing_inputs", None)
+        return loaded != self._get_pricing_inputs()
+
+    def mark_pricing_inputs_saved(self) -> None:
+        """Запоминает текущие значения полей как сохраненные в БД."""
+        self._loaded_pricing_inputs = self._get_pricing_inputs()
+
+    def refresh_from_db(self, *args: Any, **kwargs: Any) -> None:
+        """Перечитывает объект из БД и обновляет исходные значения полей."""
+        super().refresh_from_db(*args, **kwargs)
+        self.mark_pricing_inputs_saved()
+
+
+class ItemQuerySet(models.QuerySet):
+    """QuerySet товаров с массовым пересчетом цен в валютах."""
+
+    def refresh_price_matrix(self, rates: RateTable | None = None) -> int:
+        """Пересчитывает цены в валютах для всех товаров выборки одним UPDATE."""
+        rates = rates or get_rate_table()
+        updated = self.update(
+            price_rate_version=rates.version,
+            **{
+                column: price_in_currency_expression(currency, rates)
+                for currency, column in Item.PRICE_COLUMNS.items()
+            },
+        )
+        if updated:
+            CatalogRevision.objects.bump()
+        return updated
+
+
+class Item(PricingInputsTrackingMixin, models.Model):
     """Модель товара для продажи через Stripe."""
 
     CURRENCY_CHOICES = [
@@ -19,28 +83,120 @@ class Item(models.Model):
         help_text="Валюта товара",
     )
 
+    price_usd = models.BigIntegerField(
+        default=0, help_text="Цена в центах USD (пересчитывается автоматически)"
+    )
+    price_eur = models.BigIntegerField(
+        default=0, help_text="Цена в центах EUR (пересчитывается автоматически)"
+    )
+    price_rate_version = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Версия курсов, по которой рассчитаны цены в валютах",
+    )
+
+    objects = ItemQuerySet.as_manager()
+
+    PRICING_INPUT_FIELDS = ("price", "currency")
+
+    # Денормализованные цены товара в каждой валюте оплаты
+    PRICE_COLUMNS = {"usd": "price_usd", "eur": "price_eur"}
+    PRICE_MATRIX_FIELDS = (*PRICE_COLUMNS.values(), "price_rate_version")
+
     def __str__(self) -> str:
         """Строковое представление товара."""
         return f"{self.name} - {self.get_display_price()}"
 
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        """Сохраняет товар, пересчитывая цены во всех валютах."""
+        self.refresh_price_matrix()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, *self.PRICE_MATRIX_FIELDS}
+        super().save(*args, **kwargs)
+
+    def refresh_price_matrix(self, rates: RateTable | None = None) -> None:
+        """Пересчитывает цены товара во всех валютах по текущим курсам."""
+        rates = rates or get_rate_table()
+        for currency, column in self.PRICE_COLUMNS.items():
+            setattr(self, column, rates.convert(self.price, self.currency, currency))
+        self.price_rate_version = rates.version
+
+    def get_price_in(self, currency: str, rates: RateTable | None = None) -> int:
+        """Возвращает цену товара в центах указанной валюты.
+
+        Цена берется из матрицы, если она рассчитана по текущей версии
+        курсов, иначе конвертируется на лету.
+        """
+        if currency == self.currency:
+            return self.price
+        rates = rates or get_rate_table()
+        column = self.PRICE_COLUMNS.get(currency)
+        if column is not None and self.price_rate_version == rates.version:
+            return getattr(self, column)
+        return rates.convert(self.price, self.currency, currency)
+
     def get_display_price(self) -> str:
         """Возвращает цену с валютой для отображения."""
-        symbol = "$" if self.currency == "usd" else "€"
-        return f"{symbol}{self.price / 100:.2f}"
+        return format_amount(self.price, self.currency)
 
     class Meta:
         verbose_name = "Товар"
         verbose_name_plural = "Товары"
-        ordering = ["name"]
+        ordering = ["name", "id"]
+        # Индексы под keyset-пагинацию каталога (payments.pagination.SORTS)
+        indexes = [
+            models.Index(fields=["name", "id"], name="item_name_id_idx"),
+            models.Index(fields=["price_usd", "id"], name="item_price_usd_id_idx"),
+            models.Index(
+                fields=["currency", "name", "id"], name="item_currency_name_id_idx"
+            ),
+        ]
+
+
+class CatalogRevisionQuerySet(models.QuerySet):
+    """QuerySet единственной строки с ревизией каталога."""
+
+    def current(self) -> int:
+        """Возвращает текущую ревизию каталога."""
+        return self.filter(pk=1).values_list("revision", flat=True).first() or 0
+
+    def bump(self) -> None:
+        """Увеличивает ревизию в текущей транзакции."""
+        if not self.filter(pk=1).update(revision=models.F("revision") + 1):
+            self.get_or_create(pk=1, defaults={"revision": 1})
+
+
+class CatalogRevision(models.Model):
+    """Ревизия каталога в БД для ETag API каталога.
+
+    В отличие от версии каталога в кеше, ревизия увеличивается в одной
+    транзакции с изменением товаров, одинакова для всех воркеров
+    и не сбрасывается при перезапуске или очистке кеша.
+    """
+
+    revision = models.PositiveBigIntegerField(default=0)
+
+    objects = CatalogRevisionQuerySet.as_manager()
+
+    def __str__(self) -> str:
+        """Строковое представление ревизии."""
+        return f"Ревизия каталога {self.revision}"
+
+    class Meta:
+        verbose_name = "Ревизия каталога"
+        verbose_name_plural = "Ревизии каталога"
 
 
-class Discount(models.Model):
+class Discount(PricingInputsTrackingMixin, models.Model):
     """Модель скидки для применения к заказам."""
 
     percent = models.DecimalField(
         max_digits=5, decimal_places=2, help_text="Процент скидки (например, 10.00)"
     )
 
+    PRICING_INPUT_FIELDS = ("percent",)
+
     def __str__(self) -> str:
         """Строковое представление скидки."""
         return f"Скидка {self.percent}%"
@@ -51,13 +207,15 @@ class Discount(models.Model):
         ordering = ["percent"]
 
 
-class Tax(models.Model):
+class Tax(PricingInputsTrackingMixin, models.Model):
     """Модель налога для применения к заказам."""
 
     percent = models.DecimalField(
         max_digits=5, decimal_places=2, help_text="Процент налога (например, 20.00)"
     )
 
+    PRICING_INPUT_FIELDS = ("percent",)
+
     def __str__(self) -> str:
         """Строковое представление налога."""
         return f"Налог {self.percent}%"
@@ -68,6 +226,149 @@ class Tax(models.Model):
         ordering = ["percent"]
 
 
+class ExchangeRate(models.Model):
+    """Курс пары валют, действующий с указанной даты."""
+
+    base_currency = models.CharField(max_length=3, help_text="Исходная валюта")
+    quote_currency = models.CharField(
+        max_length=3, help_text="Валюта, в которую выполняется конвертация"
+    )
+    rate = models.DecimalField(
+        max_digits=12,
+        decimal_places=6,
+        help_text="Сколько единиц quote_currency стоит единица base_currency",
+    )
+    effective_from = models.DateTimeField(
+        default=timezone.now, help_text="Дата начала действия курса"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        """Строковое представление курса."""
+        return (
+            f"1 {self.base_currency.upper()} = {self.rate} "
+            f"{self.quote_currency.upper()} с {self.effective_from:%d.%m.%Y %H:%M}"
+        )
+
+    class Meta:
+        verbose_name = "Курс валют"
+        verbose_name_plural = "Курсы валют"
+        ordering = ["-effective_from", "-id"]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(rate__gt=0), name="exchange_rate_positive"
+            ),
+        ]
+
+
+class StripeCoupon(models.Model):
+    """Купон Stripe, созданный для процента скидки и срока действия."""
+
+    DURATION_CHOICES = [
+        ("once", "Однократно"),
+        ("forever", "Бессрочно"),
+    ]
+
+    percent = models.DecimalField(
+        max_digits=5, decimal_places=2, help_text="Процент скидки купона"
+    )
+    duration = models.CharField(
+        max_length=10,
+        choices=DURATION_CHOICES,
+        default="once",
+        help_text="Срок действия купона в Stripe",
+    )
+    coupon_id = models.CharField(
+        max_length=64, unique=True, help_text="ID купона в Stripe"
+    )
+    name = models.CharField(max_length=40, blank=True, help_text="Название купона")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        """Строковое представление купона."""
+        return f"{self.coupon_id} ({self.percent}%, {self.duration})"
+
+    class Meta:
+        verbose_name = "Купон Stripe"
+        verbose_name_plural = "Купоны Stripe"
+        ordering = ["percent", "duration"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["percent", "duration"],
+                name="stripe_coupon_percent_duration_uniq",
+            ),
+        ]
+
+
+class StripeEvent(models.Model):
+    """Событие webhook Stripe во входящей очереди.
+
+    Событие сохраняется без изменений при приеме и обрабатывается
+    отдельно командой drain_webhooks.
+    """
+
+    event_id = models.CharField(
+        max_length=255, unique=True, help_text="ID события в Stripe"
+    )
+    type = models.CharField(max_length=100, help_text="Тип события")
+    payload = models.TextField(help_text="Тело запроса Stripe без изменений")
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(
+        null=True, blank=True, help_text="Дата успешной обработки"
+    )
+    attempts = models.PositiveIntegerField(
+        default=0, help_text="Количество попыток обработки"
+    )
+    last_error = models.TextField(blank=True, help_text="Ошибка последней попытки")
+
+    def __str__(self) -> str:
+        """Строковое представление события."""
+        return f"{self.type} {self.event_id}"
+
+    class Meta:
+        verbose_name = "Событие Stripe"
+        verbose_name_plural = "События Stripe"
+        ordering = ["-id"]
+        indexes = [
+            # Очередь необработанных событий, выбираемая обработчиком
+            models.Index(
+                fields=["id"],
+                condition=models.Q(processed_at__isnull=True),
+                name="stripe_event_pending_idx",
+            ),
+        ]
+
+
+class CartLine(models.Model):
+    """Строка корзины покупателя для хранилища DatabaseCartStore.
+
+    Каждая строка изменяется отдельным UPDATE, поэтому изменение
+    количества не переписывает всю корзину.
+    """
+
+    cart_id = models.CharField(max_length=64, help_text="ID корзины из cookie")
+    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self) -> str:
+        """Строковое представление строки корзины."""
+        return f"{self.cart_id}: {self.item_id} x {self.quantity}"
+
+    class Meta:
+        verbose_name = "Строка корзины"
+        verbose_name_plural = "Строки корзины"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cart_id", "item"], name="cart_line_cart_item_uniq"
+            ),
+        ]
+        indexes = [
+            # Удаление брошенных корзин командой clear_expired_carts
+            models.Index(fields=["updated_at"], name="cart_line_updated_idx"),
+        ]
+
+
 class OrderItem(models.Model):
     """Промежуточная модель для связи Order и Item с количеством."""
 
@@ -75,6 +376,7 @@ class OrderItem(models.Model):
         "Order",
         on_delete=models.CASCADE,
         related_name="order_items",
+        db_index=False,
     )
     item = models.ForeignKey(
         Item,
@@ -82,14 +384,102 @@ class OrderItem(models.Model):
     )
     quantity = models.PositiveIntegerField(default=1)
 
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        """Сохраняет строку и сбрасывает стоимость связанного заказа."""
+        super().save(*args, **kwargs)
+        self._invalidate_order_pricing()
+
+    def delete(self, *args: Any, **kwargs: Any) -> tuple[int, dict[str, int]]:
+        """Удаляет строку и сбрасывает стоимость связанного заказа."""
+        result = super().delete(*args, **kwargs)
+        self._invalidate_order_pricing()
+        return result
+
+    def _invalidate_order_pricing(self) -> None:
+        """Сбрасывает кеш стоимости заказа, если он уже загружен в память."""
+        if OrderItem.order.is_cached(self):
+            self.order.invalidate_pricing()
+
     class Meta:
         verbose_name = "Товар в заказе"
         verbose_name_plural = "Товары в заказе"
-
-
-class Order(models.Model):
+        constraints = [
+            # Индекс ограничения начинается с order и заменяет индекс внешнего
+            # ключа: по нему загружаются строки заказа
+            models.UniqueConstraint(
+                fields=["order", "item"], name="order_item_order_item_uniq"
+            ),
+        ]
+
+
+class OrderQuerySet(models.QuerySet):
+    """QuerySet заказов с расчетом стоимости на стороне БД."""
+
+    def unsettled(self) -> "OrderQuerySet":
+        """Заказы, сумма которых еще не зафиксирована оплатой."""
+        return self.exclude(status__in=Order.SETTLED_STATUSES)
+
+    def with_totals(self, rates: RateTable | None = None) -> "OrderQuerySet":
+        """Аннотирует заказы суммами, совпадающими с Order.get_*.
+
+        Добавляет calculated_subtotal, calculated_discount, calculated_tax
+        и calculated_total, рассчитанные одним SQL-запросом. Как и
+        Item.get_price_in, цена позиции берется из матрицы цен товаров
+        (Item.price_usd/price_eur), только если матрица рассчитана по
+        текущей версии курсов; иначе цена конвертируется в запросе.
+        """
+        rates = rates or get_rate_table()
+        unit_price = models.Case(
+            *(
+                models.When(
+                    payment_currency=currency,
+                    order_items__item__price_rate_version=rates.version,
+                    then=models.F(f"order_items__item__{column}"),
+                )
+                for currency, column in Item.PRICE_COLUMNS.items()
+            ),
+            default=converted_price_expression(
+                "order_items__item__price",
+                "order_items__item__currency",
+                "payment_currency",
+                rates,
+            ),
+            output_field=models.BigIntegerField(),
+        )
+        line_total = (
+            Cast("order_items__quantity", models.BigIntegerField()) * unit_price
+        )
+        subtotal = Cast(
+            Coalesce(models.Sum(line_total), models.Value(0)),
+            models.BigIntegerField(),
+        )
+        discount = percent_amount_expression(subtotal, "discount__percent")
+        tax = percent_amount_expression(subtotal - discount, "tax__percent")
+        return self.annotate(
+            calculated_subtotal=subtotal,
+            calculated_discount=discount,
+            calculated_tax=tax,
+            calculated_total=subtotal - discount + tax,
+        )
+
+
+class Order(PricingInputsTrackingMixin, models.Model):
     """Модель заказа, объединяющего несколько товаров."""
 
+    STATUS_PENDING = "pending"
+    STATUS_PAID = "paid"
+    STATUS_FAILED = "failed"
+    STATUS_REFUNDED = "refunded"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Ожидает оплаты"),
+        (STATUS_PAID, "Оплачен"),
+        (STATUS_FAILED, "Ошибка оплаты"),
+        (STATUS_REFUNDED, "Возвращен"),
+    ]
+    # Статусы, в которых сумма заказа зафиксирована платежом Stripe:
+    # хранимые итоги таких заказов больше не пересчитываются
+    SETTLED_STATUSES = (STATUS_PAID, STATUS_REFUNDED)
+
     items = models.ManyToManyField(
         Item,
         through="OrderItem",
@@ -108,6 +498,7 @@ class Order(models.Model):
         null=True,
         blank=True,
         related_name="orders",
+        db_index=False,
         help_text="Скидка на заказ",
     )
     tax = models.ForeignKey(
@@ -116,48 +507,118 @@ class Order(models.Model):
         null=True,
         blank=True,
         related_name="orders",
+        db_index=False,
         help_text="Налог на заказ",
     )
     created_at = models.DateTimeField(
         auto_now_add=True, help_text="Дата создания заказа"
     )
+    subtotal = models.IntegerField(
+        default=0, help_text="Сумма товаров в центах (пересчитывается автоматически)"
+    )
+    discount_amount = models.IntegerField(
+        default=0, help_text="Сумма скидки в центах (пересчитывается автоматически)"
+    )
+    tax_amount = models.IntegerField(
+        default=0, help_text="Сумма налога в центах (пересчитывается автоматически)"
+    )
+    total = models.IntegerField(
+        default=0, help_text="Итоговая сумма в центах (пересчитывается автоматически)"
+    )
+    rate_version = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Версия курсов валют, по которой рассчитаны итоги заказа",
+    )
+    payment_intent_id = models.CharField(
+        max_length=255, blank=True, help_text="ID Stripe Payment Intent заказа"
+    )
+    payment_intent_client_secret = models.CharField(
+        max_length=255, blank=True, help_text="client_secret Stripe Payment Intent"
+    )
+    payment_intent_amount = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text="Сумма в центах, на которую выставлен Payment Intent",
+    )
+    payment_intent_currency = models.CharField(
+        max_length=3, blank=True, help_text="Валюта Payment Intent"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        help_text="Статус оплаты (обновляется по webhook Stripe)",
+    )
+    paid_at = models.DateTimeField(
+        null=True, blank=True, help_text="Дата оплаты по данным Stripe"
+    )
+
+    objects = OrderQuerySet.as_manager()
+
+    # Поля, от которых зависит стоимость заказа
+    PRICING_INPUT_FIELDS = ("payment_currency", "discount_id", "tax_id")
 
     def __str__(self) -> str:
         """Строковое представление заказа."""
         return f"Заказ #{self.id} от {self.created_at.strftime('%d.%m.%Y')}"
 
+    @cached_property
+    def pricing(self) -> OrderPricing:
+        """Разбивка стоимости заказа, рассчитанная один раз на экземпляр."""
+        return price_order(self)
+
+    def invalidate_pricing(self) -> None:
+        """Сбрасывает закешированную разбивку стоимости."""
+        self.__dict__.pop("pricing", None)
+
+    @property
+    def is_settled(self) -> bool:
+        """Оплачен ли заказ: его сумма больше не меняется."""
+        return self.status in self.SETTLED_STATUSES
+
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        """Сохраняет заказ и сбрасывает закешированную стоимость.
+
+        Новый заказ запоминает текущую версию курсов валют.
+        """
+        if self._state.adding and self.rate_version is None:
+            self.rate_version = get_rate_table().version
+        super().save(*args, **kwargs)
+        self.invalidate_pricing()
+
+    def refresh_from_db(self, *args: Any, **kwargs: Any) -> None:
+        """Перечитывает заказ из БД и сбрасывает закешированную стоимость."""
+        super().refresh_from_db(*args, **kwargs)
+        self.invalidate_pricing()
+
     def get_subtotal(self) -> int:
         """Возвращает сумму товаров без скидок и налогов."""
-        from payments.views import convert_to_base_currency
-
-        subtotal = 0
-        for order_item in self.order_items.all():
-            converted_price = convert_to_base_currency(
-                order_item.item.price, order_item.item.currency, self.payment_currency
-            )
-            subtotal += converted_price * order_item.quantity
-        return int(subtotal)
+        if self.is_settled:
+            return self.subtotal
+        return self.pricing.subtotal
 
     def get_discount_amount(self) -> int:
         """Возвращает сумму скидки в центах."""
-        if not self.discount:
-            return 0
-        subtotal = self.get_subtotal()
-        return int(subtotal * (self.discount.percent / 100))
+        if self.is_settled:
+            return self.discount_amount
+        return self.pricing.discount_amount
 
     def get_tax_amount(self) -> int:
         """Возвращает сумму налога в центах."""
-        if not self.tax:
-            return 0
-        subtotal_after_discount = self.get_subtotal() - self.get_discount_amount()
-        return int(subtotal_after_discount * (self.tax.percent / 100))
+        if self.is_settled:
+            return self.tax_amount
+        return self.pricing.tax_amount
 
     def get_total_price(self) -> int:
-        """Возвращает общую стоимость заказа в центах."""
-        subtotal = self.get_subtotal()
-        discount = self.get_discount_amount()
-        tax = self.get_tax_amount()
-        return subtotal - discount + tax
+        """Возвращает общую стоимость заказа в центах.
+
+        Для оплаченного или возвращенного заказа это сохраненная сумма,
+        списанная Stripe, а не пересчет по сегодняшним ценам и курсам.
+        """
+        if self.is_settled:
+            return self.total
+        return self.pricing.total
 
     def get_currency(self) -> str:
         """Возвращает валюту оплаты заказа."""
@@ -165,33 +626,44 @@ class Order(models.Model):
 
     def get_display_subtotal(self) -> str:
         """Возвращает сумму товаров с валютой для отображения."""
-        subtotal = self.get_subtotal()
-        currency = self.get_currency()
-        symbol = "$" if currency == "usd" else "€"
-        return f"{symbol}{subtotal / 100:.2f}"
+        return format_amount(self.get_subtotal(), self.payment_currency)
 
     def get_display_discount(self) -> str:
         """Возвращает сумму скидки с валютой для отображения."""
-        discount = self.get_discount_amount()
-        currency = self.get_currency()
-        symbol = "$" if currency == "usd" else "€"
-        return f"{symbol}{discount / 100:.2f}"
+        return format_amount(self.get_discount_amount(), self.payment_currency)
 
     def get_display_tax(self) -> str:
         """Возвращает сумму налога с валютой для отображения."""
-        tax = self.get_tax_amount()
-        currency = self.get_currency()
-        symbol = "$" if currency == "usd" else "€"
-        return f"{symbol}{tax / 100:.2f}"
+        return format_amount(self.get_tax_amount(), self.payment_currency)
 
     def get_display_total(self) -> str:
         """Возвращает общую стоимость с валютой для отображения."""
-        total = self.get_total_price()
-        currency = self.get_currency()
-        symbol = "$" if currency == "usd" else "€"
-        return f"{symbol}{total / 100:.2f}"
+        return format_amount(self.get_total_price(), self.payment_currency)
 
     class Meta:
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
         ordering = ["-created_at"]
+        indexes = [
+            # Список заказов и фильтр по дате в админке; -id — порядок,
+            # который админка добавляет для однозначной сортировки
+            models.Index(fields=["-created_at", "-id"], name="order_created_at_idx"),
+            # Фильтры по скидке и налогу: у большинства заказов их нет,
+            # поэтому индексы частичные. Они же заменяют индексы внешних ключей
+            models.Index(
+                fields=["discount", "-created_at", "-id"],
+                condition=models.Q(discount__isnull=False),
+                name="order_discount_created_idx",
+            ),
+            models.Index(
+                fields=["tax", "-created_at", "-id"],
+                condition=models.Q(tax__isnull=False),
+                name="order_tax_created_idx",
+            ),
+            # Поиск заказа по Payment Intent в обработчиках webhook
+            models.Index(
+                fields=["payment_intent_id"],
+                condition=~models.Q(payment_intent_id=""),
+                name="order_payment_intent_idx",
+            ),
+        ]
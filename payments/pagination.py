@@ -0,0 +1,108 @@
+"""Keyset-пагинация каталога товаров с непрозрачными курсорами."""
+
+from dataclasses import dataclass
+from typing import Any
+
+from django.core import signing
+from django.db.models import Q, QuerySet
+
+from .models import Item
+
+# Допустимые сортировки: поля ключа, последнее поле всегда уникально.
+# Цена сравнивается в USD, чтобы товары в разных валютах шли вперемешку
+# по реальной стоимости. Каждой сортировке соответствует индекс Item.
+SORTS: dict[str, tuple[str, ...]] = {
+    "name": ("name", "id"),
+    "price": ("price_usd", "id"),
+    "-price": ("-price_usd", "-id"),
+    "currency": ("currency", "name", "id"),
+}
+
+DEFAULT_SORT = "name"
+
+CURSOR_SALT = "payments.catalog.cursor"
+
+
+class InvalidCursor(ValueError):
+    """Курсор поврежден или не относится к выбранной сортировке."""
+
+
+@dataclass(frozen=True)
+class CatalogPage:
+    """Страница каталога и курсор следующей страницы."""
+
+    items: list[Item]
+    sort: str
+    next_cursor: str | None
+
+
+def encode_cursor(sort: str, values: list[Any]) -> str:
+    """Упаковывает значения ключа последней строки в подписанный курсор."""
+    return signing.dumps([sort, *values], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor: str, sort: str) -> list[Any]:
+    """Распаковывает курсор и проверяет, что он выдан для этой сортировки."""
+    try:
+        payload = signing.loads(cursor, salt=CURSOR_SALT)
+    except signing.BadSignature as error:
+        raise InvalidCursor("Некорректный курсор") from error
+    fields = SORTS[sort]
+    if (
+        not isinstance(payload, list)
+        or len(payload) != len(fields) + 1
+        or payload[0] != sort
+    ):
+        raise InvalidCursor("Курсор не соответствует сортировке")
+    return payload[1:]
+
+
+def after_key_filter(fields: tuple[str, ...], values: list[Any]) -> Q:
+    """Строит условие «строка идет после ключа values» для сортировки fields.
+
+    Условие раскрывается в (a > x) OR (a = x AND b > y) ... и дополняется
+    границей a >= x, чтобы БД читала индекс диапазоном, а не целиком.
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(fields, values, strict=True):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+
+    leading = fields[0]
+    bound = "lte" if leading.startswith("-") else "gte"
+    return Q(**{f"{leading.lstrip('-')}__{bound}": values[0]}) & condition
+
+
+def paginate_items(
+    queryset: QuerySet[Item],
+    sort: str = DEFAULT_SORT,
+    cursor: str | None = None,
+    page_size: int = 50,
+) -> CatalogPage:
+    """Возвращает страницу товаров после курсора.
+
+    Стоимость запроса не зависит от номера страницы: БД находит начало
+    страницы по индексу и читает page_size + 1 строк.
+    """
+    if sort not in SORTS:
+        sort = DEFAULT_SORT
+    fields = SORTS[sort]
+
+    queryset = queryset.order_by(*fields)
+    if cursor:
+        queryset = queryset.filter(
+            after_key_filter(fields, decode_cursor(cursor, sort))
+        )
+
+    items = list(queryset[: page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(
+            sort, [getattr(last, field.lstrip("-")) for field in fields]
+        )
+    return CatalogPage(items=items, sort=sort, next_cursor=next_cursor)
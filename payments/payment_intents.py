@@ -0,0 +1,231 @@
+"""Stripe Payment Intent заказа: создание, повторное использование и обновление."""
+
+import hashlib
+import json
+import uuid
+from typing import Any
+
+import stripe
+
+from .models import Order
+from .pricing import OrderPricing
+from .stripe_calls import acall_stripe, call_stripe
+
+# Состояния Payment Intent, в которых его сумму еще можно изменить
+MODIFIABLE_STATUSES = frozenset(
+    {"requires_payment_method", "requires_confirmation", "requires_action"}
+)
+
+
+class OrderAlreadyPaid(Exception):
+    """Заказ оплачен или возвращен: новый платеж по нему не принимается."""
+
+
+def build_payment_metadata(order: Order, pricing: OrderPricing) -> dict[str, Any]:
+    """Собирает детальный metadata для Stripe Dashboard из разбивки заказа."""
+    return {
+        "order_id": order.id,
+        "items_count": pricing.items_count,
+        "subtotal": pricing.subtotal,
+        "discount_percent": (
+            float(pricing.discount_percent) if pricing.discount_percent else 0
+        ),
+        "discount_amount": pricing.discount_amount,
+        "tax_percent": float(pricing.tax_percent) if pricing.tax_percent else 0,
+        "tax_amount": pricing.tax_amount,
+        "total": pricing.total,
+        "currency": pricing.currency,
+    }
+
+
+def build_payment_intent_params(order: Order, pricing: OrderPricing) -> dict[str, Any]:
+    """Собирает параметры Stripe Payment Intent по разбивке заказа."""
+    payment_intent_params: dict[str, Any] = {
+        "amount": pricing.total,
+        "currency": pricing.currency,
+        "metadata": build_payment_metadata(order, pricing),
+        "automatic_payment_methods": {"enabled": True},
+    }
+
+    # Детальное описание
+    description_parts = [f"Заказ #{order.id}"]
+    if pricing.discount_percent is not None:
+        discount_text = (
+            f"Скидка: {pricing.discount_percent}% (-{pricing.display_discount})"
+        )
+        description_parts.append(discount_text)
+    if pricing.tax_percent is not None:
+        tax_text = f"Налог: {pricing.tax_percent}% (+{pricing.display_tax})"
+        description_parts.append(tax_text)
+    payment_intent_params["description"] = " | ".join(description_parts)
+    return payment_intent_params
+
+
+def params_digest(params: dict[str, Any]) -> str:
+    """Короткий хеш параметров запроса к Stripe."""
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def idempotency_key(order: Order, params: dict[str, Any], replaces: str = "") -> str:
+    """Ключ идемпотентности создания Payment Intent.
+
+    Повторные запросы и двойные клики с теми же параметрами схлопываются
+    в один Payment Intent на стороне Stripe. Хеш параметров входит в ключ,
+    поэтому другое описание или metadata при той же сумме не вызывают
+    ошибку идемпотентности. replaces — ID отмененного Intent, который
+    заменяет новый: иначе Stripe вернул бы сохраненный ответ с отмененным.
+    """
+    key = (
+        f"order-{order.pk}-payment-intent-{params['amount']}-{params['currency']}"
+        f"-{params_digest(params)}"
+    )
+    return f"{key}-replaces-{replaces}" if replaces else key
+
+
+def check_payable(order: Order) -> None:
+    """Проверяет, что заказ еще можно оплатить."""
+    if order.is_settled:
+        raise OrderAlreadyPaid(f"Заказ #{order.pk} уже оплачен")
+
+
+def stored_client_secret(order: Order, params: dict[str, Any]) -> str | None:
+    """Возвращает сохраненный client_secret, если Intent выставлен на ту же сумму."""
+    if (
+        order.payment_intent_id
+        and order.payment_intent_amount == params["amount"]
+        and order.payment_intent_currency == params["currency"]
+    ):
+        return order.payment_intent_client_secret
+    return None
+
+
+def create_params(
+    order: Order, params: dict[str, Any], replaces: str = ""
+) -> dict[str, Any]:
+    """Параметры создания нового Payment Intent."""
+    return {**params, "idempotency_key": idempotency_key(order, params, replaces)}
+
+
+def update_params(order: Order, params: dict[str, Any]) -> dict[str, Any]:
+    """Параметры обновления суммы существующего Payment Intent.
+
+    Обновление задает абсолютные значения, поэтому ключ уникален для
+    каждого вызова и защищает только его повторы: ключ из одних
+    параметров при возврате к прежней сумме вернул бы сохраненный ответ
+    Stripe вместо обновления.
+    """
+    update = {
+        "amount": params["amount"],
+        "currency": params["currency"],
+        "metadata": params["metadata"],
+        "description": params["description"],
+    }
+    return {
+        **update,
+        "idempotency_key": (
+            f"order-{order.pk}-payment-intent-{order.payment_intent_id}"
+            f"-update-{params_digest(update)}-{uuid.uuid4().hex[:8]}"
+        ),
+    }
+
+
+def can_modify(intent: Any) -> bool:
+    """Проверяет, что сумму существующего Intent можно изменить.
+
+    Для отмененного Intent возвращает False: вместо него создается новый.
+    Если платеж по Intent уже проведен или проводится, выбрасывает
+    OrderAlreadyPaid.
+    """
+    if intent.status == "canceled":
+        return False
+    if intent.status not in MODIFIABLE_STATUSES:
+        raise OrderAlreadyPaid(f"Платеж {intent.id} уже проводится")
+    return True
+
+
+def intent_fields(intent: Any, params: dict[str, Any]) -> dict[str, Any]:
+    """Значения полей заказа для сохранения Payment Intent."""
+    return {
+        "payment_intent_id": intent.id,
+        "payment_intent_client_secret": intent.client_secret,
+        "payment_intent_amount": params["amount"],
+        "payment_intent_currency": params["currency"],
+    }
+
+
+def _remember_intent(order: Order, fields: dict[str, Any]) -> None:
+    """Записывает данные Payment Intent в экземпляр заказа."""
+    for field, value in fields.items():
+        setattr(order, field, value)
+
+
+def ensure_payment_intent(order: Order, pricing: OrderPricing) -> str:
+    """Возвращает client_secret Payment Intent заказа.
+
+    Если Intent уже выставлен на текущую сумму, Stripe не вызывается.
+    Если сумма изменилась, Intent запрашивается у Stripe и обновляется,
+    пока по нему не начат платеж; вместо отмененного Intent, как и для
+    заказа без Intent, создается новый с ключом идемпотентности. Для
+    оплаченного заказа выбрасывается OrderAlreadyPaid.
+    """
+    check_payable(order)
+    params = build_payment_intent_params(order, pricing)
+    secret = stored_client_secret(order, params)
+    if secret is not None:
+        return secret
+
+    intent = None
+    replaces = ""
+    if order.payment_intent_id:
+        current = call_stripe(stripe.PaymentIntent.retrieve, order.payment_intent_id)
+        if can_modify(current):
+            intent = call_stripe(
+                stripe.PaymentIntent.modify,
+                order.payment_intent_id,
+                **update_params(order, params),
+            )
+        else:
+            replaces = current.id
+    if intent is None:
+        intent = call_stripe(
+            stripe.PaymentIntent.create, **create_params(order, params, replaces)
+        )
+
+    fields = intent_fields(intent, params)
+    Order.objects.filter(pk=order.pk).update(**fields)
+    _remember_intent(order, fields)
+    return intent.client_secret
+
+
+async def aensure_payment_intent(order: Order, pricing: OrderPricing) -> str:
+    """Асинхронная версия ensure_payment_intent."""
+    check_payable(order)
+    params = build_payment_intent_params(order, pricing)
+    secret = stored_client_secret(order, params)
+    if secret is not None:
+        return secret
+
+    intent = None
+    replaces = ""
+    if order.payment_intent_id:
+        current = await acall_stripe(
+            stripe.PaymentIntent.retrieve_async, order.payment_intent_id
+        )
+        if can_modify(current):
+            intent = await acall_stripe(
+                stripe.PaymentIntent.modify_async,
+                order.payment_intent_id,
+                **update_params(order, params),
+            )
+        else:
+            replaces = current.id
+    if intent is None:
+        intent = await acall_stripe(
+            stripe.PaymentIntent.create_async, **create_params(order, params, replaces)
+        )
+
+    fields = intent_fields(intent, params)
+    await Order.objects.filter(pk=order.pk).aupdate(**fields)
+    _remember_intent(order, fields)
+    return intent.client_secret
@@ -0,0 +1,293 @@
+"""Расчет стоимости заказов: конвертация валют и разбивка по суммам."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import TYPE_CHECKING
+
+from django.db.models import (
+    BigIntegerField,
+    Case,
+    Expression,
+    F,
+    FloatField,
+    IntegerField,
+    Q,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Coalesce, Floor, Round
+
+from .rates import RateTable, get_rate_table
+
+if TYPE_CHECKING:
+    from .models import Item, Order, OrderItem
+
+
+def convert_to_base_currency(
+    price: int, currency: str, base_currency: str, rates: RateTable | None = None
+) -> int:
+    """Конвертирует цену в базовую валюту.
+
+    Без явной таблицы используются курсы из кеша процесса, поэтому вызов
+    не обращается к БД.
+    """
+    if currency == base_currency:
+        return price
+    return (rates or get_rate_table()).convert(price, currency, base_currency)
+
+
+def converted_price_expression(
+    price: str, currency: str, target_currency: str, rates: RateTable | None = None
+) -> Expression:
+    """SQL-аналог convert_to_base_currency для полей price/currency.
+
+    Умножение и деление выполняются в double precision, как и в Python,
+    после чего дробная часть отбрасывается, поэтому результат совпадает
+    с convert_to_base_currency до цента.
+    """
+    rates = rates or get_rate_table()
+    float_price = Cast(F(price), FloatField())
+    direct = [
+        When(
+            Q(**{currency: base, target_currency: quote}),
+            then=Cast(Floor(float_price * Value(rate)), BigIntegerField()),
+        )
+        for (base, quote), rate in rates.rates.items()
+    ]
+    inverse = [
+        When(
+            Q(**{currency: quote, target_currency: base}),
+            then=Cast(Floor(float_price / Value(rate)), BigIntegerField()),
+        )
+        for (base, quote), rate in rates.rates.items()
+    ]
+    return Case(
+        When(
+            Q(**{currency: F(target_currency)}),
+            then=Cast(F(price), BigIntegerField()),
+        ),
+        *direct,
+        *inverse,
+        default=Cast(F(price), BigIntegerField()),
+        output_field=BigIntegerField(),
+    )
+
+
+def price_in_currency_expression(
+    target_currency: str,
+    rates: RateTable | None = None,
+    price: str = "price",
+    currency: str = "currency",
+) -> Expression:
+    """SQL-аналог convert_to_base_currency для фиксированной целевой валюты.
+
+    Используется для массового пересчета матрицы цен товаров одним UPDATE.
+    """
+    rates = rates or get_rate_table()
+    float_price = Cast(F(price), FloatField())
+    direct = [
+        When(
+            Q(**{currency: base}),
+            then=Cast(Floor(float_price * Value(rate)), BigIntegerField()),
+        )
+        for (base, quote), rate in rates.rates.items()
+        if quote == target_currency
+    ]
+    inverse = [
+        When(
+            Q(**{currency: quote}),
+            then=Cast(Floor(float_price / Value(rate)), BigIntegerField()),
+        )
+        for (base, quote), rate in rates.rates.items()
+        if base == target_currency
+    ]
+    return Case(
+        When(Q(**{currency: target_currency}), then=Cast(F(price), BigIntegerField())),
+        *direct,
+        *inverse,
+        default=Cast(F(price), BigIntegerField()),
+        output_field=BigIntegerField(),
+    )
+
+
+def percent_amount_expression(amount: Expression, percent: str) -> Expression:
+    """SQL-аналог int(amount * (percent / 100)) для неотрицательных сумм.
+
+    Процент переводится в целые базисные пункты, и расчет ведется
+    целочисленным делением, чтобы результат не зависел от округления
+    numeric/real в конкретной СУБД.
+    """
+    basis_points = Coalesce(
+        Cast(Round(F(percent) * Value(100)), IntegerField()), Value(0)
+    )
+    return Cast(amount * basis_points, BigIntegerField()) / Value(10000)
+
+
+def format_amount(amount: int, currency: str) -> str:
+    """Форматирует сумму в центах с символом валюты."""
+    symbol = "$" if currency == "usd" else "€"
+    return f"{symbol}{amount / 100:.2f}"
+
+
+def calculate_adjustments(
+    subtotal: int,
+    discount_percent: Decimal | None,
+    tax_percent: Decimal | None,
+) -> tuple[int, int]:
+    """Возвращает суммы скидки и налога для subtotal.
+
+    Налог начисляется на сумму после скидки, дробная часть отбрасывается.
+    """
+    discount_amount = 0
+    if discount_percent is not None:
+        discount_amount = int(subtotal * (discount_percent / 100))
+
+    tax_amount = 0
+    if tax_percent is not None:
+        tax_amount = int((subtotal - discount_amount) * (tax_percent / 100))
+
+    return discount_amount, tax_amount
+
+
+@dataclass(frozen=True)
+class PricedLine:
+    """Строка заказа или корзины с ценой, пересчитанной в валюту оплаты."""
+
+    order_item: OrderItem | None
+    item: Item
+    quantity: int
+    unit_price: int
+    total: int
+    converted: bool
+
+
+@dataclass(frozen=True)
+class OrderPricing:
+    """Неизменяемая разбивка стоимости заказа."""
+
+    currency: str
+    rate_version: int
+    lines: tuple[PricedLine, ...]
+    subtotal: int
+    discount_percent: Decimal | None
+    discount_amount: int
+    tax_percent: Decimal | None
+    tax_amount: int
+    total: int
+
+    @property
+    def items_count(self) -> int:
+        """Количество позиций в заказе."""
+        return len(self.lines)
+
+    @property
+    def display_subtotal(self) -> str:
+        """Сумма товаров с валютой для отображения."""
+        return format_amount(self.subtotal, self.currency)
+
+    @property
+    def display_discount(self) -> str:
+        """Сумма скидки с валютой для отображения."""
+        return format_amount(self.discount_amount, self.currency)
+
+    @property
+    def display_tax(self) -> str:
+        """Сумма налога с валютой для отображения."""
+        return format_amount(self.tax_amount, self.currency)
+
+    @property
+    def display_total(self) -> str:
+        """Общая стоимость с валютой для отображения."""
+        return format_amount(self.total, self.currency)
+
+
+@dataclass(frozen=True)
+class CartPricing:
+    """Неизменяемый расчет стоимости корзины."""
+
+    currency: str
+    rate_version: int
+    lines: tuple[PricedLine, ...]
+    total: int
+
+    @property
+    def items_count(self) -> int:
+        """Общее количество единиц товара в корзине."""
+        return sum(line.quantity for line in self.lines)
+
+
+def price_line(
+    item: Item,
+    quantity: int,
+    currency: str,
+    rates: RateTable,
+    order_item: OrderItem | None = None,
+) -> PricedLine:
+    """Рассчитывает стоимость строки в валюте оплаты.
+
+    Общая точка расчета для корзины и заказа, поэтому их суммы совпадают.
+    """
+    unit_price = item.get_price_in(currency, rates)
+    return PricedLine(
+        order_item=order_item,
+        item=item,
+        quantity=quantity,
+        unit_price=unit_price,
+        total=unit_price * quantity,
+        converted=item.currency != currency,
+    )
+
+
+def price_cart(entries: Iterable[tuple[Item, int]], currency: str) -> CartPricing:
+    """Рассчитывает стоимость корзины по парам (товар, количество)."""
+    rates = get_rate_table()
+    lines = tuple(
+        price_line(item, quantity, currency, rates) for item, quantity in entries
+    )
+    return CartPricing(
+        currency=currency,
+        rate_version=rates.version,
+        lines=lines,
+        total=sum(line.total for line in lines),
+    )
+
+
+def _load_order_items(order: Order) -> list[OrderItem]:
+    """Загружает строки заказа вместе с товарами одним запросом."""
+    prefetched = getattr(order, "_prefetched_objects_cache", {})
+    if "order_items" in prefetched:
+        return list(order.order_items.all())
+    return list(order.order_items.select_related("item"))
+
+
+def price_order(order: Order) -> OrderPricing:
+    """Рассчитывает полную разбивку стоимости заказа за один проход."""
+    currency = order.payment_currency
+    rates = get_rate_table()
+
+    lines = [
+        price_line(order_item.item, order_item.quantity, currency, rates, order_item)
+        for order_item in _load_order_items(order)
+    ]
+    subtotal = int(sum(line.total for line in lines))
+
+    discount_percent = order.discount.percent if order.discount else None
+    tax_percent = order.tax.percent if order.tax else None
+    discount_amount, tax_amount = calculate_adjustments(
+        subtotal, discount_percent, tax_percent
+    )
+
+    return OrderPricing(
+        currency=currency,
+        rate_version=rates.version,
+        lines=tuple(lines),
+        subtotal=subtotal,
+        discount_percent=discount_percent,
+        discount_amount=discount_amount,
+        tax_percent=tax_percent,
+        tax_amount=tax_amount,
+        total=subtotal - discount_amount + tax_amount,
+    )
@@ -0,0 +1,288 @@
+"""Курсы валют: провайдеры и кеш курсов в памяти процесса."""
+
+import json
+import logging
+import threading
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DatabaseError, connections
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Курсы по умолчанию: используются, пока в источнике курсов нет своего
+# значения для пары
+DEFAULT_RATES: dict[tuple[str, str], float] = {("eur", "usd"): 1.1}
+
+
+@dataclass(frozen=True)
+class RateEntry:
+    """Запись о курсе пары валют, действующем с указанной даты."""
+
+    id: int
+    base_currency: str
+    quote_currency: str
+    rate: Decimal
+    effective_from: datetime
+
+
+@dataclass(frozen=True)
+class RateTable:
+    """Снимок курсов валют на определенную версию.
+
+    rates[(base, quote)] — сколько единиц quote за единицу base.
+    Версия 0 означает встроенные курсы по умолчанию.
+    """
+
+    version: int
+    rates: MappingProxyType = field(
+        default_factory=lambda: MappingProxyType(dict(DEFAULT_RATES))
+    )
+
+    def convert(self, price: int, currency: str, target_currency: str) -> int:
+        """Конвертирует цену по курсам таблицы, отбрасывая дробную часть."""
+        if currency == target_currency:
+            return price
+
+        rate = self.rates.get((currency, target_currency))
+        if rate is not None:
+            return int(price * rate)
+
+        inverse = self.rates.get((target_currency, currency))
+        if inverse is not None:
+            return int(price / inverse)
+
+        return price
+
+
+def build_rate_table(
+    entries: Iterable[RateEntry], now: datetime | None = None
+) -> RateTable:
+    """Собирает таблицу курсов, действующих на момент now.
+
+    Для каждой пары берется запись с наибольшей датой начала действия.
+    Версией таблицы считается ID последней вступившей в силу записи.
+    """
+    now = now or timezone.now()
+    rates = dict(DEFAULT_RATES)
+    version = 0
+    effective = [entry for entry in entries if entry.effective_from <= now]
+    for entry in sorted(effective, key=lambda e: (e.effective_from, e.id)):
+        rates[(entry.base_currency, entry.quote_currency)] = float(entry.rate)
+        version = entry.id
+    return RateTable(version=version, rates=MappingProxyType(rates))
+
+
+class RateProvider:
+    """Базовый класс источника курсов валют."""
+
+    def load(self) -> RateTable:
+        """Загружает актуальную таблицу курсов."""
+        raise NotImplementedError
+
+
+class DatabaseRateProvider(RateProvider):
+    """Источник курсов из таблицы ExchangeRate."""
+
+    def load(self) -> RateTable:
+        """Загружает курсы из БД одним запросом."""
+        from .models import ExchangeRate
+
+        rows = ExchangeRate.objects.filter(effective_from__lte=timezone.now())
+        return build_rate_table(
+            RateEntry(
+                id=row.id,
+                base_currency=row.base_currency,
+                quote_currency=row.quote_currency,
+                rate=row.rate,
+                effective_from=row.effective_from,
+            )
+            for row in rows
+        )
+
+
+class FileRateProvider(RateProvider):
+    """Источник курсов из JSON-файла для работы без внешних сервисов.
+
+    Формат файла::
+
+        {"rates": [
+            {"base": "eur", "quote": "usd", "rate": "1.1",
+             "effective_from": "2025-01-01T00:00:00Z"}
+        ]}
+
+    Версией записи считается ее порядковый номер в файле, начиная с 1.
+    """
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        self.path = Path(path or settings.EXCHANGE_RATE_FILE)
+
+    def load(self) -> RateTable:
+        """Читает курсы из файла."""
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        return build_rate_table(
+            RateEntry(
+                id=position,
+                base_currency=row["base"].lower(),
+                quote_currency=row["quote"].lower(),
+                rate=Decimal(str(row["rate"])),
+                effective_from=_parse_effective_from(row.get("effective_from")),
+            )
+            for position, row in enumerate(data["rates"], start=1)
+        )
+
+
+def _parse_effective_from(value: str | None) -> datetime:
+    """Разбирает дату начала действия курса из файла."""
+    if not value:
+        return datetime.min.replace(tzinfo=timezone.get_current_timezone())
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Некорректная дата курса: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class RateCache:
+    """Кеш таблицы курсов в памяти процесса с TTL.
+
+    Пока таблица моложе ttl, она отдается без обращения к источнику.
+    В течение stale_ttl после истечения ttl отдается устаревшая таблица,
+    а обновление выполняется в фоновом потоке (stale-while-revalidate).
+    Если таблица старше ttl + stale_ttl, она обновляется синхронно.
+    После ошибки источника следующая синхронная попытка выполняется
+    не раньше чем через error_ttl секунд, а до тех пор отдается последняя
+    таблица или курсы по умолчанию: недоступная БД не выстраивает
+    все запросы в очередь за блокировкой кеша.
+    """
+
+    def __init__(
+        self,
+        provider: RateProvider,
+        ttl: float,
+        stale_ttl: float,
+        error_ttl: float = 10,
+    ) -> None:
+        self.provider = provider
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.error_ttl = error_ttl
+        self._table: RateTable | None = None
+        self._loaded_at = 0.0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self) -> RateTable:
+        """Возвращает актуальную таблицу курсов."""
+        table = self._table
+        if table is not None:
+            age = time.monotonic() - self._loaded_at
+            if age < self.ttl:
+                return table
+            if age < self.ttl + self.stale_ttl:
+                self._refresh_in_background()
+                return table
+        with self._lock:
+            if time.monotonic() < self._retry_at:
+                return self._fallback()
+            return self._load()
+
+    def refresh(self) -> RateTable:
+        """Синхронно перечитывает курсы из источника."""
+        with self._lock:
+            return self._load()
+
+    def _load(self) -> RateTable:
+        """Загружает курсы из источника; вызывается под блокировкой."""
+        try:
+            table = self.provider.load()
+        except (DatabaseError, OSError, ValueError, KeyError):
+            logger.exception("Не удалось загрузить курсы валют")
+            self._retry_at = time.monotonic() + self.error_ttl
+            return self._fallback()
+        self._retry_at = 0.0
+        self._store(table)
+        return table
+
+    def _fallback(self) -> RateTable:
+        """Последняя загруженная таблица или курсы по умолчанию."""
+        return self._table or RateTable(version=0)
+
+    def invalidate(self) -> None:
+        """Сбрасывает кеш, следующее обращение перечитает курсы."""
+        with self._lock:
+            self._table = None
+
+    def _store(self, table: RateTable) -> None:
+        """Сохраняет таблицу и время загрузки."""
+        self._table = table
+        self._loaded_at = time.monotonic()
+
+    def _refresh_in_background(self) -> None:
+        """Запускает фоновое обновление, если оно еще не выполняется."""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self) -> None:
+        """Обновляет курсы в фоновом потоке."""
+        try:
+            self.refresh()
+        finally:
+            self._refreshing = False
+            connections.close_all()
+
+
+_cache: RateCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_rate_cache() -> RateCache:
+    """Возвращает кеш курсов текущего процесса, создавая его при необходимости."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                provider_class = import_string(settings.EXCHANGE_RATE_PROVIDER)
+                _cache = RateCache(
+                    provider_class(),
+                    ttl=settings.EXCHANGE_RATE_CACHE_TTL,
+                    stale_ttl=settings.EXCHANGE_RATE_STALE_TTL,
+                    error_ttl=settings.EXCHANGE_RATE_ERROR_TTL,
+                )
+    return _cache
+
+
+def get_rate_table() -> RateTable:
+    """Возвращает текущую таблицу курсов из кеша процесса."""
+    return get_rate_cache().get()
+
+
+def reset_rate_cache() -> None:
+    """Удаляет кеш курсов, например после изменения настроек."""
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+@receiver(setting_changed)
+def rate_settings_changed(setting: str, **kwargs: Any) -> None:  # noqa: ARG001
+    """Пересоздает кеш курсов при изменении настроек EXCHANGE_RATE_*."""
+    if setting.startswith("EXCHANGE_RATE_"):
+        reset_rate_cache()
@@ -0,0 +1,187 @@
+"""Компактный сериализатор сессий с метриками размера и времени.
+
+Формат версии 1::
+
+    байт версии
+    varint — число упакованных корзин
+    для каждой корзины: ключ сессии (varint длины и UTF-8), код ширины
+        чисел struct (H, I или Q), varint числа строк и пары
+        (ID товара, количество) в little-endian
+    остальные ключи сессии в компактном JSON
+
+Корзина вида {"ID товара": {"quantity": n}} занимает 4 байта на строку
+при ID меньше 65536 вместо повторения ключей JSON в каждой строке.
+Сессии, сохраненные стандартным JSONSerializer, читаются как раньше
+и при следующем сохранении записываются в новом формате.
+"""
+
+import json
+import re
+import struct
+import time
+from typing import Any
+
+from .metrics import registry
+
+FORMAT_VERSION = 1
+
+_HEADER = bytes([FORMAT_VERSION])
+
+# JSONSerializer всегда сохраняет словарь сессии, поэтому данные
+# в старом формате начинаются с "{"
+_JSON_PREFIX = b"{"
+
+# Ширина чисел в строках корзины: код struct и предельное значение
+_CART_WIDTHS = (("H", 1 << 16), ("I", 1 << 32), ("Q", 1 << 64))
+
+_CART_CODES = {ord(code): code for code, _ in _CART_WIDTHS}
+
+_CART_CODES_SIZE = {ord(code): struct.calcsize(code) for code, _ in _CART_WIDTHS}
+
+# Ключи корзины — ID товаров в каноническом виде: их можно записать
+# числами и восстановить без потерь
+_CART_KEYS_RE = re.compile(r"(?:0|[1-9][0-9]*)(?:,(?:0|[1-9][0-9]*))*")
+
+_JSON_ENCODER = json.JSONEncoder(separators=(",", ":"))
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _cart_pairs(value: Any) -> list[int] | None:
+    """Возвращает плоский список пар (ID товара, количество) для корзины.
+
+    None, если значение не корзина или его нельзя упаковать без потерь.
+    """
+    if type(value) is not dict or not value:
+        return None
+    keys = list(value)
+    try:
+        if not _CART_KEYS_RE.fullmatch(",".join(keys)):
+            return None
+        ids = list(map(int, keys))
+        quantities = [line["quantity"] for line in value.values()]
+    except (TypeError, ValueError, KeyError):
+        return None
+    if (
+        sum(map(len, value.values())) != len(keys)
+        or set(map(type, quantities)) != {int}
+        or min(quantities) < 0
+    ):
+        return None
+    pairs = [0] * (len(ids) * 2)
+    pairs[::2] = ids
+    pairs[1::2] = quantities
+    return pairs
+
+
+def _pack_cart(out: bytearray, key: str, pairs: list[int]) -> bool:
+    """Дописывает корзину в out; False, если числа не помещаются в Q."""
+    largest = max(pairs)
+    for code, limit in _CART_WIDTHS:
+        if largest < limit:
+            encoded = key.encode()
+            _write_varint(out, len(encoded))
+            out += encoded
+            out.append(ord(code))
+            _write_varint(out, len(pairs) // 2)
+            out += struct.pack(f"<{len(pairs)}{code}", *pairs)
+            return True
+    return False
+
+
+def encode_session(session: dict[str, Any]) -> bytes:
+    """Кодирует словарь сессии в формат версии FORMAT_VERSION."""
+    carts = bytearray()
+    packed = set()
+    for key, value in session.items():
+        pairs = _cart_pairs(value)
+        if pairs and _pack_cart(carts, key, pairs):
+            packed.add(key)
+    rest = (
+        {key: value for key, value in session.items() if key not in packed}
+        if packed
+        else session
+    )
+    out = bytearray(_HEADER)
+    _write_varint(out, len(packed))
+    out += carts
+    out += _JSON_ENCODER.encode(rest).encode()
+    return bytes(out)
+
+
+def decode_session(data: bytes) -> dict[str, Any]:
+    """Декодирует сессию, записанную encode_session."""
+    count, pos = _read_varint(data, 1)
+    carts = {}
+    for _ in range(count):
+        length, pos = _read_varint(data, pos)
+        key = data[pos : pos + length].decode()
+        code = data[pos + length]
+        if code not in _CART_CODES:
+            raise ValueError(f"Неизвестная ширина строк корзины в ключе {key!r}")
+        lines, pos = _read_varint(data, pos + length + 1)
+        pairs = struct.unpack_from(f"<{lines * 2}{_CART_CODES[code]}", data, pos)
+        pos += lines * 2 * _CART_CODES_SIZE[code]
+        carts[key] = {
+            item_id: {"quantity": quantity}
+            for item_id, quantity in zip(map(str, pairs[::2]), pairs[1::2], strict=True)
+        }
+    session = json.loads(data[pos:].decode())
+    session.update(carts)
+    return session
+
+
+class CompactSessionSerializer:
+    """Сериализатор для SESSION_SERIALIZER.
+
+    Пишет сессии в формате encode_session и читает как его, так и JSON
+    стандартного сериализатора Django. В метрики воркера попадают время
+    кодирования и декодирования (sessions.encode, sessions.decode),
+    суммарный размер данных (sessions.encoded_bytes, sessions.decoded_bytes)
+    и число прочитанных сессий в старом формате (sessions.legacy_json).
+    """
+
+    # Время измеряется без registry.timer: сериализация выполняется
+    # на каждом запросе с сессией, и контекстный менеджер заметен на фоне
+    # самой операции
+
+    def dumps(self, obj: dict[str, Any]) -> bytes:
+        """Кодирует словарь сессии."""
+        started = time.perf_counter()
+        data = encode_session(obj)
+        registry.observe("sessions.encode", time.perf_counter() - started)
+        registry.increment("sessions.encoded_bytes", len(data))
+        return data
+
+    def loads(self, data: bytes) -> dict[str, Any]:
+        """Декодирует сессию в текущем или старом JSON-формате."""
+        started = time.perf_counter()
+        if data[:1] == _JSON_PREFIX:
+            registry.increment("sessions.legacy_json")
+            session = json.loads(data.decode("latin-1"))
+        elif data[:1] == _HEADER:
+            try:
+                session = decode_session(data)
+            except (IndexError, struct.error, UnicodeDecodeError) as e:
+                raise ValueError("Поврежденные данные сессии") from e
+        else:
+            raise ValueError(f"Неизвестная версия формата сессии: {data[:1]!r}")
+        registry.observe("sessions.decode", time.perf_counter() - started)
+        registry.increment("sessions.decoded_bytes", len(data))
+        return session
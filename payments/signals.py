@@ -0,0 +1,130 @@
+"""Обработчики сигналов, поддерживающие хранимые итоги заказов."""
+
+from typing import Any
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version
+from .coupons import get_coupon_registry
+from .models import (
+    CatalogRevision,
+    Discount,
+    ExchangeRate,
+    Item,
+    Order,
+    OrderItem,
+    StripeCoupon,
+    Tax,
+)
+from .rates import get_rate_cache
+from .totals import recalculate_order_totals, recalculate_orders_by_id
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def order_item_changed(instance: OrderItem, **kwargs: Any) -> None:
+    """Пересчитывает итоги заказа при изменении его позиций."""
+    if kwargs.get("raw"):
+        return
+    if OrderItem.order.is_cached(instance):
+        order = instance.order
+    else:
+        order = Order.objects.filter(pk=instance.order_id).first()
+    if order is not None:
+        recalculate_order_totals(order)
+
+
+@receiver(post_save, sender=Order)
+def order_saved(instance: Order, created: bool, **kwargs: Any) -> None:
+    """Пересчитывает итоги, если изменились валюта, скидка или налог."""
+    if kwargs.get("raw"):
+        return
+    if not created and instance.pricing_inputs_changed():
+        recalculate_order_totals(instance)
+    instance.mark_pricing_inputs_saved()
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_save, sender=Discount)
+@receiver(post_save, sender=Tax)
+def pricing_source_saved(
+    instance: Item | Discount | Tax, created: bool, **kwargs: Any
+) -> None:
+    """Пересчитывает итоги неоплаченных заказов с измененным товаром, скидкой или налогом."""
+    if kwargs.get("raw"):
+        return
+    if not created and instance.pricing_inputs_changed():
+        recalculate_orders_by_id(_affected_order_ids(instance))
+    instance.mark_pricing_inputs_saved()
+
+
+@receiver(pre_delete, sender=Discount)
+@receiver(pre_delete, sender=Tax)
+def pricing_source_deleting(
+    instance: Discount | Tax,
+    **kwargs: Any,  # noqa: ARG001
+) -> None:
+    """Запоминает заказы, которые потеряют скидку или налог при удалении."""
+    instance._affected_order_ids = list(_affected_order_ids(instance))
+
+
+@receiver(post_delete, sender=Discount)
+@receiver(post_delete, sender=Tax)
+def pricing_source_deleted(
+    instance: Discount | Tax,
+    **kwargs: Any,  # noqa: ARG001
+) -> None:
+    """Пересчитывает итоги заказов после удаления скидки или налога."""
+    recalculate_orders_by_id(getattr(instance, "_affected_order_ids", []))
+
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def exchange_rate_changed(**kwargs: Any) -> None:
+    """Сбрасывает кеш курсов и пересчитывает цены товаров.
+
+    Хранимые итоги заказов здесь не пересчитываются: это пакетная работа
+    команды apply_exchange_rates, которая не должна выполняться
+    в запросе админки.
+    """
+    if kwargs.get("raw"):
+        return
+    get_rate_cache().invalidate()
+    Item.objects.refresh_price_matrix()
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def catalog_changed(**kwargs: Any) -> None:
+    """Обновляет ревизию и версию каталога после любого изменения товара."""
+    if kwargs.get("raw"):
+        return
+    CatalogRevision.objects.bump()
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=StripeCoupon)
+@receiver(post_delete, sender=StripeCoupon)
+def stripe_coupon_changed(**kwargs: Any) -> None:  # noqa: ARG001
+    """Сбрасывает кеш купонов воркера при изменении реестра."""
+    get_coupon_registry().invalidate()
+
+
+def _affected_order_ids(instance: Item | Discount | Tax) -> list[int]:
+    """Возвращает ID неоплаченных заказов, стоимость которых зависит от объекта.
+
+    Итоги оплаченных и возвращенных заказов совпадают с суммой платежа
+    и при изменении цен не пересчитываются.
+    """
+    if isinstance(instance, Item):
+        orders = (
+            OrderItem.objects.filter(item=instance)
+            .exclude(order__status__in=Order.SETTLED_STATUSES)
+            .values_list("order_id", flat=True)
+        )
+    else:
+        orders = instance.orders.unsettled().values_list("pk", flat=True)
+    return list(orders.distinct())
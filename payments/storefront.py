@@ -0,0 +1,144 @@
+"""Кеш страниц каталога на главной с перестроением в один поток."""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+from django.utils.safestring import SafeString, mark_safe
+
+from .catalog import get_catalog_version
+from .models import Item
+from .pagination import paginate_items
+
+STOREFRONT_KEY_PREFIX = "payments:storefront"
+
+ITEMS_TEMPLATE = "payments/items_grid.html"
+
+# Сколько последних страниц воркер держит в памяти для отдачи во время
+# перестроения
+STALE_PAGES_LIMIT = 128
+
+# Число блокировок перестроения: страница берет блокировку по хешу своего
+# ключа, поэтому их набор не растет с числом курсоров
+REBUILD_LOCK_STRIPES = 32
+
+
+def page_key(sort: str, cursor: str | None) -> str:
+    """Возвращает ключ страницы каталога без учета версии."""
+    digest = hashlib.md5((cursor or "").encode(), usedforsecurity=False).hexdigest()
+    return f"{sort}:{digest}"
+
+
+def storefront_cache_key(version: int, sort: str, cursor: str | None) -> str:
+    """Возвращает ключ кеша страницы каталога для версии каталога."""
+    return f"{STOREFRONT_KEY_PREFIX}:{version}:{page_key(sort, cursor)}"
+
+
+def render_items(sort: str, cursor: str | None) -> SafeString:
+    """Рендерит страницу каталога одним запросом к БД."""
+    page = paginate_items(
+        Item.objects.only(
+            "id", "name", "description", "price", "currency", "price_usd"
+        ),
+        sort=sort,
+        cursor=cursor,
+        page_size=settings.CATALOG_PAGE_SIZE,
+    )
+    return render_to_string(ITEMS_TEMPLATE, {"page": page})
+
+
+class StorefrontCache:
+    """Отрендеренные страницы каталога в общем кеше, ключ — версия каталога.
+
+    При промахе страницу перестраивает только один поток воркера, остальные
+    в это время получают последнюю отрендеренную копию этой страницы.
+    Если копии еще нет, они ждут завершения перестроения. Страницы делят
+    REBUILD_LOCK_STRIPES блокировок, так что две страницы иногда ждут
+    друг друга, зато курсоры из запросов не копят блокировки в памяти.
+    """
+
+    def __init__(self, timeout: int) -> None:
+        self.timeout = timeout
+        self._stale: OrderedDict[str, SafeString] = OrderedDict()
+        self._locks = tuple(threading.Lock() for _ in range(REBUILD_LOCK_STRIPES))
+        self._guard = threading.Lock()
+
+    def get(self, sort: str, cursor: str | None = None) -> SafeString:
+        """Возвращает HTML страницы каталога для текущей версии каталога."""
+        page = page_key(sort, cursor)
+        key = storefront_cache_key(get_catalog_version(), sort, cursor)
+        html = cache.get(key)
+        if html is not None:
+            return self._remember(page, mark_safe(html))
+
+        lock = self._lock_for(page)
+        if lock.acquire(blocking=False):
+            try:
+                return self._rebuild(key, page, sort, cursor)
+            finally:
+                lock.release()
+
+        stale = self._stale.get(page)
+        if stale is not None:
+            return stale
+
+        with lock:
+            html = cache.get(key)
+            if html is not None:
+                return self._remember(page, mark_safe(html))
+            return self._rebuild(key, page, sort, cursor)
+
+    def _lock_for(self, page: str) -> threading.Lock:
+        """Возвращает блокировку перестроения страницы из фиксированного набора."""
+        return self._locks[hash(page) % len(self._locks)]
+
+    def _remember(self, page: str, html: SafeString) -> SafeString:
+        """Запоминает последнюю копию страницы, вытесняя самые старые."""
+        with self._guard:
+            self._stale[page] = html
+            self._stale.move_to_end(page)
+            while len(self._stale) > STALE_PAGES_LIMIT:
+                self._stale.popitem(last=False)
+        return html
+
+    def _rebuild(
+        self, key: str, page: str, sort: str, cursor: str | None
+    ) -> SafeString:
+        """Рендерит страницу каталога и сохраняет ее в кеш."""
+        html = render_items(sort, cursor)
+        cache.set(key, str(html), self.timeout)
+        return self._remember(page, html)
+
+
+_storefront: StorefrontCache | None = None
+_storefront_lock = threading.Lock()
+
+
+def get_storefront_cache() -> StorefrontCache:
+    """Возвращает кеш страниц каталога текущего процесса."""
+    global _storefront
+    if _storefront is None:
+        with _storefront_lock:
+            if _storefront is None:
+                _storefront = StorefrontCache(timeout=settings.STOREFRONT_CACHE_TIMEOUT)
+    return _storefront
+
+
+def reset_storefront_cache() -> None:
+    """Удаляет кеш страниц каталога процесса."""
+    global _storefront
+    with _storefront_lock:
+        _storefront = None
+
+
+@receiver(setting_changed)
+def storefront_settings_changed(setting: str, **kwargs: Any) -> None:  # noqa: ARG001
+    """Пересоздает кеш витрины при изменении настроек STOREFRONT_*."""
+    if setting.startswith("STOREFRONT_"):
+        reset_storefront_cache()
@@ -0,0 +1,293 @@
+"""Вызовы Stripe: бюджет времени, ограниченные повторы и circuit breaker."""
+
+import asyncio
+import math
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+import stripe
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .metrics import registry
+from .stripe_client import current_deadline, get_stripe_client
+
+
+class StripeUnavailable(Exception):
+    """Stripe недоступен: circuit breaker открыт или исчерпан бюджет времени."""
+
+    def __init__(self, message: str, retry_after: float = 0.0) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """Значение заголовка Retry-After в целых секундах."""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class CircuitBreaker:
+    """Circuit breaker по доле ошибок в последних вызовах.
+
+    В закрытом состоянии учитываются исходы последних window вызовов.
+    Когда их не меньше min_calls и доля ошибок достигает failure_rate,
+    breaker открывается и в течение reset_timeout вызовы отклоняются
+    без обращения к Stripe. Затем пропускается один пробный вызов:
+    успех закрывает breaker, ошибка снова открывает его.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_rate: float,
+        window: int,
+        min_calls: int,
+        reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_started: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Текущее состояние без учета истечения reset_timeout."""
+        return self._state
+
+    def allow(self) -> bool:
+        """Проверяет, можно ли выполнить вызов сейчас."""
+        with self._lock:
+            now = self._clock()
+            if self._state == self.OPEN:
+                if now - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probe_started = None
+            if self._state == self.HALF_OPEN:
+                # Пробный вызов, не сообщивший результат, не блокирует навсегда
+                probe = self._probe_started
+                if probe is not None and now - probe < self.reset_timeout:
+                    return False
+                self._probe_started = now
+            return True
+
+    def retry_after(self) -> float:
+        """Сколько секунд осталось до пробного вызова."""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def record_success(self) -> None:
+        """Учитывает успешный вызов."""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._close()
+            else:
+                self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        """Учитывает ошибку, говорящую о сбое Stripe."""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(False)
+            calls = len(self._outcomes)
+            failures = calls - sum(self._outcomes)
+            if calls >= self.min_calls and failures / calls >= self.failure_rate:
+                self._open()
+
+    def _open(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        registry.increment("stripe.breaker_opened")
+
+    def _close(self) -> None:
+        self._state = self.CLOSED
+        self._probe_started = None
+        self._outcomes.clear()
+
+
+_breaker: CircuitBreaker | None = None
+_breaker_lock = threading.Lock()
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Возвращает circuit breaker Stripe, общий для потоков процесса."""
+    global _breaker
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(
+                    failure_rate=settings.STRIPE_BREAKER_FAILURE_RATE,
+                    window=settings.STRIPE_BREAKER_WINDOW,
+                    min_calls=settings.STRIPE_BREAKER_MIN_CALLS,
+                    reset_timeout=settings.STRIPE_BREAKER_RESET_TIMEOUT,
+                )
+    return _breaker
+
+
+def reset_circuit_breaker() -> None:
+    """Удаляет circuit breaker, например после изменения настроек."""
+    global _breaker
+    with _breaker_lock:
+        _breaker = None
+
+
+@receiver(setting_changed)
+def circuit_breaker_settings_changed(setting: str, **kwargs: Any) -> None:  # noqa: ARG001
+    """Пересоздает circuit breaker при изменении настроек STRIPE_*."""
+    if setting.startswith("STRIPE_"):
+        reset_circuit_breaker()
+
+
+@contextmanager
+def stripe_deadline(seconds: float | None = None) -> Iterator[float]:
+    """Задает бюджет времени на все вызовы Stripe внутри блока.
+
+    Вложенный блок не продлевает внешний бюджет, поэтому view может
+    ограничить общее время нескольких вызовов. Возвращает момент
+    окончания бюджета по time.monotonic().
+    """
+    budget = settings.STRIPE_DEADLINE if seconds is None else seconds
+    deadline = time.monotonic() + budget
+    outer = current_deadline.get()
+    if outer is not None:
+        deadline = min(deadline, outer)
+    token = current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        current_deadline.reset(token)
+
+
+def is_retryable(error: stripe.StripeError) -> bool:
+    """Проверяет, имеет ли смысл повторить вызов после ошибки.
+
+    Повторяются сетевые ошибки, 429 и ошибки 5xx на стороне Stripe.
+    Ошибки в параметрах, авторизации и отказы по карте не повторяются.
+    """
+    if isinstance(error, stripe.APIConnectionError):
+        return error.should_retry
+    if isinstance(error, stripe.RateLimitError):
+        return True
+    return error.http_status is not None and error.http_status >= 500
+
+
+def backoff_delay(attempt: int) -> float:
+    """Пауза перед повтором: экспоненциальная с полным jitter."""
+    cap = min(
+        settings.STRIPE_RETRY_BACKOFF_MAX, settings.STRIPE_RETRY_BACKOFF * 2**attempt
+    )
+    return random.uniform(0, cap)
+
+
+class _Attempts:
+    """Общая логика повторов для синхронных и асинхронных вызовов."""
+
+    def __init__(self, deadline: float) -> None:
+        self.deadline = deadline
+        self.breaker = get_circuit_breaker()
+        self.max_retries = settings.STRIPE_MAX_RETRIES
+
+    def check(self) -> None:
+        """Проверяет бюджет и breaker перед очередной попыткой."""
+        if self.deadline - time.monotonic() <= 0:
+            registry.increment("stripe.deadline_exceeded")
+            raise StripeUnavailable("Истек бюджет времени на запрос к Stripe")
+        if not self.breaker.allow():
+            registry.increment("stripe.rejected")
+            raise StripeUnavailable(
+                "Stripe временно недоступен", retry_after=self.breaker.retry_after()
+            )
+
+    def failed(self, error: stripe.StripeError, attempt: int) -> float:
+        """Учитывает ошибку и возвращает паузу перед повтором.
+
+        Если повтор невозможен, выбрасывает исключение.
+        """
+        if not is_retryable(error):
+            # Stripe ответил, значит сервис работает
+            self.breaker.record_success()
+            raise error
+        self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            raise StripeUnavailable(f"Stripe не ответил: {error}") from error
+        delay = backoff_delay(attempt)
+        if time.monotonic() + delay >= self.deadline:
+            registry.increment("stripe.deadline_exceeded")
+            raise StripeUnavailable(
+                "Истек бюджет времени на запрос к Stripe"
+            ) from error
+        registry.increment("stripe.retries")
+        return delay
+
+
+def _with_idempotency_key(params: dict[str, Any]) -> dict[str, Any]:
+    """Добавляет ключ идемпотентности, общий для всех повторов вызова."""
+    if not params.get("idempotency_key"):
+        params = {**params, "idempotency_key": str(uuid.uuid4())}
+    return params
+
+
+def call_stripe[T](func: Callable[..., T], *args: Any, **params: Any) -> T:
+    """Вызывает метод библиотеки stripe с бюджетом времени и повторами.
+
+    Повторы используют один ключ идемпотентности, поэтому Stripe не
+    выполнит операцию дважды. Если breaker открыт, бюджет исчерпан или
+    повторы не помогли, выбрасывается StripeUnavailable.
+    """
+    get_stripe_client()
+    params = _with_idempotency_key(params)
+    with stripe_deadline() as deadline:
+        attempts = _Attempts(deadline)
+        attempt = 0
+        while True:
+            attempts.check()
+            try:
+                result = func(*args, **params)
+            except stripe.StripeError as error:
+                time.sleep(attempts.failed(error, attempt))
+                attempt += 1
+                continue
+            attempts.breaker.record_success()
+            return result
+
+
+async def acall_stripe[T](
+    func: Callable[..., Awaitable[T]], *args: Any, **params: Any
+) -> T:
+    """Асинхронная версия call_stripe для методов *_async библиотеки stripe."""
+    get_stripe_client()
+    params = _with_idempotency_key(params)
+    with stripe_deadline() as deadline:
+        attempts = _Attempts(deadline)
+        attempt = 0
+        while True:
+            attempts.check()
+            try:
+                result = await func(*args, **params)
+            except stripe.StripeError as error:
+                await asyncio.sleep(attempts.failed(error, attempt))
+                attempt += 1
+                continue
+            attempts.breaker.record_success()
+            return result
@@ -0,0 +1,243 @@
+"""HTTP-клиент Stripe: пул постоянных соединений воркера и метрики вызовов."""
+
+import os
+import ssl
+import threading
+import time
+from collections.abc import Mapping
+from contextvars import ContextVar
+from typing import Any
+
+import httpx
+import stripe
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .metrics import registry
+
+# Момент по time.monotonic(), к которому должен завершиться текущий вызов
+# Stripe; задается в payments.stripe_calls.stripe_deadline
+current_deadline: ContextVar[float | None] = ContextVar("stripe_deadline", default=None)
+
+# Минимальный таймаут запроса, когда бюджет почти исчерпан
+MIN_REQUEST_TIMEOUT = 0.05
+
+
+class ConnectionTrace:
+    """Отмечает события установки соединения в рамках одного запроса.
+
+    Передается в httpx как расширение trace: httpcore сообщает о
+    TCP-подключении и TLS-рукопожатии только для новых соединений.
+    """
+
+    def __init__(self) -> None:
+        self.connected = False
+        self.tls_handshake = False
+
+    def record(self, event: str) -> None:
+        """Учитывает событие httpcore."""
+        if event == "connection.connect_tcp.complete":
+            self.connected = True
+        elif event == "connection.start_tls.complete":
+            self.tls_handshake = True
+
+    def __call__(self, event: str, info: Mapping[str, Any]) -> None:  # noqa: ARG002
+        self.record(event)
+
+
+class AsyncConnectionTrace(ConnectionTrace):
+    """Вариант ConnectionTrace для асинхронного клиента httpx."""
+
+    async def __call__(self, event: str, info: Mapping[str, Any]) -> None:  # noqa: ARG002
+        self.record(event)
+
+
+def record_connection(response: httpx.Response) -> None:
+    """Записывает в метрики, было ли соединение запроса новым."""
+    trace = response.request.extensions["trace"]
+    registry.increment("stripe.requests")
+    if trace.connected:
+        registry.increment("stripe.connections_opened")
+    else:
+        registry.increment("stripe.connections_reused")
+    if trace.tls_handshake:
+        registry.increment("stripe.tls_handshakes")
+
+
+def _trace_request(request: httpx.Request) -> None:
+    """Подключает трассировку соединения к синхронному запросу."""
+    request.extensions["trace"] = ConnectionTrace()
+
+
+async def _atrace_request(request: httpx.Request) -> None:
+    """Подключает трассировку соединения к асинхронному запросу."""
+    request.extensions["trace"] = AsyncConnectionTrace()
+
+
+async def _arecord_connection(response: httpx.Response) -> None:
+    """Асинхронная обертка record_connection для event hooks."""
+    record_connection(response)
+
+
+def timeout_within_deadline(timeout: httpx.Timeout) -> httpx.Timeout:
+    """Сокращает таймауты запроса до оставшегося бюджета времени."""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return timeout
+    remaining = max(deadline - time.monotonic(), MIN_REQUEST_TIMEOUT)
+    return httpx.Timeout(
+        connect=min(timeout.connect, remaining),
+        read=min(timeout.read, remaining),
+        write=min(timeout.write, remaining),
+        pool=min(timeout.pool, remaining),
+    )
+
+
+class PooledHTTPXClient(stripe.HTTPXClient):
+    """HTTP-клиент Stripe с постоянным пулом keep-alive соединений.
+
+    Синхронные и асинхронные вызовы идут через долгоживущие клиенты httpx
+    с ограниченным пулом, явными таймаутами подключения и чтения и общим
+    SSL-контекстом. Повторные вызовы используют уже открытые TLS-соединения,
+    поэтому рукопожатие выполняется только при открытии нового соединения.
+    """
+
+    name = "httpx-pooled"
+
+    def __init__(
+        self,
+        connect_timeout: float,
+        read_timeout: float,
+        max_connections: int,
+        keepalive_expiry: float,
+    ) -> None:
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        super().__init__(timeout=timeout, allow_sync_methods=True)
+        # Клиенты по умолчанию создаются без лимитов пула и еще не открыли
+        # соединений, поэтому заменяем их настроенными
+        self._client.close()
+
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        ssl_context = ssl.create_default_context(cafile=stripe.ca_bundle_path)
+        self._client = httpx.Client(
+            verify=ssl_context,
+            limits=limits,
+            timeout=timeout,
+            event_hooks={"request": [_trace_request], "response": [record_connection]},
+        )
+        self._client_async = httpx.AsyncClient(
+            verify=ssl_context,
+            limits=limits,
+            timeout=timeout,
+            event_hooks={
+                "request": [_atrace_request],
+                "response": [_arecord_connection],
+            },
+        )
+
+    def _get_request_args_kwargs(
+        self,
+        method: str,
+        url: str,
+        headers: Mapping[str, str],
+        post_data: Any,
+    ) -> list[Any]:
+        """Собирает аргументы запроса httpx.
+
+        Уже закодированное тело передается как content, а таймауты
+        ограничиваются бюджетом времени текущего вызова.
+        """
+        args, kwargs = super()._get_request_args_kwargs(method, url, headers, post_data)
+        kwargs["timeout"] = timeout_within_deadline(self._timeout)
+        if isinstance(post_data, str | bytes):
+            del kwargs["data"]
+            kwargs["content"] = post_data
+        return [args, kwargs]
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: Mapping[str, str],
+        post_data: Any = None,
+    ) -> tuple[bytes, int, Mapping[str, str]]:
+        """Выполняет запрос к Stripe, записывая его длительность."""
+        with registry.timer("stripe.request"):
+            return super().request(method, url, headers, post_data)
+
+    async def request_async(
+        self,
+        method: str,
+        url: str,
+        headers: Mapping[str, str],
+        post_data: Any = None,
+    ) -> tuple[bytes, int, Mapping[str, str]]:
+        """Асинхронно выполняет запрос к Stripe, записывая его длительность."""
+        with registry.timer("stripe.request"):
+            return await super().request_async(method, url, headers, post_data)
+
+
+def build_stripe_client() -> PooledHTTPXClient:
+    """Создает HTTP-клиент Stripe по настройкам проекта."""
+    return PooledHTTPXClient(
+        connect_timeout=settings.STRIPE_CONNECT_TIMEOUT,
+        read_timeout=settings.STRIPE_READ_TIMEOUT,
+        max_connections=settings.STRIPE_MAX_CONNECTIONS,
+        keepalive_expiry=settings.STRIPE_KEEPALIVE_EXPIRY,
+    )
+
+
+_client: PooledHTTPXClient | None = None
+_client_pid: int | None = None
+_client_lock = threading.Lock()
+
+
+def get_stripe_client() -> PooledHTTPXClient:
+    """Возвращает HTTP-клиент Stripe текущего процесса.
+
+    Клиент создается при первом вызове в воркере и устанавливается как
+    клиент библиотеки stripe вместе с секретным ключом и адресом API
+    (STRIPE_API_BASE, по умолчанию api.stripe.com). Встроенные повторы
+    библиотеки отключаются: ими управляет payments.stripe_calls. Если процесс был
+    форкнут после создания клиента, воркер создает свой: сокеты пула
+    родителя не используются и не закрываются.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                client = build_stripe_client()
+                stripe.api_key = settings.STRIPE_SECRET_KEY
+                stripe.api_base = settings.STRIPE_API_BASE or stripe.DEFAULT_API_BASE
+                stripe.default_http_client = client
+                stripe.max_network_retries = 0
+                _client, _client_pid = client, pid
+    return _client
+
+
+def close_stripe_client() -> None:
+    """Закрывает соединения синхронного пула, например при остановке воркера."""
+    global _client
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+
+
+def reset_stripe_client() -> None:
+    """Удаляет клиент, следующий вызов Stripe создаст новый по настройкам."""
+    close_stripe_client()
+    stripe.default_http_client = None
+
+
+@receiver(setting_changed)
+def stripe_client_settings_changed(setting: str, **kwargs: Any) -> None:  # noqa: ARG001
+    """Пересоздает HTTP-клиент Stripe при изменении настроек STRIPE_*."""
+    if setting.startswith("STRIPE_"):
+        reset_stripe_client()
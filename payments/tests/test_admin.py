@@ -3,6 +3,8 @@
 import pytest
 from django.urls import reverse
 
+from payments.models import StripeCoupon
+
 
 @pytest.mark.django_db
 class TestItemAdmin:
@@ -82,3 +84,23 @@ class TestTaxAdmin:
 
         assert response.status_code == 200
         assert "20.00" in str(response.content)
+
+
+@pytest.mark.django_db
+class TestStripeCouponAdmin:
+    """Тесты для админки реестра купонов Stripe."""
+
+    def test_list_view(self, admin_client):
+        """Тест списка купонов в админке."""
+        StripeCoupon.objects.create(percent=10, coupon_id="discount-10_00-once")
+        url = reverse("admin:payments_stripecoupon_changelist")
+        response = admin_client.get(url)
+
+        assert response.status_code == 200
+        assert "discount-10_00-once" in str(response.content)
+
+    def test_add_disabled(self, admin_client):
+        """Тест что купоны нельзя добавить вручную."""
+        response = admin_client.get(reverse("admin:payments_stripecoupon_add"))
+
+        assert response.status_code == 403
@@ -0,0 +1,97 @@
+"""Тесты для асинхронного endpoint оплаты."""
+
+import pytest
+import stripe
+from asgiref.sync import async_to_sync
+from django.urls import reverse
+
+from payments.models import Order
+
+
+def _get(async_client, url):
+    """Выполняет запрос асинхронным клиентом из синхронного теста."""
+    return async_to_sync(async_client.get)(url)
+
+
+@pytest.mark.django_db
+@pytest.mark.views
+class TestCreateOrderCheckoutSessionAsync:
+    """Тесты для create_order_checkout_session_async."""
+
+    def test_success(
+        self, async_client, order_with_items, mock_stripe_payment_intent_async
+    ):
+        """Тест создания Payment Intent асинхронным клиентом Stripe."""
+        url = reverse(
+            "payments:create_order_checkout_session_async", args=[order_with_items.id]
+        )
+        response = _get(async_client, url)
+
+        assert response.status_code == 200
+        assert response.json() == {"clientSecret": "pi_test_secret_async"}
+        call_kwargs = mock_stripe_payment_intent_async.await_args.kwargs
+        assert call_kwargs["amount"] == order_with_items.get_total_price()
+        assert call_kwargs["currency"] == "usd"
+
+    def test_same_params_as_sync(
+        self,
+        client,
+        async_client,
+        order_with_discount_tax,
+        mock_stripe_payment_intent,
+        mock_stripe_payment_intent_async,
+    ):
+        """Тест что синхронный и асинхронный endpoint передают одинаковые данные."""
+        order_id = order_with_discount_tax.id
+        client.get(reverse("payments:create_order_checkout_session", args=[order_id]))
+        # Сбрасываем сохраненный Intent, чтобы асинхронный путь тоже создал его
+        Order.objects.filter(pk=order_id).update(payment_intent_id="")
+        _get(
+            async_client,
+            reverse("payments:create_order_checkout_session_async", args=[order_id]),
+        )
+
+        assert (
+            mock_stripe_payment_intent_async.await_args.kwargs
+            == mock_stripe_payment_intent.call_args.kwargs
+        )
+
+    def test_404(self, async_client):
+        """Тест 404 для несуществующего заказа."""
+        url = reverse("payments:create_order_checkout_session_async", args=[99999])
+        assert _get(async_client, url).status_code == 404
+
+    def test_stripe_error(self, async_client, order_with_items, mocker):
+        """Тест обработки ошибки Stripe API."""
+        mocker.patch(
+            "stripe.PaymentIntent.create_async",
+            side_effect=stripe.InvalidRequestError("Stripe API Error", None),
+        )
+        url = reverse(
+            "payments:create_order_checkout_session_async", args=[order_with_items.id]
+        )
+        response = _get(async_client, url)
+
+        assert response.status_code == 400
+        assert "Stripe API Error" in response.json()["error"]
+
+
+@pytest.mark.django_db
+@pytest.mark.views
+class TestCheckoutUrl:
+    """Тесты выбора endpoint оплаты на странице заказа."""
+
+    def test_sync_by_default(self, client, order_with_items):
+        """Тест синхронного endpoint по умолчанию."""
+        url = reverse("payments:order_detail", args=[order_with_items.id])
+        response = client.get(url)
+        assert response.context["checkout_url"] == reverse(
+            "payments:create_order_checkout_session", args=[order_with_items.id]
+        )
+
+    def test_async_when_enabled(self, client, order_with_items, settings):
+        """Тест асинхронного endpoint при CHECKOUT_ASYNC."""
+        settings.CHECKOUT_ASYNC = True
+        url = reverse("payments:order_detail", args=[order_with_items.id])
+        response = client.get(url)
+        assert response.context["checkout_url"].endswith("/async/")
@@ -0,0 +1,188 @@
+"""Тесты для загрузки и расчета корзины."""
+
+import pytest
+from django.db import DatabaseError
+from django.urls import reverse
+
+from payments.cart import create_order
+from payments.models import Item, Order
+
+
+def _fill_cart(client, items, quantity=1):
+    """Кладет товары в корзину напрямую через сессию."""
+    session = client.session
+    session["cart"] = {str(item.id): {"quantity": quantity} for item in items}
+    session.save()
+
+
+@pytest.fixture
+def many_items(db):  # noqa: ARG001
+    """Создает набор товаров в разных валютах."""
+    return [
+        Item.objects.create(
+            name=f"Item {i}",
+            description="",
+            price=1000 + i,
+            currency="eur" if i % 2 else "usd",
+        )
+        for i in range(20)
+    ]
+
+
+@pytest.mark.django_db
+@pytest.mark.views
+class TestViewCartQueries:
+    """Тесты количества запросов и устойчивости просмотра корзины."""
+
+    def _count_queries(self, client, django_assert_max_num_queries, items):
+        """Возвращает количество запросов при просмотре корзины."""
+        _fill_cart(client, items)
+        with django_assert_max_num_queries(10) as captured:
+            response = client.get(reverse("payments:view_cart"))
+        assert response.status_code == 200
+        return len(captured)
+
+    def test_query_count_independent_of_cart_size(
+        self, client, many_items, django_assert_max_num_queries
+    ):
+        """Тест что число запросов не зависит от размера корзины."""
+        small = self._count_queries(
+            client, django_assert_max_num_queries, many_items[:1]
+        )
+        large = self._count_queries(client, django_assert_max_num_queries, many_items)
+        assert small == large
+
+    def test_missing_items_pruned(self, client, item_usd, item_eur):
+        """Тест удаления из корзины товаров, удаленных из каталога."""
+        _fill_cart(client, [item_usd, item_eur])
+        missing_id = item_eur.id
+        item_eur.delete()
+
+        response = client.get(reverse("payments:view_cart"))
+
+        assert response.status_code == 200
+        assert [line["item"] for line in response.context["cart_items"]] == [item_usd]
+        assert str(missing_id) not in client.session["cart"]
+
+    def test_invalid_cart_key_pruned(self, client, item_usd):
+        """Тест что битый ключ корзины не ломает страницу."""
+        session = client.session
+        session["cart"] = {"abc": {"quantity": 1}, str(item_usd.id): {"quantity": 2}}
+        session.save()
+
+        response = client.get(reverse("payments:view_cart"))
+
+        assert response.status_code == 200
+        assert response.context["total"] == 10000
+        assert list(client.session["cart"]) == [str(item_usd.id)]
+
+    def test_cart_currency_from_first_item(self, client, item_eur, item_usd):
+        """Тест что без выбора валюты используется валюта первого товара."""
+        _fill_cart(client, [item_eur, item_usd])
+
+        response = client.get(reverse("payments:view_cart"))
+
+        assert response.context["currency"] == "eur"
+        assert response.context["cart_count"] == 2
+
+    def test_cart_total_matches_order_subtotal(self, client, many_items):
+        """Тест что сумма корзины совпадает с суммой созданного заказа."""
+        _fill_cart(client, many_items, quantity=3)
+        session = client.session
+        session["payment_currency"] = "usd"
+        session.save()
+
+        cart_total = client.get(reverse("payments:view_cart")).context["total"]
+        client.get(reverse("payments:checkout_cart"))
+
+        order = Order.objects.latest("created_at")
+        assert order.get_subtotal() == cart_total
+        assert order.subtotal == cart_total
+
+
+@pytest.mark.django_db
+@pytest.mark.views
+class TestCreateOrderFromCartBulk:
+    """Тесты атомарного создания заказа из корзины."""
+
+    def _checkout_queries(self, client, django_assert_max_num_queries, items):
+        """Возвращает количество запросов при оформлении корзины."""
+        _fill_cart(client, items, quantity=2)
+        with django_assert_max_num_queries(20) as captured:
+            response = client.get(reverse("payments:checkout_cart"))
+        assert response.status_code == 302
+        return len(captured)
+
+    def test_query_count_independent_of_cart_size(
+        self, client, many_items, django_assert_max_num_queries
+    ):
+        """Тест что число запросов не зависит от размера корзины."""
+        small = self._checkout_queries(
+            client, django_assert_max_num_queries, many_items[:1]
+        )
+        large = self._checkout_queries(
+            client, django_assert_max_num_queries, many_items
+        )
+        assert small == large
+        assert Order.objects.latest("created_at").order_items.count() == 20
+
+    def test_stored_totals_match_pricing(self, client, many_items):
+        """Тест что сохраненные итоги совпадают с расчетом заказа."""
+        _fill_cart(client, many_items, quantity=3)
+        session = client.session
+        session["payment_currency"] = "eur"
+        session.save()
+
+        client.get(reverse("payments:checkout_cart"))
+
+        order = Order.objects.latest("created_at")
+        assert order.payment_currency == "eur"
+        assert order.subtotal == order.get_subtotal()
+        assert order.total == order.get_total_price()
+        assert order.rate_version == order.pricing.rate_version
+
+    def test_missing_item_creates_nothing(self, client, item_usd, item_eur):
+        """Тест что пропавший товар не приводит к частичному заказу."""
+        _fill_cart(client, [item_usd, item_eur])
+        item_eur.delete()
+
+        response = client.get(reverse("payments:checkout_cart"))
+
+        assert response.status_code == 302
+        assert response.url == reverse("payments:view_cart")
+        assert not Order.objects.exists()
+        assert list(client.session["cart"]) == [str(item_usd.id)]
+
+    def test_invalid_quantity_creates_nothing(self, client, item_usd, item_eur):
+        """Тест что некорректное количество отклоняется до записи в БД."""
+        session = client.session
+        session["cart"] = {
+            str(item_usd.id): {"quantity": 1},
+            str(item_eur.id): {"quantity": -5},
+        }
+        session.save()
+
+        response = client.get(reverse("payments:checkout_cart"))
+
+        assert response.url == reverse("payments:view_cart")
+        assert not Order.objects.exists()
+
+    def test_duplicate_entries_merged(self, item_usd, item_eur):
+        """Тест что повторы товара объединяются в одну строку заказа."""
+        order = create_order([(item_usd, 1), (item_eur, 2), (item_usd, 3)], "usd")
+
+        lines = order.order_items.order_by("id").values_list("item_id", "quantity")
+        assert list(lines) == [(item_usd.id, 4), (item_eur.id, 2)]
+        assert order.subtotal == order.get_subtotal()
+
+    def test_failure_rolls_back_order(self, item_usd, mocker):
+        """Тест что ошибка вставки позиций откатывает заказ."""
+        mocker.patch(
+            "payments.models.OrderItem.objects.bulk_create",
+            side_effect=DatabaseError("boom"),
+        )
+
+        with pytest.raises(DatabaseError):
+            create_order([(item_usd, 1)], "usd")
+
+        assert not Order.objects.exists()
@@ -0,0 +1,281 @@
+"""Тесты для хранилищ корзины в кеше и в БД."""
+
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from payments.cart_store import (
+    CART_KEY_PREFIX,
+    CacheCartStore,
+    CartLocked,
+    get_cart_store,
+)
+from payments.models import CartLine, Order
+
+STORES = {
+    "cache": "payments.cart_store.CacheCartStore",
+    "db": "payments.cart_store.DatabaseCartStore",
+}
+
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE")
+
+
+@pytest.fixture(params=list(STORES))
+def store(request, settings):
+    """Включает хранилище корзины из параметра теста."""
+    settings.CART_STORE = STORES[request.param]
+    return request.param
+
+
+def cart_lines(client) -> dict[int, int]:
+    """Возвращает содержимое корзины со страницы корзины."""
+    response = client.get(reverse("payments:view_cart"))
+    return {
+        line["item"].id: line["quantity"] for line in response.context["cart_items"]
+    }
+
+
+def _get(client, view: str, *args: object):
+    return client.get(reverse(f"payments:{view}", args=args))
+
+
+@pytest.mark.django_db
+@pytest.mark.views
+class TestCartStoreViews:
+    """Тесты операций корзины через представления для каждого хранилища."""
+
+    def test_add_change_remove(self, client, store, item_usd, item_eur):  # noqa: ARG002
+        """Тест добавления, изменения количества и удаления строк."""
+        _get(client, "add_to_cart", item_usd.id)
+        _get(client, "add_to_cart", item_eur.id)
+        _get(client, "add_to_cart", item_usd.id)
+        assert cart_lines(client) == {item_usd.id: 2, item_eur.id: 1}
+
+        _get(client, "update_cart_quantity", item_eur.id, "increase")
+        _get(client, "update_cart_quantity", item_usd.id, "decrease")
+        assert cart_lines(client) == {item_usd.id: 1, item_eur.id: 2}
+
+        _get(client, "update_cart_quantity", item_usd.id, "decrease")
+        _get(client, "remove_from_cart", item_eur.id)
+        assert cart_lines(client) == {}
+
+    def test_change_missing_line_ignored(self, client, store, item_usd):  # noqa: ARG002
+        """Тест что изменение отсутствующей строки не добавляет товар."""
+        _get(client, "update_cart_quantity", item_usd.id, "increase")
+        _get(client, "remove_from_cart", item_usd.id)
+
+        assert cart_lines(client) == {}
+
+    def test_buy_now_replaces_cart(self, client, store, item_usd, item_eur):  # noqa: ARG002
+        """Тест что покупка в один клик оставляет в корзине один товар."""
+        _get(client, "add_to_cart", item_usd.id)
+
+        _get(client, "buy_now", item_eur.id)
+
+        assert cart_lines(client) == {item_eur.id: 1}
+
+    def test_checkout_and_success(self, client, store, item_usd, item_eur):  # noqa: ARG002
+        """Тест оформления заказа и очистки корзины после оплаты."""
+        _get(client, "add_to_cart", item_usd.id)
+        _get(client, "add_to_cart", item_eur.id)
+
+        response = _get(client, "checkout_cart")
+        order = Order.objects.get()
+        assert response.url == reverse("payments:order_detail", args=[order.id])
+        assert order.order_items.count() == 2
+
+        _get(client, "success")
+        assert cart_lines(client) == {}
+
+    def test_index_shows_cart_count(self, client, store, item_usd):  # noqa: ARG002
+        """Тест счетчика товаров в шапке главной страницы."""
+        assert _get(client, "index").context["cart_count"] == 0
+
+        _get(client, "add_to_cart", item_usd.id)
+
+        assert _get(client, "index").context["cart_count"] == 1
+
+    def test_deleted_item_pruned(self, client, store, item_usd, item_eur):  # noqa: ARG002
+        """Тест что удаленный из каталога товар пропадает из корзины."""
+        _get(client, "add_to_cart", item_usd.id)
+        _get(client, "add_to_cart", item_eur.id)
+        item_eur.delete()
+
+        assert cart_lines(client) == {item_usd.id: 1}
+        assert _get(client, "index").context["cart_count"] == 1
+
+    def test_cookie_issued_once(self, client, store, item_usd):  # noqa: ARG002
+        """Тест выдачи cookie корзины и ее продления при изменении."""
+        first = _get(client, "add_to_cart", item_usd.id).cookies["cart_id"]
+        second = _get(client, "add_to_cart", item_usd.id).cookies["cart_id"]
+
+        assert first.value == second.value
+        assert first["httponly"]
+        assert "cart_id" not in _get(client, "view_cart").cookies
+
+    def test_carts_isolated(self, client, store, item_usd, item_eur):  # noqa: ARG002
+        """Тест что у разных покупателей разные корзины."""
+        other = type(client)()
+        _get(client, "add_to_cart", item_usd.id)
+        _get(other, "add_to_cart", item_eur.id)
+
+        assert cart_lines(client) == {item_usd.id: 1}
+        assert cart_lines(other) == {item_eur.id: 1}
+
+    def test_invalid_cookie_replaced(self, client, store, item_usd):  # noqa: ARG002
+        """Тест что некорректная cookie не используется как ключ корзины."""
+        client.cookies["cart_id"] = "../../etc"
+
+        response = _get(client, "add_to_cart", item_usd.id)
+
+        assert response.cookies["cart_id"].value != "../../etc"
+        assert cart_lines(client) == {item_usd.id: 1}
+
+    def test_cart_traffic_skips_session(self, client, store, item_usd):  # noqa: ARG002
+        """Тест что операции с корзиной не создают сессию."""
+        _get(client, "add_to_cart", item_usd.id)
+        _get(client, "update_cart_quantity", item_usd.id, "increase")
+        cart_lines(client)
+
+        assert not Session.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.views
+class TestCacheCartStore:
+    """Тесты корзины в кеше."""
+
+    @pytest.fixture(autouse=True)
+    def _cache_store(self, settings):
+        settings.CART_STORE = STORES["cache"]
+
+    def test_cart_traffic_writes_nothing_to_db(self, client, item_usd):
+        """Тест что изменения корзины не пишут в БД."""
+        _get(client, "index")  # индекс каталога загружается один раз
+
+        with CaptureQueriesContext(connection) as context:
+            _get(client, "add_to_cart", item_usd.id)
+            _get(client, "update_cart_quantity", item_usd.id, "increase")
+            _get(client, "update_cart_quantity", item_usd.id, "decrease")
+            _get(client, "remove_from_cart", item_usd.id)
+
+        assert [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].lstrip().upper().startswith(WRITE_STATEMENTS)
+        ] == []
+
+    def test_expired_line_pruned(self, client, item_usd, item_eur):
+        """Тест что строка, истекшая раньше списка товаров, удаляется."""
+        response = _get(client, "add_to_cart", item_usd.id)
+        _get(client, "add_to_cart", item_eur.id)
+        cart_id = response.cookies["cart_id"].value
+        cache.delete(f"{CART_KEY_PREFIX}:{cart_id}:{item_eur.id}")
+
+        assert cart_lines(client) == {item_usd.id: 1}
+        assert cache.get(f"{CART_KEY_PREFIX}:{cart_id}") == [item_usd.id]
+
+    def test_line_expired_between_add_and_incr(self, client, item_usd, mocker):
+        """Тест повторного создания строки, если она истекла после add."""
+        _get(client, "add_to_cart", item_usd.id)
+        store = get_cart_store()
+        mocker.patch.object(store.cache, "add", return_value=False)
+        mocker.patch.object(store.cache, "incr", side_effect=ValueError)
+
+        _get(client, "add_to_cart", item_usd.id)
+
+        mocker.stopall()
+        assert cart_lines(client) == {item_usd.id: 1}
+
+    def test_concurrent_adds_keep_both_lines(self, rf, item_usd, item_eur, mocker):
+        """Тест что параллельные добавления разных товаров не теряют строку."""
+        store = CacheCartStore()
+        original_item_ids = store._item_ids
+
+        def slow_item_ids(cart_id):
+            item_ids = original_item_ids(cart_id)
+            time.sleep(0.05)  # второй запрос успевает прочитать тот же список
+            return item_ids
+
+        mocker.patch.object(store, "_item_ids", slow_item_ids)
+        request = rf.get("/")
+        request.cart_id = "c" * 32
+        adds = [
+            threading.Thread(target=store.add, args=(request, item_id))
+            for item_id in (item_usd.id, item_eur.id)
+        ]
+        for add in adds:
+            add.start()
+        for add in adds:
+            add.join()
+
+        mocker.stopall()
+        assert store.lines(request) == {str(item_usd.id): 1, str(item_eur.id): 1}
+        assert cache.get(f"{CART_KEY_PREFIX}:{request.cart_id}:lock") is None
+
+    def test_busy_lock_not_bypassed(self, rf, item_usd, mocker):
+        """Тест что без блокировки список товаров не меняется."""
+        mocker.patch("payments.cart_store.CART_LOCK_WAIT", 0.05)
+        store = CacheCartStore()
+        request = rf.get("/")
+        request.cart_id = "d" * 32
+        cache.set(f"{CART_KEY_PREFIX}:{request.cart_id}:lock", "other", 60)
+
+        with pytest.raises(CartLocked):
+            store.add(request, item_usd.id)
+
+        assert cache.get(f"{CART_KEY_PREFIX}:{request.cart_id}") is None
+        assert cache.get(f"{CART_KEY_PREFIX}:{request.cart_id}:{item_usd.id}") is None
+        assert cache.get(f"{CART_KEY_PREFIX}:{request.cart_id}:lock") == "other"
+
+
+@pytest.mark.django_db
+class TestDatabaseCartStore:
+    """Тесты корзины в таблице CartLine."""
+
+    @pytest.fixture(autouse=True)
+    def _db_store(self, settings):
+        settings.CART_STORE = STORES["db"]
+
+    def test_concurrent_insert_increments(self, client, item_usd, mocker):
+        """Тест увеличения строки, которую параллельно вставил другой запрос."""
+        _get(client, "add_to_cart", item_usd.id)
+        line = CartLine.objects.get()
+        original_update = type(CartLine.objects.all()).update
+        calls = []
+
+        def lost_race(queryset, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                return 0
+            return original_update(queryset, **kwargs)
+
+        mocker.patch("django.db.models.QuerySet.update", lost_race)
+        _get(client, "add_to_cart", item_usd.id)
+        mocker.stopall()
+
+        line.refresh_from_db()
+        assert line.quantity == 2
+        assert len(calls) == 2
+
+    def test_clear_expired_carts(self, item_usd):
+        """Тест удаления брошенных корзин командой."""
+        stale = timezone.now() - timedelta(days=30)
+        CartLine.objects.create(cart_id="a" * 32, item=item_usd, updated_at=stale)
+        fresh = CartLine.objects.create(cart_id="b" * 32, item=item_usd)
+        out = StringIO()
+
+        call_command("clear_expired_carts", stdout=out)
+
+        assert list(CartLine.objects.all()) == [fresh]
+        assert "Удалено строк корзин: 1" in out.getvalue()
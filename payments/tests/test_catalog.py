@@ -0,0 +1,131 @@
+"""Тесты для индекса ID товаров каталога."""
+
+import pytest
+from django.urls import reverse
+
+from payments.catalog import (
+    CatalogIndex,
+    bump_catalog_version,
+    get_catalog_index,
+    get_catalog_version,
+)
+from payments.models import Item
+
+
+@pytest.mark.django_db
+class TestCatalogIndex:
+    """Тесты для CatalogIndex."""
+
+    def test_contains_from_memory(self, item_usd, django_assert_num_queries):
+        """Тест проверки существующего товара без запросов к БД."""
+        index = CatalogIndex(max_age=60)
+        index.load()
+
+        with django_assert_num_queries(0):
+            assert index.contains(item_usd.id)
+
+    def test_miss_falls_back_to_db(self, item_usd, django_assert_num_queries):
+        """Тест проверки отсутствующего ID в БД."""
+        index = CatalogIndex(max_age=60)
+        index.load()
+
+        with django_assert_num_queries(1):
+            assert not index.contains(item_usd.id + 1000)
+
+    def test_miss_adds_item_created_elsewhere(self, item_usd):
+        """Тест что товар, найденный в БД при промахе, попадает в индекс."""
+        index = CatalogIndex(max_age=60)
+        index.load()
+        Item.objects.bulk_create(
+            [Item(name="Bulk", description="", price=100, currency="usd")]
+        )
+        new_id = Item.objects.get(name="Bulk").id
+
+        assert index.contains(new_id)
+        assert new_id in index._current_ids()
+        assert item_usd.id in index._current_ids()
+
+    def test_version_change_reloads(self, item_usd, django_assert_num_queries):
+        """Тест перечитывания индекса при смене версии каталога."""
+        index = CatalogIndex(max_age=60)
+        index.load()
+        bump_catalog_version()
+
+        with django_assert_num_queries(1):
+            assert index.contains(item_usd.id)
+
+    def test_max_age_reloads(self, item_usd, django_assert_num_queries):
+        """Тест перечитывания устаревшего индекса."""
+        index = CatalogIndex(max_age=0)
+        index.load()
+
+        with django_assert_num_queries(1):
+            assert index.contains(item_usd.id)
+
+    def test_invalidate(self, item_usd):
+        """Тест сброса индекса."""
+        index = CatalogIndex(max_age=60)
+        index.load()
+        index.invalidate()
+        assert index._ids is None
+        assert index.contains(item_usd.id)
+
+    def test_bump_initializes_version(self):
+        """Тест создания счетчика версий при первом изменении."""
+        assert get_catalog_version() == 0
+        bump_catalog_version()
+        bump_catalog_version()
+        assert get_catalog_version() == 2
+
+    def test_signals_bump_version(self, django_capture_on_commit_callbacks):
+        """Тест смены версии при добавлении, изменении и удалении товара."""
+        with django_capture_on_commit_callbacks(execute=True):
+            item = Item.objects.create(
+                name="New", description="", price=100, currency="usd"
+            )
+        assert get_catalog_version() == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            item.price = 200
+            item.save()
+        assert get_catalog_version() == 2
+
+        with django_capture_on_commit_callbacks(execute=True):
+            item.delete()
+        assert get_catalog_version() == 3
+
+    def test_settings_change_recreates_index(self, settings):
+        """Тест пересоздания индекса при изменении настроек."""
+        index = get_catalog_index()
+        settings.CATALOG_INDEX_MAX_AGE = 5
+        assert get_catalog_index() is not index
+        assert get_catalog_index().max_age == 5
+
+
+@pytest.mark.django_db
+@pytest.mark.views
+class TestCartViewsUseCatalogIndex:
+    """Тесты проверки товаров в корзине через индекс."""
+
+    def test_add_to_cart_skips_item_query(
+        self, client, item_usd, django_assert_max_num_queries
+    ):
+        """Тест что повторное добавление не проверяет товар в БД."""
+        url = reverse("payments:add_to_cart", args=[item_usd.id])
+        client.get(url)
+
+        with django_assert_max_num_queries(10) as captured:
+            client.get(url)
+        assert not any("payments_item" in q["sql"] for q in captured)
+
+    def test_deleted_item_returns_404(
+        self, client, item_usd, django_capture_on_commit_callbacks
+    ):
+        """Тест 404 для удаленного товара после смены версии каталога."""
+        item_id = item_usd.id
+        client.get(reverse("payments:add_to_cart", args=[item_id]))
+        with django_capture_on_commit_callbacks(execute=True):
+            item_usd.delete()
+
+        response = client.get(reverse("payments:buy_now", args=[item_id]))
+        assert response.status_code == 404
@@ -0,0 +1,128 @@
+"""Тесты для потокового API каталога."""
+
+import json
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+
+from payments.catalog import as_json_array, as_ndjson
+from payments.models import Item
+
+
+def _content(response):
+    """Собирает тело потокового ответа."""
+    return b"".join(response.streaming_content).decode()
+
+
+@pytest.mark.django_db
+@pytest.mark.views
+class TestCatalogApi:
+    """Тесты для catalog_api."""
+
+    def test_ndjson_default(self, client, item_usd, item_eur):
+        """Тест выдачи NDJSON по умолчанию."""
+        response = client.get(reverse("payments:catalog_api"))
+
+        assert response.status_code == 200
+        assert response.streaming
+        assert response["Content-Type"] == "application/x-ndjson"
+        rows = [json.loads(line) for line in _content(response).splitlines()]
+        assert [row["id"] for row in rows] == [item_eur.id, item_usd.id]
+        assert rows[0]["price_usd"] == 3300
+
+    def test_json_array(self, client, item_usd, item_eur):
+        """Тест выдачи JSON-массива."""
+        response = client.get(reverse("payments:catalog_api"), {"format": "json"})
+
+        assert response["Content-Type"] == "application/json"
+        assert len(json.loads(_content(response))) == 2
+
+    def test_empty_json_array(self, client, db):  # noqa: ARG002
+        """Тест пустого каталога в JSON."""
+        response = client.get(reverse("payments:catalog_api"), {"format": "json"})
+        assert json.loads(_content(response)) == []
+
+    def test_field_selection(self, client, item_usd):
+        """Тест выбора полей."""
+        response = client.get(reverse("payments:catalog_api"), {"fields": "id, price"})
+        assert json.loads(_content(response)) == {"id": item_usd.id, "price": 5000}
+
+    def test_sort(self, client, item_usd, item_eur):
+        """Тест сортировки по цене."""
+        response = client.get(reverse("payments:catalog_api"), {"sort": "-price"})
+        rows = [json.loads(line) for line in _content(response).splitlines()]
+        assert [row["id"] for row in rows] == [item_usd.id, item_eur.id]
+
+    @pytest.mark.parametrize(
+        "params",
+        [{"fields": "id,secret"}, {"format": "xml"}, {"sort": "random"}],
+    )
+    def test_invalid_params(self, client, item_usd, params):
+        """Тест ошибок для неизвестных полей, формата и сортировки."""
+        response = client.get(reverse("payments:catalog_api"), params)
+        assert response.status_code == 400
+        assert "error" in response.json()
+
+    def test_streams_with_server_side_iterator(
+        self, client, item_usd, mocker, settings
+    ):
+        """Тест чтения товаров через iterator() с заданным размером пачки."""
+        settings.CATALOG_STREAM_CHUNK_SIZE = 7
+        spy = mocker.spy(type(Item.objects.values()), "iterator")
+
+        _content(client.get(reverse("payments:catalog_api")))
+
+        spy.assert_called_once()
+        assert spy.call_args.kwargs == {"chunk_size": 7}
+
+    def test_etag_not_modified(self, client, item_usd):
+        """Тест ответа 304 для неизменного каталога."""
+        url = reverse("payments:catalog_api")
+        etag = client.get(url)["ETag"]
+
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+    def test_etag_changes_with_catalog_and_params(self, client, item_usd):
+        """Тест смены ETag при изменении каталога и параметров."""
+        url = reverse("payments:catalog_api")
+        etag = client.get(url)["ETag"]
+
+        assert client.get(url, {"fields": "id"})["ETag"] != etag
+        item_usd.price = 7000
+        item_usd.save()
+        assert client.get(url)["ETag"] != etag
+
+    @pytest.mark.parametrize("change", ["save", "delete", "rates"])
+    def test_etag_survives_cache_reset(self, client, item_usd, item_eur, change):
+        """Тест что после очистки кеша старый ETag не дает 304."""
+        url = reverse("payments:catalog_api")
+        etag = client.get(url)["ETag"]
+        if change == "save":
+            item_usd.name = "Renamed"
+            item_usd.save()
+        elif change == "delete":
+            item_usd.delete()
+        else:
+            Item.objects.update(price_usd=0)
+            Item.objects.refresh_price_matrix()
+        cache.clear()
+
+        response = client.get(url, headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+
+class TestSerializers:
+    """Тесты сериализации потока."""
+
+    def test_ndjson(self):
+        """Тест NDJSON с юникодом."""
+        assert list(as_ndjson([{"name": "Товар"}])) == ['{"name": "Товар"}\n']
+
+    def test_json_array(self):
+        """Тест JSON-массива из нескольких строк."""
+        chunks = as_json_array([{"id": 1}, {"id": 2}])
+        assert json.loads("".join(chunks)) == [{"id": 1}, {"id": 2}]
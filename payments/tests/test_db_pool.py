@@ -0,0 +1,89 @@
+"""Тесты для пула соединений Postgres воркера."""
+
+import pytest
+from django.db.utils import ConnectionHandler
+from django.urls import reverse
+
+from payments.db_pool import POOL_STATS, close_pools, pool_stats, warm_up_pools
+from payments.metrics import registry
+
+# Порт, на котором заведомо никто не слушает: прогрев не дождется соединений
+UNREACHABLE = {
+    "ENGINE": "django.db.backends.postgresql",
+    "NAME": "stripe_payment",
+    "USER": "postgres",
+    "HOST": "127.0.0.1",
+    "PORT": "1",
+    "OPTIONS": {"pool": {"min_size": 2, "max_size": 3, "timeout": 0.2}},
+}
+
+
+@pytest.fixture
+def pooled(mocker):
+    """Подменяет подключения на Postgres с пулом без реального сервера.
+
+    Пулы Django хранятся по алиасу на уровне класса, поэтому у подключения
+    отдельный алиас: пул default тестовой БД не затрагивается.
+    """
+    handler = ConnectionHandler(
+        {"default": {"ENGINE": "django.db.backends.dummy"}, "pooled": UNREACHABLE}
+    )
+    mocker.patch("payments.db_pool.connections", handler)
+    yield handler["pooled"]
+    close_pools()
+
+
+@pytest.mark.unit
+class TestPoolStats:
+    """Тесты статистики пулов."""
+
+    def test_no_pool(self, mocker):
+        """Тест что подключения без OPTIONS["pool"] не попадают в статистику."""
+        handler = ConnectionHandler({"default": {"ENGINE": "django.db.backends.dummy"}})
+        mocker.patch("payments.db_pool.connections", handler)
+
+        assert pool_stats() == {}
+
+    def test_pool_settings(self, pooled):  # noqa: ARG002
+        """Тест статистики пула до первого запроса."""
+        stats = pool_stats()["pooled"]
+
+        assert set(stats) == {name for name, _ in POOL_STATS}
+        assert stats["min_size"] == 2
+        assert stats["max_size"] == 3
+        assert stats["checkouts"] == 0
+
+
+@pytest.mark.unit
+class TestWarmUp:
+    """Тесты прогрева пула при старте воркера."""
+
+    def test_unreachable_database(self, pooled):
+        """Тест что недоступная БД не мешает запуску воркера."""
+        failed = pooled.pool
+
+        warm_up_pools(timeout=0.2)
+
+        assert registry.counter("db_pool.warmup_errors") == 1
+        assert registry.timing("db_pool.warmup")["count"] == 0
+        assert failed.closed
+        assert pooled.pool is not failed
+
+    def test_close_pools(self, pooled):
+        """Тест закрытия пула при остановке воркера."""
+        pool = pooled.pool
+        pool.open()
+
+        close_pools()
+
+        assert pool.closed
+        assert "pooled" not in type(pooled)._connection_pools
+
+
+@pytest.mark.django_db
+@pytest.mark.views
+def test_metrics_view_includes_pools(admin_client, pooled):  # noqa: ARG001
+    """Тест что /metrics/ отдает статистику пулов воркера."""
+    data = admin_client.get(reverse("payments:process_metrics")).json()
+
+    assert data["db_pools"]["pooled"]["max_size"] == 3
@@ -0,0 +1,211 @@
+"""Тесты для маршрутизации чтений на реплики."""
+
+import pytest
+from django.db import DatabaseError, connections, transaction
+from django.db.models import QuerySet
+from django.urls import reverse
+
+from payments.db_router import (
+    ReplicaRouter,
+    ReplicaSet,
+    RoutingState,
+    get_replica_set,
+    routing_state,
+)
+from payments.metrics import registry
+from payments.models import Item, Order
+
+PIN_COOKIE = "db_primary"
+
+
+@pytest.fixture
+def replica(settings):
+    """Подключает реплику replica — то же соединение, что и default.
+
+    Так чтения с реплики видят данные теста, а роутер выбирает алиас
+    как при настоящей реплике.
+    """
+    settings.DATABASE_REPLICAS = ["replica"]
+    connections["replica"] = connections["default"]
+    yield "replica"
+    del connections["replica"]
+
+
+@pytest.fixture
+def request_state():
+    """Задает состояние безопасного запроса без cookie."""
+    state = RoutingState(replica_reads=True)
+    token = routing_state.set(state)
+    yield state
+    routing_state.reset(token)
+
+
+@pytest.mark.unit
+class TestReplicaRouter:
+    """Тесты решений роутера."""
+
+    def test_outside_request_uses_default(self, replica):  # noqa: ARG002
+        """Тест что команды и фоновые задачи читают из default."""
+        assert ReplicaRouter().db_for_read(Item) == "default"
+
+    def test_safe_request_reads_replica(self, replica, request_state, mocker):
+        """Тест чтения с реплики и закрепления выбора на весь запрос."""
+        mocker.patch.object(ReplicaSet, "measure_lag", return_value=0.0)
+        router = ReplicaRouter()
+
+        assert router.db_for_read(Item) == replica
+        assert request_state.read_alias == replica
+        assert registry.counter("db.replica_requests") == 1
+
+    def test_write_pins_request_to_default(self, replica, request_state):  # noqa: ARG002
+        """Тест что после записи запрос читает из default."""
+        router = ReplicaRouter()
+
+        assert router.db_for_write(Order) == "default"
+
+        assert request_state.wrote
+        assert router.db_for_read(Order) == "default"
+
+    def test_no_replicas(self, request_state):  # noqa: ARG002
+        """Тест что без DATABASE_REPLICAS все чтения идут в default."""
+        assert ReplicaRouter().db_for_read(Item) == "default"
+
+    def test_migrations_only_on_default(self, replica):
+        """Тест что миграции не применяются к репликам."""
+        router = ReplicaRouter()
+
+        assert router.allow_migrate("default", "payments")
+        assert not router.allow_migrate(replica, "payments")
+
+    @pytest.mark.django_db
+    def test_atomic_block_reads_default(self, replica, request_state):  # noqa: ARG002
+        """Тест что чтения внутри транзакции идут в default."""
+        with transaction.atomic():
+            assert ReplicaRouter().db_for_read(Item) == "default"
+
+
+@pytest.mark.unit
+class TestReplicaLag:
+    """Тесты проверки отставания реплик."""
+
+    def test_lagging_replica_falls_back_to_default(self, mocker):
+        """Тест чтения из default, когда все реплики отстают."""
+        replicas = ReplicaSet(["replica"], max_lag=5, check_interval=2)
+        mocker.patch.object(replicas, "measure_lag", return_value=30.0)
+
+        assert replicas.choose() == "default"
+        assert registry.counter("db.replica_fallbacks") == 1
+
+    def test_skips_lagging_replica(self, mocker):
+        """Тест что чтения получает только реплика в пределах max_lag."""
+        replicas = ReplicaSet(["replica1", "replica2"], max_lag=5, check_interval=2)
+        lags = {"replica1": 9.0, "replica2": 0.5}
+        mocker.patch.object(replicas, "measure_lag", side_effect=lags.get)
+
+        assert {replicas.choose() for _ in range(20)} == {"replica2"}
+
+    def test_lag_checked_once_per_interval(self, mocker):
+        """Тест что отставание не проверяется на каждом запросе."""
+        replicas = ReplicaSet(["replica"], max_lag=5, check_interval=2)
+        measure = mocker.patch.object(replicas, "measure_lag", return_value=0.0)
+        clock = mocker.patch("payments.db_router.time.monotonic", return_value=100.0)
+
+        replicas.choose()
+        replicas.choose()
+        clock.return_value = 103.0
+        replicas.choose()
+
+        assert measure.call_count == 2
+
+    def test_unavailable_replica(self, mocker):
+        """Тест что недоступная реплика считается бесконечно отстающей."""
+        replica = mocker.Mock(vendor="postgresql")
+        replica.cursor.side_effect = DatabaseError("connection refused")
+        mocker.patch("payments.db_router.connections", {"replica": replica})
+        replicas = ReplicaSet(["replica"], max_lag=5, check_interval=2)
+
+        assert replicas.choose() == "default"
+        assert replicas.lag("replica") == float("inf")
+        assert registry.counter("db.replica_errors") == 1
+
+    def test_settings_reset(self, settings):
+        """Тест пересоздания реплик при изменении настроек."""
+        settings.DATABASE_REPLICAS = ["replica"]
+        settings.DATABASE_REPLICA_MAX_LAG = 1
+
+        assert get_replica_set().aliases == ["replica"]
+        assert get_replica_set().max_lag == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.views
+class TestReplicaPin:
+    """Тесты закрепления клиента за default после записи."""
+
+    def test_write_sets_pin_cookie(self, client, replica, item_usd):  # noqa: ARG002
+        """Тест cookie после записи сессии при добавлении в корзину."""
+        response = client.get(reverse("payments:add_to_cart", args=[item_usd.id]))
+
+        cookie = response.cookies[PIN_COOKIE]
+        assert cookie["max-age"] == 10
+        assert cookie["httponly"]
+
+    def test_read_only_request_not_pinned(self, client, replica):  # noqa: ARG002
+        """Тест что чтение не закрепляет клиента за default."""
+        response = client.get(reverse("payments:view_cart"))
+
+        assert PIN_COOKIE not in response.cookies
+
+    def test_order_detail_after_checkout_reads_default(
+        self, client, replica, item_usd, mocker
+    ):
+        """Тест что страница заказа после оформления читает из default."""
+        client.get(reverse("payments:add_to_cart", args=[item_usd.id]))
+        response = client.get(reverse("payments:checkout_cart"))
+        choose = mocker.spy(get_replica_set(), "choose")
+
+        page = client.get(response.url)
+
+        assert page.status_code == 200
+        assert page.context["order"] == Order.objects.get()
+        assert registry.counter("db.pinned_requests") == 2
+        choose.assert_not_called()
+
+    def test_unsafe_method_reads_default(self, client, replica, mocker):  # noqa: ARG002
+        """Тест что POST не читает с реплик."""
+        choose = mocker.spy(get_replica_set(), "choose")
+
+        client.post(reverse("payments:view_cart"))
+
+        choose.assert_not_called()
+
+    def test_without_replicas_no_cookie(self, client, item_usd):
+        """Тест что без реплик cookie не выставляется."""
+        response = client.get(reverse("payments:add_to_cart", args=[item_usd.id]))
+
+        assert PIN_COOKIE not in response.cookies
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.views
+def test_catalog_reads_replica(client, replica, item_usd, mocker):
+    """Тест что главная страница без cookie читает каталог с реплики."""
+    choose = mocker.spy(get_replica_set(), "choose")
+
+    response = client.get(reverse("payments:index"))
+
+    assert item_usd.name in response.content.decode()
+    assert choose.spy_return == replica
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.views
+def test_catalog_api_streams_from_replica(client, replica, item_usd, mocker):
+    """Тест что потоковый API каталога читает с реплики после middleware."""
+    iterator = mocker.spy(QuerySet, "iterator")
+
+    response = client.get(reverse("payments:catalog_api"))
+    content = b"".join(response.streaming_content).decode()
+
+    assert item_usd.name in content
+    assert iterator.call_args.args[0].db == replica
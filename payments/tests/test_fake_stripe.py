@@ -0,0 +1,236 @@
+"""Тесты для фиктивного Stripe API и работы оплаты через него."""
+
+import random
+from io import StringIO
+
+import pytest
+import stripe
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+
+from payments.coupons import get_coupon_registry
+from payments.fake_stripe import FakeStripe, Latency, decode_form
+from payments.metrics import registry
+from payments.models import StripeCoupon
+from payments.payment_intents import ensure_payment_intent
+from payments.stripe_calls import StripeUnavailable, call_stripe
+
+
+@pytest.fixture
+def fake_stripe(settings):
+    """Запускает фиктивный Stripe и направляет на него клиента."""
+    server = FakeStripe(seed=1).start()
+    settings.STRIPE_SECRET_KEY = "sk_test_fake"
+    settings.STRIPE_API_BASE = server.url
+    settings.STRIPE_RETRY_BACKOFF = 0
+    yield server
+    server.stop()
+
+
+@pytest.mark.unit
+class TestLatency:
+    """Тесты распределений задержки."""
+
+    @pytest.mark.parametrize(
+        ("spec", "expected"),
+        [
+            ("0.1", Latency("fixed", value=0.1)),
+            ("fixed:0.2", Latency("fixed", value=0.2)),
+            ("uniform:0.05:0.3", Latency("uniform", value=0.05, high=0.3)),
+            ("exponential:0.1", Latency("exponential", value=0.1)),
+            ("lognormal:0.1:0.8", Latency("lognormal", value=0.1, sigma=0.8)),
+        ],
+    )
+    def test_parse(self, spec, expected):
+        """Тест разбора описания задержки."""
+        assert Latency.parse(spec) == expected
+
+    @pytest.mark.parametrize("spec", ["gamma:1", "fixed:abc", "-1", "uniform:1:2:3"])
+    def test_parse_invalid(self, spec):
+        """Тест отказа для некорректного описания."""
+        with pytest.raises(ValueError):
+            Latency.parse(spec)
+
+    def test_samples_follow_distribution(self):
+        """Тест что выборки лежат в ожидаемых пределах."""
+        rng = random.Random(1)
+
+        uniform = [Latency.parse("uniform:0.1:0.2").sample(rng) for _ in range(200)]
+        lognormal = sorted(
+            Latency.parse("lognormal:0.1:0.5").sample(rng) for _ in range(1001)
+        )
+
+        assert all(0.1 <= value <= 0.2 for value in uniform)
+        assert 0.08 < lognormal[500] < 0.12
+        assert lognormal[-1] > 0.2
+        assert Latency.parse("exponential:0").sample(rng) == 0
+        assert Latency.parse("0.3").sample(rng) == 0.3
+
+    def test_str(self):
+        """Тест описания задержки для вывода команды."""
+        assert str(Latency.parse("uniform:0.05:0.3")) == "uniform 50-300 ms"
+        assert "median 100 ms" in str(Latency.parse("lognormal:0.1"))
+        assert str(Latency.parse("0.2")) == "fixed 200 ms"
+
+
+@pytest.mark.unit
+def test_decode_form_nested_keys():
+    """Тест разбора вложенных параметров Stripe."""
+    params = decode_form(
+        "amount=100&metadata[order_id]=7&automatic_payment_methods[enabled]=true"
+    )
+
+    assert params == {
+        "amount": "100",
+        "metadata": {"order_id": "7"},
+        "automatic_payment_methods": {"enabled": "true"},
+    }
+
+
+@pytest.mark.django_db
+class TestCheckoutAgainstFakeStripe:
+    """Тесты оплаты через библиотеку stripe и фиктивный сервер."""
+
+    def test_payment_intent_created_and_updated(self, fake_stripe, order_with_items):
+        """Тест создания, повторного использования и обновления Payment Intent."""
+        secret = ensure_payment_intent(order_with_items, order_with_items.pricing)
+        intent = fake_stripe.objects[order_with_items.payment_intent_id]
+        assert intent["client_secret"] == secret
+        assert intent["metadata"]["order_id"] == str(order_with_items.id)
+
+        pricing = order_with_items.pricing
+        assert ensure_payment_intent(order_with_items, pricing) == secret
+        assert fake_stripe.requests["payment_intent"] == 1
+
+        line = order_with_items.order_items.first()
+        line.quantity = 5
+        line.save()
+        order_with_items.refresh_from_db()
+        ensure_payment_intent(order_with_items, order_with_items.pricing)
+
+        updated = fake_stripe.objects[order_with_items.payment_intent_id]
+        assert updated["amount"] == order_with_items.payment_intent_amount
+        assert fake_stripe.requests["payment_intent"] == 2
+
+    def test_checkout_view(self, client, fake_stripe, order_with_items):
+        """Тест endpoint оплаты целиком через HTTP."""
+        url = reverse(
+            "payments:create_order_checkout_session", args=[order_with_items.id]
+        )
+
+        response = client.get(url)
+
+        assert response.status_code == 200
+        assert response.json()["clientSecret"].startswith("pi_")
+        assert registry.counter("stripe.requests") == 1
+        assert fake_stripe.requests["payment_intent"] == 1
+
+    def test_coupon_created_once(self, fake_stripe):
+        """Тест создания купона и повторного использования существующего."""
+        coupon_id = get_coupon_registry().get(10, name="TEN")
+        assert fake_stripe.objects[coupon_id]["percent_off"] == 10.0
+
+        get_coupon_registry().invalidate()
+        StripeCoupon.objects.all().delete()
+        assert get_coupon_registry().get(10, name="TEN") == coupon_id
+        assert fake_stripe.requests["coupon"] == 1
+
+    def test_invalid_coupon_rejected(self, fake_stripe):  # noqa: ARG002
+        """Тест ошибки Stripe для недопустимого процента."""
+        with pytest.raises(stripe.InvalidRequestError):
+            get_coupon_registry().get(150)
+
+
+@pytest.mark.django_db
+class TestFaults:
+    """Тесты искусственных сбоев."""
+
+    def test_rate_limit_retried(self, fake_stripe, order_with_items):
+        """Тест повтора ответа 429 с тем же ключом идемпотентности."""
+        fake_stripe.rate_limit_rate = 0.5
+        rolls = iter([0.0, 0.99])
+        fake_stripe._rng.random = lambda: next(rolls)
+
+        ensure_payment_intent(order_with_items, order_with_items.pricing)
+
+        assert fake_stripe.requests["rate_limited"] == 1
+        assert registry.counter("stripe.retries") == 1
+
+    def test_errors_exhaust_retries(self, fake_stripe, settings):
+        """Тест StripeUnavailable, когда Stripe отвечает только ошибками."""
+        settings.STRIPE_MAX_RETRIES = 1
+        fake_stripe.error_rate = 1.0
+
+        with pytest.raises(StripeUnavailable):
+            call_stripe(stripe.PaymentIntent.create, amount=100, currency="usd")
+
+        assert fake_stripe.requests["errors"] == 2
+
+    def test_idempotent_replay(self, fake_stripe):
+        """Тест повтора запроса с тем же ключом идемпотентности."""
+        first = call_stripe(
+            stripe.PaymentIntent.create,
+            amount=100,
+            currency="usd",
+            idempotency_key="k",
+        )
+        second = call_stripe(
+            stripe.PaymentIntent.create,
+            amount=100,
+            currency="usd",
+            idempotency_key="k",
+        )
+
+        assert first.id == second.id
+        assert fake_stripe.requests["idempotent_replays"] == 1
+        with pytest.raises(stripe.IdempotencyError):
+            call_stripe(
+                stripe.PaymentIntent.create,
+                amount=200,
+                currency="usd",
+                idempotency_key="k",
+            )
+
+    def test_missing_objects_and_auth(self, fake_stripe, settings):
+        """Тест ответов 404 и 401."""
+        with pytest.raises(stripe.InvalidRequestError) as excinfo:
+            call_stripe(stripe.PaymentIntent.retrieve, "pi_missing")
+        assert excinfo.value.code == "resource_missing"
+        with pytest.raises(stripe.InvalidRequestError):
+            call_stripe(stripe.PaymentIntent.create, amount=0, currency="usd")
+        with pytest.raises(stripe.InvalidRequestError):
+            call_stripe(stripe.PaymentIntent.create, amount=100)
+        with pytest.raises(stripe.InvalidRequestError):
+            call_stripe(stripe.Customer.create)
+
+        settings.STRIPE_SECRET_KEY = "pk_wrong"
+        with pytest.raises(stripe.AuthenticationError):
+            call_stripe(stripe.Coupon.retrieve, "any")
+
+
+@pytest.mark.unit
+class TestRunFakeStripeCommand:
+    """Тесты команды run_fake_stripe."""
+
+    def test_invalid_latency(self):
+        """Тест ошибки для некорректной задержки."""
+        with pytest.raises(CommandError):
+            call_command("run_fake_stripe", "--latency", "gamma:1", stdout=StringIO())
+
+    def test_invalid_rate(self):
+        """Тест ошибки для доли сбоев вне диапазона."""
+        with pytest.raises(CommandError):
+            call_command("run_fake_stripe", "--error-rate", "2", stdout=StringIO())
+
+    def test_serves_until_interrupted(self, mocker):
+        """Тест запуска и остановки сервера."""
+        serve = mocker.patch.object(
+            FakeStripe, "serve_forever", side_effect=KeyboardInterrupt
+        )
+        out = StringIO()
+
+        call_command("run_fake_stripe", "--port", "0", "--latency", "0.1", stdout=out)
+
+        serve.assert_called_once()
+        assert "http://127.0.0.1:" in out.getvalue()
+        assert "fixed 100 ms" in out.getvalue()
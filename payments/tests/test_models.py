@@ -3,6 +3,7 @@
 from decimal import Decimal
 
 import pytest
+from django.db import IntegrityError, transaction
 
 from payments.models import Discount, Item, Order, OrderItem, Tax
 
@@ -107,6 +108,13 @@ class TestOrderItemModel:
         order_item = OrderItem.objects.create(order=order_empty, item=item_usd)
         assert order_item.quantity == 1
 
+    def test_order_item_unique_per_order(self, order_empty, item_usd):
+        """Тест что товар встречается в заказе одной строкой."""
+        OrderItem.objects.create(order=order_empty, item=item_usd)
+
+        with pytest.raises(IntegrityError), transaction.atomic():
+            OrderItem.objects.create(order=order_empty, item=item_usd)
+
 
 @pytest.mark.django_db
 @pytest.mark.models
@@ -0,0 +1,168 @@
+"""Тесты паритета SQL-расчета Order.objects.with_totals() с расчетом в Python."""
+
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+
+from payments.models import Discount, ExchangeRate, Item, Order, OrderItem, Tax
+from payments.rates import get_rate_cache
+
+
+def _assert_parity(order: Order) -> None:
+    """Сравнивает SQL-аннотации заказа с методами Order.get_*."""
+    annotated = Order.objects.with_totals().get(pk=order.pk)
+    python_order = Order.objects.get(pk=order.pk)
+
+    assert annotated.calculated_subtotal == python_order.get_subtotal()
+    assert annotated.calculated_discount == python_order.get_discount_amount()
+    assert annotated.calculated_tax == python_order.get_tax_amount()
+    assert annotated.calculated_total == python_order.get_total_price()
+
+
+@pytest.mark.django_db
+@pytest.mark.models
+class TestOrderWithTotals:
+    """Тесты для Order.objects.with_totals()."""
+
+    def test_empty_order(self, order_empty):
+        """Тест заказа без позиций."""
+        annotated = Order.objects.with_totals().get(pk=order_empty.pk)
+        assert annotated.calculated_subtotal == 0
+        assert annotated.calculated_total == 0
+
+    def test_mixed_currencies(self, order_with_items):
+        """Тест заказа с товарами в разных валютах."""
+        annotated = Order.objects.with_totals().get(pk=order_with_items.pk)
+        assert annotated.calculated_subtotal == 13300
+        _assert_parity(order_with_items)
+
+    def test_discount_and_tax(self, order_with_discount_tax):
+        """Тест заказа со скидкой и налогом."""
+        annotated = Order.objects.with_totals().get(pk=order_with_discount_tax.pk)
+        assert annotated.calculated_discount == 500
+        assert annotated.calculated_tax == 900
+        assert annotated.calculated_total == 5400
+
+    def test_usd_to_eur_truncation(self, db):
+        """Тест что деление на курс отбрасывает дробную часть как int()."""
+        item = Item.objects.create(name="A", description="", price=1100)
+        order = Order.objects.create(payment_currency="eur")
+        OrderItem.objects.create(order=order, item=item, quantity=1)
+
+        annotated = Order.objects.with_totals().get(pk=order.pk)
+        assert annotated.calculated_subtotal == int(1100 / 1.1)  # 999
+        _assert_parity(order)
+
+    def test_bulk_created_items_without_matrix(self, db):
+        """Тест паритета для товаров из bulk_create с нерассчитанной матрицей."""
+        Item.objects.bulk_create(
+            [
+                Item(name="A", description="", price=1000, currency="usd"),
+                Item(name="B", description="", price=1000, currency="eur"),
+            ]
+        )
+        order = Order.objects.create(payment_currency="usd")
+        for item in Item.objects.all():
+            OrderItem.objects.create(order=order, item=item, quantity=1)
+
+        annotated = Order.objects.with_totals().get(pk=order.pk)
+        assert annotated.calculated_subtotal == 2100
+        _assert_parity(order)
+
+    def test_stale_matrix_after_rate_takes_effect(self, db):
+        """Тест паритета, когда вступил в силу курс, запланированный заранее."""
+        item = Item.objects.create(name="A", description="", price=1000, currency="eur")
+        order = Order.objects.create(payment_currency="usd")
+        OrderItem.objects.create(order=order, item=item, quantity=1)
+        rate = ExchangeRate.objects.create(
+            base_currency="eur",
+            quote_currency="usd",
+            rate=Decimal("1.5"),
+            effective_from=timezone.now() + timedelta(days=1),
+        )
+        # Курс вступает в силу без сохранения модели и пересчета матрицы
+        ExchangeRate.objects.filter(pk=rate.pk).update(
+            effective_from=timezone.now() - timedelta(minutes=1)
+        )
+        get_rate_cache().invalidate()
+
+        annotated = Order.objects.with_totals().get(pk=order.pk)
+        assert annotated.calculated_subtotal == 1500
+        _assert_parity(order)
+
+    def test_fractional_percent_truncation(self, db):
+        """Тест дробных процентов скидки и налога."""
+        item = Item.objects.create(name="A", description="", price=3333)
+        order = Order.objects.create(
+            payment_currency="usd",
+            discount=Discount.objects.create(percent=Decimal("12.34")),
+            tax=Tax.objects.create(percent=Decimal("33.33")),
+        )
+        OrderItem.objects.create(order=order, item=item, quantity=7)
+        _assert_parity(order)
+
+    def test_single_query_for_many_orders(
+        self, order_with_items, order_with_discount_tax, django_assert_num_queries
+    ):
+        """Тест что суммы всех заказов считаются одним запросом."""
+        with django_assert_num_queries(1):
+            totals = {
+                order.pk: order.calculated_total
+                for order in Order.objects.with_totals()
+            }
+        assert totals == {order_with_items.pk: 13300, order_with_discount_tax.pk: 5400}
+
+    def test_filter_and_order_by_calculated_total(
+        self, order_with_items, order_with_discount_tax
+    ):
+        """Тест фильтрации и сортировки по рассчитанной сумме."""
+        queryset = Order.objects.with_totals()
+        assert list(queryset.filter(calculated_total__gt=10000)) == [order_with_items]
+        assert list(queryset.order_by("calculated_total")) == [
+            order_with_discount_tax,
+            order_with_items,
+        ]
+
+    def test_randomized_parity(self, db):
+        """Тест паритета на случайных заказах."""
+        rng = random.Random(42)
+        items = [
+            Item.objects.create(
+                name=f"Item {i}",
+                description="",
+                price=rng.choice([1, 11, 99, 1100, 2200, rng.randint(1, 10**6)]),
+                currency=rng.choice(["usd", "eur"]),
+            )
+            for i in range(20)
+        ]
+        discounts = [
+            Discount.objects.create(percent=Decimal(p))
+            for p in ("5.00", "12.34", "33.33", "99.99")
+        ]
+        taxes = [
+            Tax.objects.create(percent=Decimal(p)) for p in ("0.01", "18.00", "27.77")
+        ]
+
+        orders = []
+        for _ in range(30):
+            order = Order.objects.create(
+                payment_currency=rng.choice(["usd", "eur"]),
+                discount=rng.choice([None, *discounts]),
+                tax=rng.choice([None, *taxes]),
+            )
+            for item in rng.sample(items, rng.randint(0, 6)):
+                OrderItem.objects.create(
+                    order=order, item=item, quantity=rng.randint(1, 50)
+                )
+            orders.append(order)
+
+        annotated = {order.pk: order for order in Order.objects.with_totals()}
+        for order in Order.objects.filter(pk__in=[o.pk for o in orders]):
+            row = annotated[order.pk]
+            assert row.calculated_subtotal == order.get_subtotal()
+            assert row.calculated_discount == order.get_discount_amount()
+            assert row.calculated_tax == order.get_tax_amount()
+            assert row.calculated_total == order.get_total_price()
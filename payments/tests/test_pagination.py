@@ -0,0 +1,138 @@
+"""Тесты для keyset-пагинации каталога."""
+
+import pytest
+from django.urls import reverse
+
+from payments.models import Item
+from payments.pagination import (
+    SORTS,
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    paginate_items,
+)
+
+
+@pytest.fixture
+def catalog(db):  # noqa: ARG001
+    """Создает каталог с повторяющимися названиями, ценами и валютами."""
+    return [
+        Item.objects.create(
+            name=f"Item {i % 7}",
+            description="",
+            price=1000 + (i % 5) * 100,
+            currency="eur" if i % 3 else "usd",
+        )
+        for i in range(40)
+    ]
+
+
+def _walk(sort, page_size):
+    """Проходит каталог по курсорам и возвращает ID в порядке страниц."""
+    ids = []
+    cursor = None
+    while True:
+        page = paginate_items(Item.objects.all(), sort, cursor, page_size)
+        ids.extend(item.id for item in page.items)
+        if page.next_cursor is None:
+            return ids
+        cursor = page.next_cursor
+
+
+@pytest.mark.django_db
+class TestPaginateItems:
+    """Тесты для paginate_items."""
+
+    @pytest.mark.parametrize("sort", list(SORTS))
+    def test_walk_matches_full_ordering(self, catalog, sort):
+        """Тест что обход по курсорам совпадает с полной сортировкой."""
+        expected = list(
+            Item.objects.order_by(*SORTS[sort]).values_list("id", flat=True)
+        )
+        assert _walk(sort, page_size=6) == expected
+
+    def test_one_query_per_page(self, catalog, django_assert_num_queries):
+        """Тест что любая страница стоит один запрос."""
+        first = paginate_items(Item.objects.all(), "price", None, 5)
+        second = paginate_items(Item.objects.all(), "price", first.next_cursor, 5)
+
+        with django_assert_num_queries(1):
+            paginate_items(Item.objects.all(), "price", second.next_cursor, 5)
+
+    def test_last_page_has_no_cursor(self, catalog):
+        """Тест отсутствия курсора на последней странице."""
+        page = paginate_items(Item.objects.all(), "name", None, 100)
+        assert len(page.items) == 40
+        assert page.next_cursor is None
+
+    def test_unknown_sort_falls_back(self, catalog):
+        """Тест сортировки по умолчанию для неизвестного значения."""
+        assert paginate_items(Item.objects.all(), "unknown").sort == "name"
+
+    def test_price_sort_uses_usd_equivalent(self, db):  # noqa: ARG002
+        """Тест что цены в разных валютах сравниваются в USD."""
+        cheap_usd = Item.objects.create(
+            name="A", description="", price=1050, currency="usd"
+        )
+        eur = Item.objects.create(name="B", description="", price=1000, currency="eur")
+
+        page = paginate_items(Item.objects.all(), "price")
+        assert page.items == [cheap_usd, eur]
+
+
+class TestCursor:
+    """Тесты для курсоров."""
+
+    def test_roundtrip(self):
+        """Тест упаковки и распаковки курсора."""
+        cursor = encode_cursor("currency", ["eur", "Item", 5])
+        assert decode_cursor(cursor, "currency") == ["eur", "Item", 5]
+
+    def test_cursor_is_opaque(self):
+        """Тест что курсор не раскрывает значения в открытом виде."""
+        assert "Secret name" not in encode_cursor("name", ["Secret name", 1])
+
+    def test_tampered_cursor(self):
+        """Тест отклонения поддельного курсора."""
+        cursor = encode_cursor("name", ["Item", 5])
+        with pytest.raises(InvalidCursor):
+            decode_cursor(cursor[:-2] + "xx", "name")
+
+    def test_cursor_for_other_sort(self):
+        """Тест отклонения курсора другой сортировки."""
+        cursor = encode_cursor("price", [1000, 5])
+        with pytest.raises(InvalidCursor):
+            decode_cursor(cursor, "name")
+
+
+@pytest.mark.django_db
+@pytest.mark.views
+class TestIndexPagination:
+    """Тесты пагинации на главной странице."""
+
+    def test_pages_via_next_link(self, client, catalog, settings):
+        """Тест перехода по ссылке «Далее»."""
+        settings.CATALOG_PAGE_SIZE = 30
+        first = client.get(reverse("payments:index"), {"sort": "price"})
+        page = paginate_items(Item.objects.all(), "price", None, 30)
+
+        second = client.get(
+            reverse("payments:index"), {"sort": "price", "cursor": page.next_cursor}
+        )
+
+        assert "cursor=" in first.content.decode()
+        assert second.status_code == 200
+        assert second.content.decode().count('class="item-card"') == 10
+
+    def test_invalid_cursor_shows_first_page(self, client, catalog, settings):
+        """Тест что поврежденный курсор открывает первую страницу."""
+        settings.CATALOG_PAGE_SIZE = 30
+        response = client.get(reverse("payments:index"), {"cursor": "garbage"})
+
+        assert response.status_code == 200
+        assert response.content.decode().count('class="item-card"') == 30
+
+    def test_unknown_sort_uses_default(self, client, catalog):
+        """Тест неизвестной сортировки на главной."""
+        response = client.get(reverse("payments:index"), {"sort": "drop table"})
+        assert response.status_code == 200
@@ -0,0 +1,236 @@
+"""Тесты для повторного использования Stripe Payment Intent."""
+
+from unittest.mock import AsyncMock
+
+import pytest
+import stripe
+from asgiref.sync import async_to_sync
+from django.urls import reverse
+
+from payments.models import Order, OrderItem
+from payments.payment_intents import (
+    OrderAlreadyPaid,
+    aensure_payment_intent,
+    build_payment_intent_params,
+    idempotency_key,
+)
+
+
+def _checkout(client, order):
+    """Запрашивает client_secret для заказа."""
+    url = reverse("payments:create_order_checkout_session", args=[order.id])
+    return client.get(url)
+
+
+def _add_item_eur(order):
+    """Увеличивает количество товара в EUR, меняя сумму заказа."""
+    line = OrderItem.objects.get(order=order, item__currency="eur")
+    line.quantity += 1
+    line.save()
+
+
+@pytest.mark.django_db
+@pytest.mark.views
+class TestPaymentIntentReuse:
+    """Тесты сохранения и повторного использования Payment Intent."""
+
+    def test_create_stores_intent(
+        self, client, order_with_items, mock_stripe_payment_intent
+    ):
+        """Тест сохранения Intent в заказе."""
+        _checkout(client, order_with_items)
+
+        order = Order.objects.get(pk=order_with_items.pk)
+        assert order.payment_intent_id == "pi_test_123"
+        assert order.payment_intent_client_secret == "pi_test_secret_123"
+        assert order.payment_intent_amount == order.total
+        assert order.payment_intent_currency == "usd"
+
+    def test_idempotency_key(
+        self, client, order_with_items, mock_stripe_payment_intent
+    ):
+        """Тест ключа идемпотентности из ID заказа, суммы и параметров."""
+        _checkout(client, order_with_items)
+
+        call_kwargs = mock_stripe_payment_intent.call_args.kwargs
+        params = build_payment_intent_params(order_with_items, order_with_items.pricing)
+        assert call_kwargs["idempotency_key"] == idempotency_key(
+            order_with_items, params
+        )
+        assert str(order_with_items.total) in call_kwargs["idempotency_key"]
+
+    def test_idempotency_key_covers_params(self, order_with_items):
+        """Тест что другие параметры при той же сумме дают другой ключ."""
+        params = build_payment_intent_params(order_with_items, order_with_items.pricing)
+        changed = {**params, "description": "Заказ | Скидка: 0%"}
+
+        assert idempotency_key(order_with_items, params) != idempotency_key(
+            order_with_items, changed
+        )
+        assert idempotency_key(order_with_items, params) == idempotency_key(
+            order_with_items, dict(reversed(params.items()))
+        )
+
+    def test_repeat_click_skips_stripe(
+        self, client, order_with_items, mock_stripe_payment_intent
+    ):
+        """Тест что повторный запрос не обращается к Stripe."""
+        first = _checkout(client, order_with_items)
+        second = _checkout(client, order_with_items)
+
+        assert mock_stripe_payment_intent.call_count == 1
+        assert second.json() == first.json()
+
+    def test_total_change_updates_amount(
+        self, client, order_with_items, mock_stripe_payment_intent, mocker
+    ):
+        """Тест обновления суммы существующего Intent при изменении заказа."""
+        retrieve = mocker.patch("stripe.PaymentIntent.retrieve")
+        retrieve.return_value.status = "requires_payment_method"
+        modify = mocker.patch("stripe.PaymentIntent.modify")
+        modify.return_value.id = "pi_test_123"
+        modify.return_value.client_secret = "pi_test_secret_123"
+        _checkout(client, order_with_items)
+        _add_item_eur(order_with_items)
+
+        response = _checkout(client, order_with_items)
+
+        order = Order.objects.get(pk=order_with_items.pk)
+        assert response.json()["clientSecret"] == "pi_test_secret_123"
+        assert mock_stripe_payment_intent.call_count == 1
+        assert retrieve.call_args.args == ("pi_test_123",)
+        modify.assert_called_once()
+        args, kwargs = modify.call_args
+        assert args == ("pi_test_123",)
+        assert kwargs["amount"] == order.total
+        assert "automatic_payment_methods" not in kwargs
+        assert order.payment_intent_amount == order.total
+
+    def test_update_keys_unique_per_call(
+        self, client, order_with_items, mock_stripe_payment_intent, mocker
+    ):
+        """Тест что возврат к прежней сумме не повторяет ключ обновления."""
+        mocker.patch(
+            "stripe.PaymentIntent.retrieve"
+        ).return_value.status = "requires_payment_method"
+        modify = mocker.patch("stripe.PaymentIntent.modify")
+        modify.return_value.id = "pi_test_123"
+        modify.return_value.client_secret = "pi_test_secret_123"
+        _checkout(client, order_with_items)
+        line = OrderItem.objects.get(order=order_with_items, item__currency="eur")
+        for quantity in (2, 1, 2):
+            line.quantity = quantity
+            line.save()
+            _checkout(client, order_with_items)
+
+        keys = [call.kwargs["idempotency_key"] for call in modify.call_args_list]
+        assert len(keys) == len(set(keys)) == 3
+
+    def test_canceled_intent_replaced(
+        self, client, order_with_items, mock_stripe_payment_intent, mocker
+    ):
+        """Тест создания нового Intent вместо отмененного."""
+        retrieve = mocker.patch("stripe.PaymentIntent.retrieve")
+        retrieve.return_value.id = "pi_test_123"
+        retrieve.return_value.status = "canceled"
+        modify = mocker.patch("stripe.PaymentIntent.modify")
+        _checkout(client, order_with_items)
+        _add_item_eur(order_with_items)
+        mock_stripe_payment_intent.return_value.id = "pi_new"
+
+        _checkout(client, order_with_items)
+
+        modify.assert_not_called()
+        assert mock_stripe_payment_intent.call_count == 2
+        key = mock_stripe_payment_intent.call_args.kwargs["idempotency_key"]
+        assert key.endswith("-replaces-pi_test_123")
+        assert Order.objects.get(pk=order_with_items.pk).payment_intent_id == "pi_new"
+
+    @pytest.mark.parametrize("status", ["processing", "succeeded", "requires_capture"])
+    def test_intent_in_payment_not_modified(
+        self, client, order_with_items, mock_stripe_payment_intent, mocker, status
+    ):
+        """Тест что сумма Intent не меняется, когда платеж уже начат."""
+        mocker.patch("stripe.PaymentIntent.retrieve").return_value.status = status
+        modify = mocker.patch("stripe.PaymentIntent.modify")
+        _checkout(client, order_with_items)
+        _add_item_eur(order_with_items)
+
+        response = _checkout(client, order_with_items)
+
+        assert response.status_code == 409
+        modify.assert_not_called()
+        assert mock_stripe_payment_intent.call_count == 1
+
+    def test_stripe_error_keeps_order_unchanged(self, client, order_with_items, mocker):
+        """Тест что при ошибке Stripe в заказе ничего не сохраняется."""
+        mocker.patch(
+            "stripe.PaymentIntent.create",
+            side_effect=stripe.InvalidRequestError("down", None),
+        )
+
+        assert _checkout(client, order_with_items).status_code == 400
+        assert Order.objects.get(pk=order_with_items.pk).payment_intent_id == ""
+
+    @pytest.mark.parametrize("status", Order.SETTLED_STATUSES)
+    def test_settled_order_rejected(
+        self, client, order_with_items, mock_stripe_payment_intent, status
+    ):
+        """Тест что оплаченный заказ не получает Payment Intent повторно."""
+        _checkout(client, order_with_items)
+        Order.objects.filter(pk=order_with_items.pk).update(status=status)
+
+        response = _checkout(client, order_with_items)
+
+        assert response.status_code == 409
+        assert "clientSecret" not in response.json()
+        assert mock_stripe_payment_intent.call_count == 1
+
+
+@pytest.mark.django_db
+class TestAsyncPaymentIntentReuse:
+    """Тесты асинхронного пути."""
+
+    def test_reuse_and_update(self, order_with_items, mocker):
+        """Тест создания, повторного использования и обновления Intent."""
+        create = mocker.patch(
+            "stripe.PaymentIntent.create_async", new_callable=AsyncMock
+        )
+        create.return_value.id = "pi_async"
+        create.return_value.client_secret = "pi_async_secret"
+        retrieve = mocker.patch(
+            "stripe.PaymentIntent.retrieve_async", new_callable=AsyncMock
+        )
+        retrieve.return_value.status = "requires_action"
+        modify = mocker.patch(
+            "stripe.PaymentIntent.modify_async", new_callable=AsyncMock
+        )
+        modify.return_value.id = "pi_async"
+        modify.return_value.client_secret = "pi_async_secret"
+
+        order = Order.objects.get(pk=order_with_items.pk)
+        ensure = async_to_sync(aensure_payment_intent)
+        assert ensure(order, order.pricing) == "pi_async_secret"
+        assert ensure(order, order.pricing) == "pi_async_secret"
+        assert create.await_count == 1
+
+        _add_item_eur(order)
+        order = Order.objects.get(pk=order.pk)
+        ensure(order, order.pricing)
+
+        modify.assert_awaited_once()
+        assert Order.objects.get(pk=order.pk).payment_intent_amount == order.total
+
+    def test_paid_order_rejected(self, order_with_items, mocker):
+        """Тест что асинхронный путь не обновляет Intent оплаченного заказа."""
+        modify = mocker.patch(
+            "stripe.PaymentIntent.modify_async", new_callable=AsyncMock
+        )
+        Order.objects.filter(pk=order_with_items.pk).update(
+            status=Order.STATUS_PAID, payment_intent_id="pi_paid"
+        )
+        order = Order.objects.get(pk=order_with_items.pk)
+
+        with pytest.raises(OrderAlreadyPaid):
+            async_to_sync(aensure_payment_intent)(order, order.pricing)
+        modify.assert_not_awaited()
@@ -0,0 +1,116 @@
+"""Тесты для матрицы цен товаров в валютах оплаты."""
+
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+
+from payments.models import ExchangeRate, Item, Order, OrderItem
+from payments.pricing import convert_to_base_currency
+from payments.rates import get_rate_cache
+
+
+@pytest.mark.django_db
+class TestItemPriceMatrix:
+    """Тесты для денормализованных цен Item.price_usd/price_eur."""
+
+    def test_matrix_filled_on_create(self, item_usd, item_eur, rate_table):
+        """Тест расчета цен во всех валютах при создании товара."""
+        assert item_usd.price_usd == 5000
+        assert item_usd.price_eur == convert_to_base_currency(5000, "usd", "eur")
+        assert item_eur.price_usd == 3300
+        assert item_eur.price_eur == 3000
+        assert item_eur.price_rate_version == rate_table.version
+
+    def test_matrix_updated_with_update_fields(self, item_eur):
+        """Тест пересчета матрицы при сохранении только цены."""
+        item_eur.price = 1000
+        item_eur.save(update_fields=["price"])
+
+        item_eur.refresh_from_db()
+        assert item_eur.price_usd == 1100
+        assert item_eur.price_eur == 1000
+
+    def test_get_price_in_uses_matrix(self, item_eur, django_assert_num_queries):
+        """Тест чтения цены из матрицы без конвертации."""
+        item_eur.price_usd = 1
+        with django_assert_num_queries(0):
+            assert item_eur.get_price_in("usd") == 1
+            assert item_eur.get_price_in("eur") == 3000
+
+    def test_get_price_in_falls_back_on_stale_version(self, item_eur):
+        """Тест конвертации на лету, если матрица рассчитана по старым курсам."""
+        Item.objects.filter(pk=item_eur.pk).update(price_usd=1, price_rate_version=999)
+        item = Item.objects.get(pk=item_eur.pk)
+        assert item.get_price_in("usd") == 3300
+
+    def test_refresh_price_matrix_single_query(
+        self, item_usd, item_eur, rate_table, django_assert_num_queries
+    ):
+        """Тест массового пересчета одним UPDATE товаров и ревизией каталога."""
+        Item.objects.update(price_usd=0, price_eur=0, price_rate_version=None)
+
+        with django_assert_num_queries(2):
+            assert Item.objects.refresh_price_matrix(rate_table) == 2
+
+        for item in Item.objects.all():
+            for currency in Item.PRICE_COLUMNS:
+                expected = convert_to_base_currency(
+                    item.price, item.currency, currency, rate_table
+                )
+                assert item.get_price_in(currency, rate_table) == expected
+            assert item.price_rate_version == rate_table.version
+
+    def test_sql_refresh_matches_python(self, db):  # noqa: ARG002
+        """Тест совпадения SQL-пересчета с Python до цента."""
+        ExchangeRate.objects.create(
+            base_currency="eur", quote_currency="usd", rate=Decimal("1.0837")
+        )
+        items = [
+            Item.objects.create(name=str(p), description="", price=p, currency=c)
+            for p, c in [(1, "eur"), (999, "usd"), (12345, "eur"), (77777, "usd")]
+        ]
+        expected = {item.pk: (item.price_usd, item.price_eur) for item in items}
+
+        Item.objects.update(price_usd=0, price_eur=0)
+        Item.objects.refresh_price_matrix()
+
+        actual = {
+            pk: (usd, eur)
+            for pk, usd, eur in Item.objects.values_list("pk", "price_usd", "price_eur")
+        }
+        assert actual == expected
+
+    def test_new_rate_refreshes_matrix(self, item_eur):
+        """Тест пересчета матрицы при появлении нового курса."""
+        rate = ExchangeRate.objects.create(
+            base_currency="eur", quote_currency="usd", rate=Decimal("2")
+        )
+
+        item_eur.refresh_from_db()
+        assert item_eur.price_usd == 6000
+        assert item_eur.price_rate_version == rate.pk
+
+    def test_order_pricing_reads_matrix(self, item_eur, django_assert_num_queries):
+        """Тест расчета заказа по матрице без дополнительных запросов."""
+        order = Order.objects.create(payment_currency="usd")
+        OrderItem.objects.create(order=order, item=item_eur, quantity=2)
+        order = Order.objects.get(pk=order.pk)
+        get_rate_cache().get()
+
+        with django_assert_num_queries(1):
+            assert order.get_subtotal() == 6600
+
+    def test_with_totals_reads_matrix(self, order_with_items):
+        """Тест использования матрицы в SQL-аннотации итогов."""
+        annotated = Order.objects.with_totals().get(pk=order_with_items.pk)
+        assert annotated.calculated_subtotal == order_with_items.get_subtotal()
+
+    def test_apply_exchange_rates_refreshes_matrix(self, item_eur):
+        """Тест пересчета матрицы командой apply_exchange_rates."""
+        Item.objects.update(price_usd=0, price_rate_version=None)
+
+        call_command("apply_exchange_rates")
+
+        item_eur.refresh_from_db()
+        assert item_eur.price_usd == 3300
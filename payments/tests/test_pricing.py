@@ -0,0 +1,123 @@
+"""Тесты для расчета стоимости заказов."""
+
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+
+from payments.models import Item, Order, OrderItem
+from payments.pricing import calculate_adjustments, format_amount, price_order
+
+
+@pytest.mark.unit
+class TestPricingHelpers:
+    """Тесты для вспомогательных функций расчета."""
+
+    def test_format_amount_usd(self):
+        """Тест форматирования суммы в USD."""
+        assert format_amount(12345, "usd") == "$123.45"
+
+    def test_format_amount_eur(self):
+        """Тест форматирования суммы в EUR."""
+        assert format_amount(500, "eur") == "€5.00"
+
+    def test_calculate_adjustments_without_discount_and_tax(self):
+        """Тест расчета без скидки и налога."""
+        assert calculate_adjustments(10000, None, None) == (0, 0)
+
+    def test_calculate_adjustments_truncates(self):
+        """Тест что дробная часть скидки и налога отбрасывается."""
+        discount, tax = calculate_adjustments(3333, Decimal("10.00"), Decimal("20.00"))
+        assert discount == 333  # 333.3
+        assert tax == 600  # (3333 - 333) * 20% = 600
+
+
+@pytest.mark.django_db
+@pytest.mark.models
+class TestOrderPricing:
+    """Тесты для разбивки стоимости заказа."""
+
+    def test_price_order_breakdown(self, order_with_items, discount_10, tax_20):
+        """Тест полной разбивки заказа."""
+        order_with_items.discount = discount_10
+        order_with_items.tax = tax_20
+        order_with_items.save()
+
+        pricing = price_order(order_with_items)
+
+        assert pricing.currency == "usd"
+        assert pricing.subtotal == 13300
+        assert pricing.discount_amount == 1330
+        assert pricing.tax_amount == 2394
+        assert pricing.total == 13300 - 1330 + 2394
+        assert pricing.items_count == 2
+
+    def test_price_order_lines(self, order_with_items, item_eur):
+        """Тест пересчета строк заказа в валюту оплаты."""
+        lines = {line.item.pk: line for line in price_order(order_with_items).lines}
+
+        eur_line = lines[item_eur.pk]
+        assert eur_line.unit_price == 3300
+        assert eur_line.total == 3300
+        assert eur_line.converted is True
+
+    def test_pricing_is_memoized(self, order_with_items, django_assert_num_queries):
+        """Тест что разбивка считается один раз на экземпляр."""
+        order = Order.objects.get(pk=order_with_items.pk)
+
+        with django_assert_num_queries(1):
+            order.get_subtotal()
+            order.get_discount_amount()
+            order.get_tax_amount()
+            order.get_total_price()
+            order.get_display_total()
+
+    def test_pricing_invalidated_on_new_line(self, order_empty, item_usd):
+        """Тест сброса кеша при добавлении строки в заказ."""
+        assert order_empty.get_total_price() == 0
+
+        OrderItem.objects.create(order=order_empty, item=item_usd, quantity=1)
+
+        assert order_empty.get_total_price() == 5000
+
+    def test_pricing_invalidated_on_save(self, order_with_discount_tax):
+        """Тест сброса кеша при сохранении заказа."""
+        assert order_with_discount_tax.get_total_price() == 5400
+
+        order_with_discount_tax.discount = None
+        order_with_discount_tax.save()
+
+        assert order_with_discount_tax.get_total_price() == 6000
+
+    def test_pricing_uses_prefetched_lines(
+        self, order_with_items, django_assert_num_queries
+    ):
+        """Тест использования prefetch_related без дополнительных запросов."""
+        order = Order.objects.prefetch_related("order_items__item").get(
+            pk=order_with_items.pk
+        )
+
+        with django_assert_num_queries(0):
+            assert order.get_subtotal() == 13300
+
+    def test_order_detail_constant_queries(
+        self, client, order_with_discount_tax, django_assert_num_queries
+    ):
+        """Тест что страница заказа не зависит от количества строк."""
+        url = reverse("payments:order_detail", args=[order_with_discount_tax.id])
+        client.get(url)  # прогрев сессии
+
+        with django_assert_num_queries(2):
+            client.get(url)
+
+        for i in range(5):
+            item = Item.objects.create(
+                name=f"Extra {i}", description="", price=100, currency="eur"
+            )
+            OrderItem.objects.create(
+                order=order_with_discount_tax, item=item, quantity=i + 1
+            )
+
+        with django_assert_num_queries(2):
+            response = client.get(url)
+        assert len(response.context["order"].pricing.lines) == 6
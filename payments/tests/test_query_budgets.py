@@ -0,0 +1,380 @@
+"""Бюджеты SQL-запросов для всех страниц приложения и админки.
+
+Каждый endpoint запрашивается на маленьком и большом наборе данных
+(1 и 100 позиций, 1 и 1000 заказов). Тест падает, если число запросов
+превышает бюджет или растет вместе с данными, и печатает SQL.
+"""
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from decimal import Decimal
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from django.contrib.admin import site
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from payments.catalog import reset_catalog_index
+from payments.models import (
+    Discount,
+    ExchangeRate,
+    Item,
+    Order,
+    OrderItem,
+    StripeCoupon,
+    StripeEvent,
+    Tax,
+)
+from payments.storefront import reset_storefront_cache
+from payments.urls import urlpatterns
+
+SMALL_LINES, LARGE_LINES = 1, 100
+SMALL_ORDERS, LARGE_ORDERS = 1, 1000
+
+
+def create_items(count: int) -> list[Item]:
+    """Создает товары в двух валютах; матрица цен не пересчитывается."""
+    start = Item.objects.count()
+    Item.objects.bulk_create(
+        Item(
+            name=f"Budget item {start + index}",
+            description="",
+            price=100 + index,
+            currency="usd" if index % 2 else "eur",
+        )
+        for index in range(count)
+    )
+    return list(Item.objects.order_by("-id")[:count])
+
+
+def create_order(lines: int, **fields: object) -> Order:
+    """Создает заказ с заданным числом позиций, скидкой и налогом."""
+    order = Order.objects.create(payment_currency="usd", **fields)
+    OrderItem.objects.bulk_create(
+        OrderItem(order=order, item=item, quantity=2) for item in create_items(lines)
+    )
+    order.order_items.first().save()  # пересчет итогов заказа
+    order.refresh_from_db()
+    return order
+
+
+def create_orders(count: int) -> None:
+    """Создает заказы с одной позицией для списков в админке."""
+    discount = Discount.objects.create(percent=Decimal("5.00"))
+    tax = Tax.objects.create(percent=Decimal("10.00"))
+    (item,) = create_items(1)
+    orders = Order.objects.bulk_create(
+        Order(payment_currency="usd", discount=discount, tax=tax) for _ in range(count)
+    )
+    OrderItem.objects.bulk_create(
+        OrderItem(order=order, item=item, quantity=1) for order in orders
+    )
+
+
+def fill_cart(client: Client, lines: int) -> None:
+    """Кладет в корзину сессии заданное число товаров."""
+    session = client.session
+    session["cart"] = {str(item.id): {"quantity": 1} for item in create_items(lines)}
+    session["payment_currency"] = "eur"
+    session.save()
+
+
+@dataclass(frozen=True)
+class Page:
+    """Страница, которую запрашивает тест."""
+
+    path: str
+    method: str = "get"
+    status: int = 200
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """Endpoint, способ подготовить данные размера size и бюджет запросов."""
+
+    name: str
+    prepare: Callable[[Client, int], Page]
+    budget: int
+    sizes: tuple[int, int] = (SMALL_LINES, LARGE_LINES)
+    admin: bool = False
+
+
+def _order_page(view: str, status: int = 200) -> Callable[[Client, int], Page]:
+    def prepare(client: Client, size: int) -> Page:  # noqa: ARG001
+        discount = Discount.objects.create(percent=Decimal("10.00"))
+        tax = Tax.objects.create(percent=Decimal("20.00"))
+        order = create_order(size, discount=discount, tax=tax)
+        return Page(reverse(f"payments:{view}", args=[order.id]), status=status)
+
+    return prepare
+
+
+def _cart_page(
+    view: str, status: int = 302, args: Callable[[], list] = list
+) -> Callable[[Client, int], Page]:
+    def prepare(client: Client, size: int) -> Page:
+        fill_cart(client, size)
+        return Page(reverse(f"payments:{view}", args=args()), status=status)
+
+    return prepare
+
+
+def _first_cart_item() -> list:
+    return [Item.objects.order_by("id").values_list("id", flat=True).first()]
+
+
+def _index(client: Client, size: int) -> Page:  # noqa: ARG001
+    create_items(size)
+    return Page(reverse("payments:index"))
+
+
+def _catalog_api(client: Client, size: int) -> Page:  # noqa: ARG001
+    create_items(size)
+    return Page(reverse("payments:catalog_api") + "?format=json")
+
+
+def _success(client: Client, size: int) -> Page:
+    order = create_order(size)
+    session = client.session
+    session["pending_order_id"] = order.id
+    session["cart"] = {"1": {"quantity": 1}}
+    session.save()
+    return Page(reverse("payments:success"))
+
+
+def _metrics(client: Client, size: int) -> Page:  # noqa: ARG001
+    return Page(reverse("payments:process_metrics"))
+
+
+def _webhook(client: Client, size: int) -> Page:  # noqa: ARG001
+    return Page(reverse("payments:stripe_webhook"), method="post", status=400)
+
+
+def _changelist(model: str, fill: Callable[[int], object]) -> Callable:
+    def prepare(client: Client, size: int) -> Page:  # noqa: ARG001
+        fill(size)
+        return Page(reverse(f"admin:payments_{model}_changelist"))
+
+    return prepare
+
+
+def _order_change(client: Client, size: int) -> Page:  # noqa: ARG001
+    order = create_order(size)
+    return Page(reverse("admin:payments_order_change", args=[order.id]))
+
+
+def _rates(count: int) -> None:
+    ExchangeRate.objects.bulk_create(
+        ExchangeRate(
+            base_currency="eur",
+            quote_currency="usd",
+            rate=Decimal("1.1") + Decimal(index) / 10000,
+            effective_from=f"2020-01-01T00:{index // 60 % 60:02}:{index % 60:02}Z",
+        )
+        for index in range(count)
+    )
+
+
+def _coupons(count: int) -> None:
+    start = StripeCoupon.objects.count()
+    StripeCoupon.objects.bulk_create(
+        StripeCoupon(
+            percent=Decimal(start + index) / 100, coupon_id=f"c-{start + index}"
+        )
+        for index in range(count)
+    )
+
+
+def _events(count: int) -> None:
+    start = StripeEvent.objects.count()
+    StripeEvent.objects.bulk_create(
+        StripeEvent(event_id=f"evt_{start + index}", type="charge.refunded")
+        for index in range(count)
+    )
+
+
+SCENARIOS = [
+    Scenario("index", _index, budget=1),
+    # Ревизия каталога для ETag и товары одним серверным курсором
+    Scenario("catalog_api", _catalog_api, budget=2),
+    Scenario("order_detail", _order_page("order_detail"), budget=2),
+    Scenario(
+        "create_order_checkout_session",
+        _order_page("create_order_checkout_session"),
+        budget=3,
+    ),
+    Scenario(
+        "create_order_checkout_session_async",
+        _order_page("create_order_checkout_session_async"),
+        budget=4,
+    ),
+    Scenario("view_cart", _cart_page("view_cart", status=200), budget=2),
+    Scenario("add_to_cart", _cart_page("add_to_cart", args=_first_cart_item), budget=5),
+    Scenario(
+        "remove_from_cart",
+        _cart_page("remove_from_cart", args=_first_cart_item),
+        budget=4,
+    ),
+    Scenario(
+        "update_cart_quantity",
+        _cart_page(
+            "update_cart_quantity", args=lambda: [*_first_cart_item(), "increase"]
+        ),
+        budget=4,
+    ),
+    Scenario("buy_now", _cart_page("buy_now", args=_first_cart_item), budget=5),
+    Scenario(
+        "change_currency",
+        _cart_page("change_currency", args=lambda: ["usd"]),
+        budget=4,
+    ),
+    Scenario("checkout_cart", _cart_page("checkout_cart"), budget=9),
+    Scenario("success", _success, budget=4),
+    Scenario("stripe_webhook", _webhook, budget=0),
+    Scenario("process_metrics", _metrics, budget=2, admin=True),
+    Scenario(
+        "admin_order_changelist",
+        _changelist("order", create_orders),
+        budget=9,
+        sizes=(SMALL_ORDERS, LARGE_ORDERS),
+        admin=True,
+    ),
+    Scenario("admin_order_change", _order_change, budget=11, admin=True),
+    Scenario(
+        "admin_item_changelist",
+        _changelist("item", create_items),
+        budget=6,
+        sizes=(SMALL_ORDERS, LARGE_ORDERS),
+        admin=True,
+    ),
+    Scenario(
+        "admin_discount_changelist",
+        _changelist(
+            "discount",
+            lambda n: Discount.objects.bulk_create(
+                Discount(percent=Decimal(i % 100)) for i in range(n)
+            ),
+        ),
+        budget=5,
+        sizes=(SMALL_ORDERS, LARGE_ORDERS),
+        admin=True,
+    ),
+    Scenario(
+        "admin_tax_changelist",
+        _changelist(
+            "tax",
+            lambda n: Tax.objects.bulk_create(
+                Tax(percent=Decimal(i % 100)) for i in range(n)
+            ),
+        ),
+        budget=5,
+        sizes=(SMALL_ORDERS, LARGE_ORDERS),
+        admin=True,
+    ),
+    Scenario(
+        "admin_exchangerate_changelist",
+        _changelist("exchangerate", _rates),
+        budget=9,
+        sizes=(SMALL_ORDERS, LARGE_ORDERS),
+        admin=True,
+    ),
+    Scenario(
+        "admin_stripecoupon_changelist",
+        _changelist("stripecoupon", _coupons),
+        budget=5,
+        sizes=(SMALL_ORDERS, LARGE_ORDERS),
+        admin=True,
+    ),
+    Scenario(
+        "admin_stripeevent_changelist",
+        _changelist("stripeevent", _events),
+        budget=6,
+        sizes=(SMALL_ORDERS, LARGE_ORDERS),
+        admin=True,
+    ),
+]
+
+
+def format_queries(context: CaptureQueriesContext) -> str:
+    """Нумерованный список выполненных SQL-запросов."""
+    return "\n".join(
+        f"{number}. {query['sql']}"
+        for number, query in enumerate(context.captured_queries, start=1)
+    )
+
+
+def measure(client: Client, page: Page) -> CaptureQueriesContext:
+    """Выполняет запрос с холодными кешами воркера и записывает SQL."""
+    cache.clear()
+    reset_catalog_index()
+    reset_storefront_cache()
+    with CaptureQueriesContext(connection) as context:
+        response = getattr(client, page.method)(page.path)
+        if response.streaming:
+            b"".join(response.streaming_content)
+    assert response.status_code == page.status, response.content[:500]
+    return context
+
+
+@pytest.fixture
+def stripe_stub(mocker):
+    """Заменяет ответы Stripe, не влияя на запросы к БД."""
+    intent = Mock(id="pi_budget", client_secret="pi_budget_secret")
+    mocker.patch("stripe.PaymentIntent.create", return_value=intent)
+    mocker.patch("stripe.PaymentIntent.modify", return_value=intent)
+    mocker.patch(
+        "stripe.PaymentIntent.create_async", new_callable=AsyncMock, return_value=intent
+    )
+
+
+def _user_client(client: Client, admin_user, scenario: Scenario) -> Client:
+    """Клиент без входа для страниц магазина, с входом для админки."""
+    if scenario.admin:
+        client.force_login(admin_user)
+    return client
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+@pytest.mark.usefixtures("stripe_stub")
+@pytest.mark.parametrize("scenario", SCENARIOS, ids=lambda scenario: scenario.name)
+def test_query_budget(scenario, client, admin_user, settings):
+    """Число запросов не превышает бюджет и не зависит от объема данных."""
+    settings.STRIPE_WEBHOOK_SECRET = "whsec_budget"
+    client = _user_client(client, admin_user, scenario)
+    small_size, large_size = scenario.sizes
+
+    small = measure(client, scenario.prepare(client, small_size))
+    large = measure(client, scenario.prepare(client, large_size))
+
+    failures = []
+    if len(large) > len(small):
+        failures.append(
+            f"число запросов растет с данными: {len(small)} при size={small_size}, "
+            f"{len(large)} при size={large_size}"
+        )
+    if len(large) > scenario.budget:
+        failures.append(f"{len(large)} запросов при бюджете {scenario.budget}")
+    if failures:
+        pytest.fail(
+            f"{scenario.name}: {'; '.join(failures)}\n\n"
+            f"SQL при size={large_size}:\n{format_queries(large)}",
+            pytrace=False,
+        )
+
+
+def test_every_page_has_budget():
+    """Тест что у каждого URL приложения и списка в админке есть бюджет."""
+    names = {scenario.name for scenario in SCENARIOS}
+    changelists = {
+        f"admin_{model._meta.model_name}_changelist"
+        for model in site._registry
+        if model._meta.app_label == "payments"
+    }
+
+    assert {pattern.name for pattern in urlpatterns} - names == set()
+    assert changelists - names == set()
@@ -0,0 +1,184 @@
+"""Планы горячих запросов на больших таблицах (только Postgres).
+
+Таблицы заполняются синтетическими данными и анализируются, после чего
+для каждого запроса выполняется EXPLAIN. Тест падает, если план читает
+большую таблицу последовательным сканированием, и печатает план.
+"""
+
+import json
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any
+
+import pytest
+from django.db import connection
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from payments.models import Discount, Item, Order, OrderItem, Tax
+from payments.pagination import SORTS, after_key_filter
+
+pytestmark = [
+    pytest.mark.slow,
+    pytest.mark.skipif(
+        connection.vendor != "postgresql",
+        reason="EXPLAIN проверяется только на Postgres",
+    ),
+]
+
+ITEMS = 5_000
+ORDERS = 20_000
+
+LARGE_TABLES = {Item._meta.db_table, Order._meta.db_table, OrderItem._meta.db_table}
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """Объекты, по которым строятся условия запросов."""
+
+    discount: Discount
+    tax: Tax
+    item: Item
+    order_ids: list[int]
+    payment_intent_id: str
+
+
+@dataclass(frozen=True)
+class HotQuery:
+    """Горячий запрос приложения или админки."""
+
+    name: str
+    build: Callable[[Dataset], QuerySet]
+
+
+def _orders() -> QuerySet[Order]:
+    # Порядок списка заказов в админке: Meta.ordering и -pk
+    return Order.objects.order_by("-created_at", "-id")
+
+
+def _catalog_page(sort: str) -> Callable[[Dataset], QuerySet]:
+    def build(data: Dataset) -> QuerySet:
+        fields = SORTS[sort]
+        values = [getattr(data.item, field.lstrip("-")) for field in fields]
+        return Item.objects.order_by(*fields).filter(after_key_filter(fields, values))[
+            :51
+        ]
+
+    return build
+
+
+HOT_QUERIES = [
+    HotQuery("orders_latest", lambda data: _orders()[:100]),  # noqa: ARG005
+    HotQuery(
+        "orders_by_date",
+        lambda data: _orders().filter(  # noqa: ARG005
+            created_at__gte=timezone.now() - timedelta(days=7),
+            created_at__lt=timezone.now() - timedelta(days=6),
+        )[:100],
+    ),
+    HotQuery(
+        "orders_by_discount",
+        lambda data: _orders().filter(discount=data.discount)[:100],
+    ),
+    HotQuery("orders_by_tax", lambda data: _orders().filter(tax=data.tax)[:100]),
+    HotQuery(
+        "orders_for_payment_intent",
+        lambda data: Order.objects.filter(
+            Q(payment_intent_id=data.payment_intent_id) | Q(pk=data.order_ids[0])
+        ),
+    ),
+    HotQuery(
+        "order_lines",
+        lambda data: OrderItem.objects.filter(order_id__in=data.order_ids),
+    ),
+    HotQuery(
+        "orders_with_item",
+        lambda data: (
+            OrderItem.objects.filter(item=data.item)
+            .values_list("order_id", flat=True)
+            .distinct()
+        ),
+    ),
+    *(HotQuery(f"catalog_{sort}", _catalog_page(sort)) for sort in SORTS),
+]
+
+
+def seq_scans(plan: dict[str, Any]) -> Iterator[str]:
+    """Возвращает большие таблицы, которые план читает целиком."""
+    if plan["Node Type"] == "Seq Scan" and plan["Relation Name"] in LARGE_TABLES:
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from seq_scans(child)
+
+
+@pytest.fixture
+def dataset(db) -> Dataset:  # noqa: ARG001
+    """Заполняет таблицы товаров и заказов и обновляет их статистику."""
+    discounts = Discount.objects.bulk_create(Discount(percent=p) for p in range(1, 21))
+    taxes = Tax.objects.bulk_create(Tax(percent=p) for p in range(1, 11))
+    Item.objects.bulk_create(
+        (
+            Item(
+                name=f"Item {index:05d}",
+                description="",
+                price=100 + index,
+                currency="usd" if index % 2 else "eur",
+            )
+            for index in range(ITEMS)
+        ),
+        batch_size=1000,
+    )
+    Order.objects.bulk_create(
+        (
+            Order(
+                payment_currency="usd",
+                # Скидка у 10% заказов, налог у 30%
+                discount=discounts[index % 20] if index % 10 == 0 else None,
+                tax=taxes[index % 10] if index % 10 < 3 else None,
+                payment_intent_id=f"pi_{index}" if index % 2 else "",
+            )
+            for index in range(ORDERS)
+        ),
+        batch_size=1000,
+    )
+    with connection.cursor() as cursor:
+        # created_at заполняется при вставке; распределяем заказы по году
+        cursor.execute(
+            f"UPDATE {Order._meta.db_table} "  # noqa: S608
+            "SET created_at = now() - (id % 365) * interval '1 day' "
+            "- (id % 1440) * interval '1 minute'"
+        )
+        cursor.execute(
+            f"INSERT INTO {OrderItem._meta.db_table} (order_id, item_id, quantity) "  # noqa: S608
+            "SELECT o.id, i.first + (o.id + line * %s) %% %s, line "
+            f"FROM {Order._meta.db_table} o, "
+            f"(SELECT min(id) AS first FROM {Item._meta.db_table}) i, "
+            "generate_series(1, 2) line",
+            [ITEMS // 2, ITEMS],
+        )
+        cursor.execute(f"ANALYZE {', '.join(sorted(LARGE_TABLES))}")
+
+    order_ids = list(Order.objects.order_by("-id").values_list("id", flat=True)[:20])
+    return Dataset(
+        discount=discounts[0],
+        tax=taxes[0],
+        item=Item.objects.order_by("name", "id")[ITEMS // 2],
+        order_ids=order_ids,
+        payment_intent_id="pi_101",
+    )
+
+
+def test_hot_queries_use_indexes(dataset):
+    """Тест что ни один горячий запрос не сканирует большую таблицу целиком."""
+    failures = []
+    for query in HOT_QUERIES:
+        explained = json.loads(query.build(dataset).explain(format="json"))
+        plan = explained[0]["Plan"]
+        if tables := sorted(set(seq_scans(plan))):
+            failures.append(
+                f"{query.name}: Seq Scan по {', '.join(tables)}\n"
+                + json.dumps(plan, indent=2)
+            )
+
+    assert not failures, "\n\n".join(failures)
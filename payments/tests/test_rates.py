@@ -0,0 +1,358 @@
+"""Тесты для курсов валют и кеша курсов."""
+
+import json
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from types import MappingProxyType
+
+import pytest
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.utils import timezone
+
+from payments.models import ExchangeRate, Item, Order, OrderItem
+from payments.pricing import convert_to_base_currency
+from payments.rates import (
+    DatabaseRateProvider,
+    FileRateProvider,
+    RateCache,
+    RateEntry,
+    RateProvider,
+    RateTable,
+    build_rate_table,
+    get_rate_table,
+)
+from payments.totals import reprice_for_current_rates
+
+
+class CountingProvider(RateProvider):
+    """Провайдер, считающий количество загрузок."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.loaded = threading.Event()
+
+    def load(self) -> RateTable:
+        self.calls += 1
+        self.loaded.set()
+        return RateTable(version=self.calls)
+
+
+class FailingProvider(RateProvider):
+    """Провайдер, который не может загрузить курсы."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def load(self) -> RateTable:
+        self.calls += 1
+        raise DatabaseError("db is down")
+
+
+def _entry(id_: int, rate: str, days_ago: int = 1) -> RateEntry:
+    """Создает запись курса EUR→USD."""
+    return RateEntry(
+        id=id_,
+        base_currency="eur",
+        quote_currency="usd",
+        rate=Decimal(rate),
+        effective_from=timezone.now() - timedelta(days=days_ago),
+    )
+
+
+@pytest.mark.unit
+class TestRateTable:
+    """Тесты для таблицы курсов."""
+
+    def test_default_table(self):
+        """Тест курсов по умолчанию."""
+        table = RateTable(version=0)
+        assert table.convert(1000, "eur", "usd") == 1100
+        assert table.convert(1100, "usd", "eur") == int(1100 / 1.1)
+
+    def test_unknown_pair_returns_price(self):
+        """Тест что неизвестная пара не конвертируется."""
+        table = RateTable(version=0)
+        assert table.convert(1000, "gbp", "usd") == 1000
+
+    def test_direct_rate_has_priority(self):
+        """Тест что прямой курс важнее обратного."""
+        table = RateTable(
+            version=1,
+            rates=MappingProxyType({("eur", "usd"): 1.1, ("usd", "eur"): 0.5}),
+        )
+        assert table.convert(1000, "usd", "eur") == 500
+
+    def test_build_rate_table_latest_effective(self):
+        """Тест выбора последнего вступившего в силу курса."""
+        table = build_rate_table(
+            [
+                _entry(1, "1.05", days_ago=10),
+                _entry(3, "1.2", days_ago=-1),
+                _entry(2, "1.15"),
+            ]
+        )
+        assert table.version == 2
+        assert table.rates[("eur", "usd")] == 1.15
+
+    def test_build_rate_table_without_entries(self):
+        """Тест пустого источника."""
+        table = build_rate_table([])
+        assert table.version == 0
+        assert table.rates[("eur", "usd")] == 1.1
+
+
+@pytest.mark.unit
+class TestRateCache:
+    """Тесты для кеша курсов с TTL."""
+
+    def test_fresh_table_is_not_reloaded(self, mocker):
+        """Тест что свежая таблица берется из памяти."""
+        monotonic = mocker.patch("payments.rates.time.monotonic", return_value=100.0)
+        provider = CountingProvider()
+        cache = RateCache(provider, ttl=60, stale_ttl=60)
+
+        cache.get()
+        monotonic.return_value = 150.0
+        cache.get()
+
+        assert provider.calls == 1
+
+    def test_stale_table_refreshed_in_background(self, mocker):
+        """Тест stale-while-revalidate: отдается старая таблица, обновление в фоне."""
+        monotonic = mocker.patch("payments.rates.time.monotonic", return_value=100.0)
+        mocker.patch("payments.rates.connections")
+        provider = CountingProvider()
+        cache = RateCache(provider, ttl=60, stale_ttl=60)
+        assert cache.get().version == 1
+
+        provider.loaded.clear()
+        monotonic.return_value = 170.0
+        assert cache.get().version == 1
+        assert provider.loaded.wait(timeout=5)
+
+    def test_expired_table_refreshed_synchronously(self, mocker):
+        """Тест синхронного обновления после окна stale."""
+        monotonic = mocker.patch("payments.rates.time.monotonic", return_value=100.0)
+        provider = CountingProvider()
+        cache = RateCache(provider, ttl=60, stale_ttl=60)
+        cache.get()
+
+        monotonic.return_value = 300.0
+        assert cache.get().version == 2
+
+    def test_failed_refresh_keeps_previous_table(self):
+        """Тест что ошибка источника не ломает конвертацию."""
+        cache = RateCache(CountingProvider(), ttl=60, stale_ttl=60)
+        cache.get()
+        cache.provider = FailingProvider()
+
+        assert cache.refresh().version == 1
+
+    def test_failed_first_load_uses_defaults(self):
+        """Тест курсов по умолчанию, если источник недоступен."""
+        cache = RateCache(FailingProvider(), ttl=60, stale_ttl=60)
+        assert cache.get().version == 0
+
+    def test_failed_load_backs_off(self, mocker):
+        """Тест что после ошибки источник не опрашивается до error_ttl."""
+        monotonic = mocker.patch("payments.rates.time.monotonic", return_value=100.0)
+        provider = FailingProvider()
+        cache = RateCache(provider, ttl=60, stale_ttl=60, error_ttl=10)
+
+        assert cache.get().version == 0
+        monotonic.return_value = 105.0
+        assert cache.get().version == 0
+        assert provider.calls == 1
+
+        monotonic.return_value = 111.0
+        cache.get()
+        assert provider.calls == 2
+
+    def test_failed_reload_serves_previous_table(self, mocker):
+        """Тест что при недоступном источнике отдается последняя таблица."""
+        monotonic = mocker.patch("payments.rates.time.monotonic", return_value=100.0)
+        cache = RateCache(CountingProvider(), ttl=60, stale_ttl=60, error_ttl=10)
+        cache.get()
+        provider = cache.provider = FailingProvider()
+
+        monotonic.return_value = 300.0
+        assert cache.get().version == 1
+        assert cache.get().version == 1
+        assert provider.calls == 1
+
+    def test_invalidate(self):
+        """Тест сброса кеша."""
+        provider = CountingProvider()
+        cache = RateCache(provider, ttl=60, stale_ttl=60)
+        cache.get()
+        cache.invalidate()
+        cache.get()
+        assert provider.calls == 2
+
+
+@pytest.mark.django_db
+class TestRateProviders:
+    """Тесты для источников курсов."""
+
+    def test_database_provider(self):
+        """Тест загрузки курсов из БД."""
+        rate = ExchangeRate.objects.create(
+            base_currency="eur", quote_currency="usd", rate=Decimal("1.2")
+        )
+        ExchangeRate.objects.create(
+            base_currency="eur",
+            quote_currency="usd",
+            rate=Decimal("1.5"),
+            effective_from=timezone.now() + timedelta(days=1),
+        )
+
+        table = DatabaseRateProvider().load()
+
+        assert table.version == rate.pk
+        assert table.rates[("eur", "usd")] == 1.2
+
+    def test_file_provider(self, tmp_path):
+        """Тест загрузки курсов из файла."""
+        path = tmp_path / "rates.json"
+        path.write_text(
+            json.dumps(
+                {
+                    "rates": [
+                        {"base": "EUR", "quote": "USD", "rate": "1.25"},
+                        {
+                            "base": "usd",
+                            "quote": "gbp",
+                            "rate": 0.8,
+                            "effective_from": "2020-01-01T00:00:00",
+                        },
+                    ]
+                }
+            )
+        )
+
+        table = FileRateProvider(path).load()
+
+        assert table.version == 2
+        assert table.rates[("eur", "usd")] == 1.25
+        assert table.convert(1000, "usd", "gbp") == 800
+
+    def test_file_provider_from_settings(self, tmp_path, settings):
+        """Тест выбора файлового источника через настройки."""
+        path = tmp_path / "rates.json"
+        path.write_text(
+            json.dumps({"rates": [{"base": "eur", "quote": "usd", "rate": 2}]})
+        )
+        settings.EXCHANGE_RATE_PROVIDER = "payments.rates.FileRateProvider"
+        settings.EXCHANGE_RATE_FILE = str(path)
+
+        assert convert_to_base_currency(1000, "eur", "usd") == 2000
+
+
+@pytest.mark.django_db
+class TestExchangeRateIntegration:
+    """Тесты применения курсов к заказам."""
+
+    def test_conversion_does_not_query_db(self, rate_table, django_assert_num_queries):
+        """Тест что конвертация берет курсы из памяти."""
+        with django_assert_num_queries(0):
+            for price in range(100):
+                convert_to_base_currency(price, "eur", "usd")
+
+    def test_exchange_rate_str(self):
+        """Тест строкового представления курса."""
+        rate = ExchangeRate(
+            base_currency="eur",
+            quote_currency="usd",
+            rate=Decimal("1.2"),
+            effective_from=timezone.now().replace(2025, 1, 2, 3, 4),
+        )
+        assert str(rate) == "1 EUR = 1.2 USD с 02.01.2025 03:04"
+
+    def test_order_records_rate_version(self, order_with_items):
+        """Тест что заказ запоминает версию курсов."""
+        assert order_with_items.rate_version == get_rate_table().version == 0
+
+    def test_new_rate_keeps_stored_totals(self, order_with_items):
+        """Тест что сохранение курса не пересчитывает заказы в запросе."""
+        ExchangeRate.objects.create(
+            base_currency="eur", quote_currency="usd", rate=Decimal("1.5")
+        )
+
+        order = Order.objects.get(pk=order_with_items.pk)
+        assert order.rate_version == 0
+        assert order.subtotal == 10000 + 3300
+        assert order.get_subtotal() == 10000 + 4500
+
+    def test_reprice_for_current_rates(self, order_with_items):
+        """Тест пересчета заказов по новой версии курсов."""
+        rate = ExchangeRate.objects.create(
+            base_currency="eur", quote_currency="usd", rate=Decimal("1.5")
+        )
+
+        assert reprice_for_current_rates() == 1
+
+        order = Order.objects.get(pk=order_with_items.pk)
+        assert order.rate_version == rate.pk
+        assert order.subtotal == 10000 + 4500
+
+    def test_same_currency_orders_not_repriced(self, order_with_discount_tax):
+        """Тест что заказы без конвертации не пересчитываются."""
+        ExchangeRate.objects.create(
+            base_currency="eur", quote_currency="usd", rate=Decimal("1.5")
+        )
+
+        assert reprice_for_current_rates() == 0
+
+        order = Order.objects.get(pk=order_with_discount_tax.pk)
+        assert order.rate_version == 0
+
+    @pytest.mark.parametrize("status", Order.SETTLED_STATUSES)
+    def test_settled_orders_not_repriced(self, order_with_items, status):
+        """Тест что оплаченный заказ сохраняет сумму платежа."""
+        Order.objects.filter(pk=order_with_items.pk).update(status=status)
+        ExchangeRate.objects.create(
+            base_currency="eur", quote_currency="usd", rate=Decimal("1.5")
+        )
+
+        assert reprice_for_current_rates() == 0
+
+        order = Order.objects.get(pk=order_with_items.pk)
+        assert order.rate_version == 0
+        assert order.total == order_with_items.total
+
+    def test_with_totals_uses_current_rates(self, db):
+        """Тест паритета SQL-расчета с нестандартным курсом."""
+        ExchangeRate.objects.create(
+            base_currency="eur", quote_currency="usd", rate=Decimal("1.234567")
+        )
+        order = Order.objects.create(payment_currency="usd")
+        for price, currency in [(999, "eur"), (1100, "usd"), (12345, "eur")]:
+            item = Item.objects.create(
+                name=str(price), description="", price=price, currency=currency
+            )
+            OrderItem.objects.create(order=order, item=item, quantity=3)
+        eur_order = Order.objects.create(payment_currency="eur")
+        OrderItem.objects.create(order=eur_order, item=item, quantity=1)
+        OrderItem.objects.create(
+            order=eur_order, item=Item.objects.get(name="1100"), quantity=1
+        )
+
+        for annotated in Order.objects.with_totals():
+            assert annotated.calculated_subtotal == annotated.get_subtotal()
+
+    def test_apply_exchange_rates_command(self, order_with_items, capsys):
+        """Тест команды применения курсов."""
+        rate = ExchangeRate.objects.create(
+            base_currency="eur", quote_currency="usd", rate=Decimal("1.5")
+        )
+        Order.objects.update(rate_version=0, subtotal=0)
+
+        call_command("apply_exchange_rates")
+
+        order = Order.objects.get(pk=order_with_items.pk)
+        assert order.subtotal == 14500
+        output = capsys.readouterr().out
+        assert f"Версия курсов: {rate.pk}" in output
+        assert "обновлено товаров: 2, заказов: 1" in output
@@ -0,0 +1,147 @@
+"""Тесты для компактного сериализатора сессий."""
+
+import json
+from datetime import timedelta
+
+import pytest
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core import signing
+from django.urls import reverse
+from django.utils import timezone
+
+from payments.metrics import registry
+from payments.sessions import (
+    FORMAT_VERSION,
+    CompactSessionSerializer,
+    decode_session,
+    encode_session,
+)
+
+AUTH = {
+    "_auth_user_id": "1",
+    "_auth_user_backend": "django.contrib.auth.backends.ModelBackend",
+    "_auth_user_hash": "f" * 64,
+}
+
+
+def _cart(lines: int, start: int = 1) -> dict:
+    return {str(start + i): {"quantity": i + 1} for i in range(lines)}
+
+
+@pytest.mark.unit
+class TestFormat:
+    """Тесты двоичного формата сессии."""
+
+    @pytest.mark.parametrize(
+        "session",
+        [
+            {},
+            AUTH,
+            {**AUTH, "cart": _cart(3), "payment_currency": "eur"},
+            {"cart": _cart(2), "saved": _cart(1, start=70000)},
+            {"cart": {"18446744073709551616": {"quantity": 1}}},
+            {"cart": {}, "pending_order_id": 15},
+            {"cart": {"abc": {"quantity": 1}, "2": {"quantity": 2}}},
+            {"cart": {"1": {"quantity": -5}}},
+            {"cart": {"1": {"quantity": True}}},
+            {"cart": {"1": {"quantity": "2"}}},
+            {"cart": {"01": {"quantity": 1}}},
+            {"cart": {"1,2": {"quantity": 1}}},
+            {"cart": {"1": {"quantity": 1, "note": "x"}}},
+            {"cart": {"1": [1]}},
+            {"text": "корзина", "ratio": 1.5, "flags": [None, True, -3]},
+        ],
+    )
+    def test_round_trip(self, session):
+        """Тест что любая сессия восстанавливается без изменений."""
+        assert decode_session(encode_session(session)) == session
+
+    def test_cart_packed_as_integer_pairs(self):
+        """Тест что строки корзины не повторяют ключи JSON."""
+        session = {**AUTH, "cart": _cart(50, start=1000)}
+
+        data = encode_session(session)
+
+        assert data[0] == FORMAT_VERSION
+        assert b"quantity" not in data
+        assert len(data) < len(json.dumps(AUTH)) + 50 * 4 + 20
+
+    def test_wide_ids(self):
+        """Тест ширины чисел по наибольшему ID."""
+        narrow = encode_session({"cart": _cart(10)})
+        wide = encode_session({"cart": _cart(10, start=1 << 20)})
+
+        assert len(wide) - len(narrow) == 10 * 4
+
+
+@pytest.mark.unit
+class TestSerializer:
+    """Тесты CompactSessionSerializer."""
+
+    def test_reads_legacy_json(self):
+        """Тест чтения сессии стандартного сериализатора Django."""
+        session = {**AUTH, "cart": _cart(2)}
+        legacy = signing.JSONSerializer().dumps(session)
+
+        assert CompactSessionSerializer().loads(legacy) == session
+        assert registry.counter("sessions.legacy_json") == 1
+
+    @pytest.mark.parametrize(
+        "data",
+        [
+            b"\x02{}",
+            b"",
+            b"\x01\x01\x04cart",
+            b"\x01\x01\x04cartH\x05\x01\x00",
+            b"\x01\x01\x04cartX\x01\x01\x00\x01\x00{}",
+            b"\x01\x00{",
+        ],
+    )
+    def test_corrupted_data(self, data):
+        """Тест ValueError для поврежденных данных и неизвестной версии."""
+        with pytest.raises(ValueError):
+            CompactSessionSerializer().loads(data)
+
+    def test_metrics(self):
+        """Тест метрик размера и времени сериализации."""
+        serializer = CompactSessionSerializer()
+
+        data = serializer.dumps({"cart": _cart(5)})
+        serializer.loads(data)
+        serializer.loads(data)
+
+        assert registry.counter("sessions.encoded_bytes") == len(data)
+        assert registry.counter("sessions.decoded_bytes") == 2 * len(data)
+        assert registry.timing("sessions.encode")["count"] == 1
+        assert registry.timing("sessions.decode")["count"] == 2
+
+    def test_unsupported_value(self):
+        """Тест ошибки для значения, которое нельзя сохранить в сессии."""
+        with pytest.raises(TypeError):
+            CompactSessionSerializer().dumps({"when": timezone.now()})
+
+
+@pytest.mark.django_db
+@pytest.mark.views
+def test_legacy_session_migrated_on_save(client, settings, item_usd):
+    """Тест что старая JSON-сессия читается и пересохраняется в новом формате."""
+    store = SessionStore()
+    Session.objects.create(
+        session_key="legacysessionkey00000000000000000",
+        session_data=signing.dumps(
+            {"cart": {str(item_usd.id): {"quantity": 2}}},
+            salt=store.key_salt,
+            serializer=signing.JSONSerializer,
+            compress=True,
+        ),
+        expire_date=timezone.now() + timedelta(days=1),
+    )
+    client.cookies[settings.SESSION_COOKIE_NAME] = "legacysessionkey00000000000000000"
+
+    client.get(reverse("payments:add_to_cart", args=[item_usd.id]))
+    response = client.get(reverse("payments:view_cart"))
+
+    assert response.context["cart_items"][0]["quantity"] == 3
+    assert registry.counter("sessions.legacy_json") == 1
+    assert registry.timing("sessions.encode")["count"] == 1
@@ -0,0 +1,155 @@
+"""Тесты для кеша списка товаров главной страницы."""
+
+import threading
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+
+from payments.catalog import bump_catalog_version, get_catalog_version
+from payments.models import Item
+from payments.storefront import (
+    REBUILD_LOCK_STRIPES,
+    StorefrontCache,
+    page_key,
+    storefront_cache_key,
+)
+
+
+@pytest.mark.django_db
+class TestStorefrontCache:
+    """Тесты для StorefrontCache."""
+
+    def test_cached_after_first_render(self, item_usd, django_assert_num_queries):
+        """Тест что повторный рендер не обращается к БД."""
+        storefront = StorefrontCache(timeout=60)
+        html = storefront.get("name")
+        assert item_usd.name in html
+
+        with django_assert_num_queries(0):
+            assert storefront.get("name") == html
+
+    def test_shared_between_instances(self, item_usd, django_assert_num_queries):
+        """Тест что список берется из общего кеша, а не только из памяти."""
+        StorefrontCache(timeout=60).get("name")
+
+        with django_assert_num_queries(0):
+            assert item_usd.name in StorefrontCache(timeout=60).get("name")
+
+    def test_version_bump_rebuilds(self, item_usd):
+        """Тест перестроения списка после изменения каталога."""
+        storefront = StorefrontCache(timeout=60)
+        storefront.get("name")
+        Item.objects.filter(pk=item_usd.pk).update(name="Renamed")
+        bump_catalog_version()
+
+        assert "Renamed" in storefront.get("name")
+
+    def test_concurrent_miss_served_stale(self, item_usd, mocker):
+        """Тест что пока один поток перестраивает список, другие получают копию."""
+        storefront = StorefrontCache(timeout=60)
+        stale = storefront.get("name")
+        bump_catalog_version()
+
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_render(sort, cursor):
+            started.set()
+            release.wait(5)
+            return "fresh"
+
+        render = mocker.patch(
+            "payments.storefront.render_items", side_effect=slow_render
+        )
+        results = []
+        rebuild = threading.Thread(
+            target=lambda: results.append(storefront.get("name"))
+        )
+        rebuild.start()
+        started.wait(5)
+
+        assert storefront.get("name") == stale
+
+        release.set()
+        rebuild.join(5)
+        assert results == ["fresh"]
+        assert render.call_count == 1
+        assert (
+            cache.get(storefront_cache_key(get_catalog_version(), "name", None))
+            == "fresh"
+        )
+
+    def test_waits_without_stale_copy(self, item_usd, mocker):
+        """Тест что без копии поток ждет перестроения и не рендерит повторно."""
+        storefront = StorefrontCache(timeout=60)
+        key = storefront_cache_key(get_catalog_version(), "name", None)
+        render = mocker.patch("payments.storefront.render_items")
+
+        def finish_rebuild():
+            cache.set(key, "ready")
+            lock.release()
+
+        lock = storefront._lock_for(page_key("name", None))
+        lock.acquire()
+        threading.Timer(0.05, finish_rebuild).start()
+
+        assert storefront.get("name") == "ready"
+        render.assert_not_called()
+
+    def test_waits_and_rebuilds_when_cache_empty(self, item_usd):
+        """Тест перестроения после ожидания, если список так и не появился."""
+        storefront = StorefrontCache(timeout=60)
+        lock = storefront._lock_for(page_key("name", None))
+        lock.acquire()
+        threading.Timer(0.05, lock.release).start()
+
+        assert item_usd.name in storefront.get("name")
+
+    def test_rebuild_locks_bounded(self):
+        """Тест что курсоры из запросов не добавляют блокировок."""
+        storefront = StorefrontCache(timeout=60)
+        pages = [page_key("name", f"cursor-{i}") for i in range(1000)]
+
+        locks = {id(storefront._lock_for(page)) for page in pages}
+
+        assert len(storefront._locks) == REBUILD_LOCK_STRIPES
+        assert locks <= {id(lock) for lock in storefront._locks}
+        assert storefront._lock_for(pages[0]) is storefront._lock_for(pages[0])
+
+
+@pytest.mark.django_db
+@pytest.mark.views
+class TestIndexViewCaching:
+    """Тесты кеширования главной страницы."""
+
+    def test_headers(self, client, item_usd):
+        """Тест заголовков Cache-Control и Vary."""
+        response = client.get(reverse("payments:index"))
+        assert "private" in response["Cache-Control"]
+        assert "public" not in response["Cache-Control"]
+        assert "max-age=0" in response["Cache-Control"]
+        assert "Cookie" in response["Vary"]
+
+    def test_no_item_queries_when_cached(
+        self, client, item_usd, django_assert_max_num_queries
+    ):
+        """Тест что закешированная главная не читает товары из БД."""
+        client.get(reverse("payments:index"))
+
+        with django_assert_max_num_queries(5) as captured:
+            response = client.get(reverse("payments:index"))
+        assert item_usd.name in response.content.decode()
+        assert not any("payments_item" in q["sql"] for q in captured)
+
+    def test_item_change_visible(
+        self, client, item_usd, django_capture_on_commit_callbacks
+    ):
+        """Тест что изменение товара сразу видно на главной."""
+        client.get(reverse("payments:index"))
+        with django_capture_on_commit_callbacks(execute=True):
+            item_usd.name = "Updated name"
+            item_usd.save()
+
+        response = client.get(reverse("payments:index"))
+        assert "Updated name" in response.content.decode()
@@ -0,0 +1,328 @@
+"""Тесты для вызовов Stripe с повторами, бюджетом времени и circuit breaker."""
+
+import time
+from unittest.mock import AsyncMock, Mock
+
+import httpx
+import pytest
+import stripe
+from asgiref.sync import async_to_sync
+from django.test import override_settings
+from django.urls import reverse
+
+from payments.metrics import registry
+from payments.stripe_calls import (
+    CircuitBreaker,
+    StripeUnavailable,
+    acall_stripe,
+    call_stripe,
+    get_circuit_breaker,
+    is_retryable,
+    stripe_deadline,
+)
+from payments.stripe_client import timeout_within_deadline
+
+pytestmark = pytest.mark.unit
+
+
+def _connection_error() -> stripe.APIConnectionError:
+    return stripe.APIConnectionError("network down", should_retry=True)
+
+
+class FakeClock:
+    """Управляемые часы для circuit breaker."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(
+        failure_rate=0.5, window=4, min_calls=4, reset_timeout=30, clock=clock
+    )
+
+
+@pytest.fixture
+def no_backoff(settings):
+    """Убирает паузы между повторами."""
+    settings.STRIPE_RETRY_BACKOFF = 0
+
+
+@pytest.fixture
+def open_breaker():
+    """Открывает общий circuit breaker процесса."""
+    breaker = get_circuit_breaker()
+    for _ in range(breaker.min_calls):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+
+class TestCircuitBreaker:
+    """Тесты состояний circuit breaker."""
+
+    def test_stays_closed_below_min_calls(self, breaker):
+        """Тест что редкие ошибки не открывают breaker."""
+        for _ in range(3):
+            breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow()
+
+    def test_opens_on_failure_rate(self, breaker):
+        """Тест открытия при доле ошибок выше порога."""
+        breaker.record_success()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+        assert breaker.retry_after() == 30
+        assert registry.counter("stripe.breaker_opened") == 1
+
+    def test_window_forgets_old_failures(self, breaker):
+        """Тест что учитываются только последние window вызовов."""
+        breaker.record_failure()
+        for _ in range(4):
+            breaker.record_success()
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_half_open_probe_success_closes(self, breaker, clock):
+        """Тест закрытия после успешного пробного вызова."""
+        for _ in range(4):
+            breaker.record_failure()
+        clock.now = 30
+
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_success()
+
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow()
+
+    def test_half_open_probe_failure_reopens(self, breaker, clock):
+        """Тест повторного открытия после неудачного пробного вызова."""
+        for _ in range(4):
+            breaker.record_failure()
+        clock.now = 30
+        assert breaker.allow()
+
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+
+    def test_lost_probe_does_not_block_forever(self, breaker, clock):
+        """Тест что пробный вызов без результата не блокирует breaker."""
+        for _ in range(4):
+            breaker.record_failure()
+        clock.now = 30
+        assert breaker.allow()
+
+        clock.now = 60
+
+        assert breaker.allow()
+
+
+class TestIsRetryable:
+    """Тесты классификации ошибок Stripe."""
+
+    @pytest.mark.parametrize(
+        ("error", "expected"),
+        [
+            (stripe.APIConnectionError("down", should_retry=True), True),
+            (stripe.APIConnectionError("down"), False),
+            (stripe.RateLimitError("slow down", http_status=429), True),
+            (stripe.APIError("boom", http_status=500), True),
+            (stripe.InvalidRequestError("bad", None, http_status=400), False),
+            (stripe.AuthenticationError("key", http_status=401), False),
+        ],
+    )
+    def test_classification(self, error, expected):
+        """Тест повтора только для сбоев на стороне сети и Stripe."""
+        assert is_retryable(error) is expected
+
+
+@pytest.mark.usefixtures("no_backoff")
+class TestCallStripe:
+    """Тесты синхронного вызова Stripe."""
+
+    def test_success(self):
+        """Тест передачи аргументов и ключа идемпотентности."""
+        func = Mock(return_value="ok")
+
+        assert call_stripe(func, "pi_1", amount=100) == "ok"
+
+        args, kwargs = func.call_args
+        assert args == ("pi_1",)
+        assert kwargs["amount"] == 100
+        assert kwargs["idempotency_key"]
+
+    def test_retries_with_same_idempotency_key(self):
+        """Тест повтора сетевой ошибки с тем же ключом идемпотентности."""
+        func = Mock(side_effect=[_connection_error(), "ok"])
+
+        assert call_stripe(func, idempotency_key="order-1") == "ok"
+
+        keys = [call.kwargs["idempotency_key"] for call in func.call_args_list]
+        assert keys == ["order-1", "order-1"]
+        assert registry.counter("stripe.retries") == 1
+
+    def test_generated_key_reused(self):
+        """Тест что сгенерированный ключ общий для всех попыток."""
+        func = Mock(side_effect=[_connection_error(), "ok"])
+
+        call_stripe(func)
+
+        first, second = (call.kwargs for call in func.call_args_list)
+        assert first["idempotency_key"] == second["idempotency_key"]
+
+    def test_non_retryable_error_raised(self):
+        """Тест что ошибка в запросе не повторяется и не считается сбоем."""
+        error = stripe.InvalidRequestError("bad", None, http_status=400)
+        func = Mock(side_effect=error)
+
+        with pytest.raises(stripe.InvalidRequestError):
+            call_stripe(func)
+
+        assert func.call_count == 1
+        assert get_circuit_breaker().state == CircuitBreaker.CLOSED
+
+    @override_settings(STRIPE_MAX_RETRIES=2)
+    def test_retries_are_bounded(self):
+        """Тест ограничения числа повторов."""
+        func = Mock(side_effect=_connection_error())
+
+        with pytest.raises(StripeUnavailable):
+            call_stripe(func)
+
+        assert func.call_count == 3
+
+    def test_open_breaker_fails_fast(self, open_breaker):
+        """Тест отказа без обращения к Stripe при открытом breaker."""
+        func = Mock()
+
+        with pytest.raises(StripeUnavailable) as excinfo:
+            call_stripe(func)
+
+        func.assert_not_called()
+        assert excinfo.value.retry_after > 0
+        assert registry.counter("stripe.rejected") == 1
+        assert open_breaker.state == CircuitBreaker.OPEN
+
+    def test_failures_open_breaker(self, settings):
+        """Тест что повторяющиеся сбои открывают общий breaker."""
+        settings.STRIPE_MAX_RETRIES = 0
+        func = Mock(side_effect=_connection_error())
+
+        for _ in range(get_circuit_breaker().min_calls):
+            with pytest.raises(StripeUnavailable):
+                call_stripe(func)
+
+        assert get_circuit_breaker().state == CircuitBreaker.OPEN
+
+    def test_expired_deadline(self):
+        """Тест отказа, когда бюджет времени уже исчерпан."""
+        func = Mock()
+
+        with stripe_deadline(0), pytest.raises(StripeUnavailable):
+            call_stripe(func)
+
+        func.assert_not_called()
+        assert registry.counter("stripe.deadline_exceeded") == 1
+
+    @override_settings(STRIPE_RETRY_BACKOFF=10, STRIPE_RETRY_BACKOFF_MAX=10)
+    def test_backoff_beyond_deadline(self, mocker):
+        """Тест что повтор не выполняется, если пауза не уложится в бюджет."""
+        mocker.patch("payments.stripe_calls.random.uniform", return_value=5)
+        func = Mock(side_effect=_connection_error())
+
+        started = time.monotonic()
+        with stripe_deadline(1), pytest.raises(StripeUnavailable):
+            call_stripe(func)
+
+        assert func.call_count == 1
+        assert time.monotonic() - started < 1
+
+
+@pytest.mark.usefixtures("no_backoff")
+class TestAcallStripe:
+    """Тесты асинхронного вызова Stripe."""
+
+    def test_retries_with_same_idempotency_key(self):
+        """Тест повтора с тем же ключом идемпотентности."""
+        func = AsyncMock(side_effect=[_connection_error(), "ok"])
+
+        assert async_to_sync(acall_stripe)(func, idempotency_key="k") == "ok"
+
+        assert func.await_count == 2
+        assert func.call_args.kwargs["idempotency_key"] == "k"
+
+    def test_open_breaker_fails_fast(self, open_breaker):  # noqa: ARG002
+        """Тест отказа без обращения к Stripe при открытом breaker."""
+        func = AsyncMock()
+
+        with pytest.raises(StripeUnavailable):
+            async_to_sync(acall_stripe)(func)
+
+        func.assert_not_awaited()
+
+
+class TestDeadline:
+    """Тесты бюджета времени."""
+
+    def test_nested_deadline_not_extended(self):
+        """Тест что вложенный блок не продлевает внешний бюджет."""
+        with stripe_deadline(1) as outer, stripe_deadline(10) as inner:
+            assert inner == outer
+
+    def test_timeouts_capped_by_deadline(self):
+        """Тест сокращения таймаутов HTTP до оставшегося бюджета."""
+        timeout = httpx.Timeout(20, connect=5)
+
+        assert timeout_within_deadline(timeout) is timeout
+        with stripe_deadline(2):
+            capped = timeout_within_deadline(timeout)
+
+        assert capped.read <= 2
+        assert capped.connect <= 2
+
+
+@pytest.mark.django_db
+class TestCheckoutWhenStripeUnavailable:
+    """Тесты ответа 503 при открытом circuit breaker."""
+
+    def test_sync_view(self, client, order_with_items, open_breaker):  # noqa: ARG002
+        """Тест 503 и Retry-After в синхронном endpoint."""
+        url = reverse(
+            "payments:create_order_checkout_session", args=[order_with_items.id]
+        )
+
+        response = client.get(url)
+
+        assert response.status_code == 503
+        assert int(response["Retry-After"]) >= 1
+        assert "error" in response.json()
+
+    def test_async_view(self, async_client, order_with_items, open_breaker):  # noqa: ARG002
+        """Тест 503 в асинхронном endpoint."""
+        url = reverse(
+            "payments:create_order_checkout_session_async", args=[order_with_items.id]
+        )
+
+        response = async_to_sync(async_client.get)(url)
+
+        assert response.status_code == 503
+        assert "Retry-After" in response
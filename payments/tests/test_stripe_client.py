@@ -0,0 +1,170 @@
+"""Тесты для HTTP-клиента Stripe с пулом соединений."""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import stripe
+from django.test import override_settings
+from django.urls import reverse
+
+from payments import stripe_client
+from payments.metrics import registry
+from payments.stripe_client import PooledHTTPXClient, get_stripe_client
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """Отвечает на любой POST пустым JSON, не закрывая соединение."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:  # noqa: N802
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"id": "pi_local"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        """Не пишет access-лог в вывод тестов."""
+
+
+@pytest.fixture
+def local_server():
+    """Запускает локальный HTTP-сервер с keep-alive."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    yield f"http://{host}:{port}/v1/payment_intents"
+    server.shutdown()
+    server.server_close()
+
+
+def _client() -> PooledHTTPXClient:
+    return PooledHTTPXClient(
+        connect_timeout=1, read_timeout=2, max_connections=2, keepalive_expiry=30
+    )
+
+
+class TestPooledHTTPXClient:
+    """Тесты пула соединений и метрик."""
+
+    def test_timeouts_and_limits(self):
+        """Тест явных таймаутов и лимитов пула."""
+        client = _client()
+
+        assert client._timeout.connect == 1
+        assert client._timeout.read == 2
+        pool = client._client._transport._pool
+        assert pool._max_connections == 2
+        assert pool._keepalive_expiry == 30
+        client.close()
+
+    def test_sync_requests_reuse_connection(self, local_server):
+        """Тест что повторные запросы используют открытое соединение."""
+        client = _client()
+
+        for _ in range(3):
+            body, status, _headers = client.request("post", local_server, {}, "a=1")
+            assert status == 200
+            assert json.loads(body) == {"id": "pi_local"}
+        client.close()
+
+        assert registry.counter("stripe.requests") == 3
+        assert registry.counter("stripe.connections_opened") == 1
+        assert registry.counter("stripe.connections_reused") == 2
+        assert registry.timing("stripe.request")["count"] == 3
+
+    def test_async_requests_reuse_connection(self, local_server):
+        """Тест повторного использования соединения асинхронным клиентом."""
+        client = _client()
+
+        async def run() -> None:
+            for _ in range(3):
+                await client.request_async("post", local_server, {}, "a=1")
+            await client.close_async()
+
+        asyncio.run(run())
+
+        assert registry.counter("stripe.connections_opened") == 1
+        assert registry.counter("stripe.connections_reused") == 2
+        assert registry.timing("stripe.request")["count"] == 3
+
+    def test_failed_request_is_timed(self):
+        """Тест что длительность неудачного запроса тоже записывается."""
+        client = _client()
+
+        with pytest.raises(stripe.APIConnectionError):
+            client.request("post", "http://127.0.0.1:1/v1/coupons", {}, None)
+        client.close()
+
+        assert registry.timing("stripe.request")["count"] == 1
+        assert registry.counter("stripe.requests") == 0
+
+
+class TestGetStripeClient:
+    """Тесты клиента Stripe уровня процесса."""
+
+    @override_settings(STRIPE_SECRET_KEY="sk_test_worker")
+    def test_installs_client_and_key(self):
+        """Тест установки клиента и ключа в библиотеку stripe."""
+        client = get_stripe_client()
+
+        assert stripe.default_http_client is client
+        assert stripe.api_key == "sk_test_worker"
+        assert get_stripe_client() is client
+
+    def test_recreated_after_fork(self, mocker):
+        """Тест что форкнутый процесс создает свой клиент."""
+        client = get_stripe_client()
+        close = mocker.spy(client, "close")
+        mocker.patch.object(stripe_client.os, "getpid", return_value=-1)
+
+        forked = get_stripe_client()
+
+        assert forked is not client
+        assert stripe.default_http_client is forked
+        close.assert_not_called()
+
+    def test_reset_on_settings_change(self):
+        """Тест пересоздания клиента при изменении настроек."""
+        client = get_stripe_client()
+
+        with override_settings(STRIPE_READ_TIMEOUT=3):
+            changed = get_stripe_client()
+
+        assert changed is not client
+        assert changed._timeout.read == 3
+
+
+@pytest.mark.django_db
+class TestProcessMetricsView:
+    """Тесты endpoint с метриками воркера."""
+
+    def test_staff_only(self, client):
+        """Тест что метрики недоступны без входа в админку."""
+        response = client.get(reverse("payments:process_metrics"))
+
+        assert response.status_code == 302
+
+    def test_snapshot(self, admin_client):
+        """Тест выдачи счетчиков и длительностей."""
+        registry.increment("stripe.connections_reused", 2)
+        registry.observe("stripe.request", 0.25)
+
+        data = admin_client.get(reverse("payments:process_metrics")).json()
+
+        # Сессия администратора тоже попадает в метрики (sessions.*)
+        assert data["counters"]["stripe.connections_reused"] == 2
+        assert data["counters"]["sessions.decoded_bytes"] > 0
+        assert data["timings"]["stripe.request"] == {
+            "count": 1,
+            "total_ms": 250.0,
+            "avg_ms": 250.0,
+            "max_ms": 250.0,
+        }
@@ -1,10 +1,18 @@
 """Тесты для Stripe утилит."""
 
+from decimal import Decimal
+from unittest.mock import Mock
+
 import pytest
+import stripe
+from django.db import IntegrityError
 
+from payments.coupons import coupon_id_for, get_coupon_registry, reset_coupon_registry
+from payments.models import StripeCoupon
 from payments.views import create_stripe_coupon
 
 
+@pytest.mark.django_db
 @pytest.mark.unit
 class TestStripeUtils:
     """Тесты для Stripe утилит."""
@@ -19,24 +27,91 @@ class TestStripeUtils:
         assert call_kwargs["name"] == "TEST10"
         assert call_kwargs["percent_off"] == 10.0
         assert call_kwargs["duration"] == "once"
+        assert call_kwargs["id"] == "discount-10_00-once"
+        assert call_kwargs["idempotency_key"] == "coupon-discount-10_00-once"
+
+        coupon = StripeCoupon.objects.get()
+        assert coupon.coupon_id == "coupon_test_123"
+        assert coupon.percent == Decimal("10.00")
+
+    def test_repeat_uses_worker_cache(
+        self, mock_stripe_coupon, django_assert_num_queries
+    ):
+        """Тест что повторный запрос не обращается ни к Stripe, ни к БД."""
+        first = create_stripe_coupon("TEST10", 10.0)
+
+        with django_assert_num_queries(0):
+            second = create_stripe_coupon("OTHER NAME", Decimal("10.00"))
+
+        assert second == first
+        mock_stripe_coupon.assert_called_once()
+
+    def test_other_worker_reads_registry(
+        self, mock_stripe_coupon, django_assert_num_queries
+    ):
+        """Тест что другой воркер находит купон в БД без вызова Stripe."""
+        create_stripe_coupon("TEST10", 10.0)
+        reset_coupon_registry()
+
+        with django_assert_num_queries(1):
+            assert create_stripe_coupon("TEST10", 10.0) == "coupon_test_123"
+
+        mock_stripe_coupon.assert_called_once()
 
-    def test_create_stripe_coupon_with_exception(self, mocker):
-        """Тест создания купона при ошибке (создается с уникальным именем)."""
-        mock_coupon = mocker.patch("stripe.Coupon.create")
+    def test_separate_coupons_per_percent_and_duration(self, mock_stripe_coupon):
+        """Тест отдельных купонов для разных процентов и сроков."""
+        mock_stripe_coupon.side_effect = lambda **kwargs: Mock(id=kwargs["id"])
 
-        # Первый вызов выбрасывает исключение
-        # Второй вызов успешен
-        mock_coupon.side_effect = [
-            Exception("Coupon already exists"),
-            mocker.Mock(id="coupon_unique_123"),
-        ]
+        ids = {
+            create_stripe_coupon("A", 10.0),
+            create_stripe_coupon("B", 15.0),
+            create_stripe_coupon("C", 10.0, duration="forever"),
+        }
+
+        assert ids == {
+            "discount-10_00-once",
+            "discount-15_00-once",
+            "discount-10_00-forever",
+        }
+        assert StripeCoupon.objects.count() == 3
+
+    def test_existing_stripe_coupon_reused(self, mocker):
+        """Тест что купон, уже созданный в Stripe, не создается повторно."""
+        error = stripe.InvalidRequestError(
+            "Coupon already exists", "id", code="resource_already_exists"
+        )
+        mock_coupon = mocker.patch("stripe.Coupon.create", side_effect=error)
 
         coupon_id = create_stripe_coupon("EXISTING", 15.0)
 
-        assert coupon_id == "coupon_unique_123"
-        assert mock_coupon.call_count == 2
+        assert coupon_id == coupon_id_for(Decimal("15.00"), "once")
+        mock_coupon.assert_called_once()
+        assert StripeCoupon.objects.get().coupon_id == coupon_id
+
+    def test_stripe_error_leaves_no_record(self, mocker):
+        """Тест что при ошибке Stripe запись в реестре не остается."""
+        mocker.patch(
+            "stripe.Coupon.create",
+            side_effect=stripe.InvalidRequestError("Invalid percent", "percent_off"),
+        )
+
+        with pytest.raises(stripe.InvalidRequestError):
+            create_stripe_coupon("BAD", 150.0)
+
+        assert not StripeCoupon.objects.exists()
 
-        # Проверяем что второй вызов с уникальным именем
-        second_call_kwargs = mock_coupon.call_args_list[1][1]
-        assert "EXISTING_" in second_call_kwargs["name"]
-        assert second_call_kwargs["percent_off"] == 15.0
+    def test_uniqueness_guard(self):
+        """Тест уникальности купона для процента и срока действия."""
+        StripeCoupon.objects.create(percent=10, duration="once", coupon_id="a")
+
+        with pytest.raises(IntegrityError):
+            StripeCoupon.objects.create(percent=10, duration="once", coupon_id="b")
+
+    def test_registry_change_invalidates_cache(self, mock_stripe_coupon):
+        """Тест сброса кеша воркера при изменении реестра."""
+        create_stripe_coupon("TEST10", 10.0)
+        StripeCoupon.objects.update(coupon_id="renamed")
+        StripeCoupon.objects.get().save()
+
+        assert get_coupon_registry().get(10) == "renamed"
+        mock_stripe_coupon.assert_called_once()
@@ -0,0 +1,259 @@
+"""Тесты для хранимых итогов заказов."""
+
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError
+
+from payments.models import Order, OrderItem
+from payments.totals import (
+    find_inconsistent_totals,
+    recalculate_orders_by_id,
+    recalculate_totals,
+)
+
+
+def _stored(order: Order) -> tuple[int, int, int, int]:
+    """Возвращает итоги заказа, сохраненные в БД."""
+    return Order.objects.values_list(
+        "subtotal", "discount_amount", "tax_amount", "total"
+    ).get(pk=order.pk)
+
+
+@pytest.mark.django_db
+@pytest.mark.models
+class TestStoredTotals:
+    """Тесты для автоматического пересчета итогов."""
+
+    def test_totals_after_adding_items(self, order_with_items):
+        """Тест итогов после добавления позиций."""
+        assert _stored(order_with_items) == (13300, 0, 0, 13300)
+        assert order_with_items.total == 13300
+
+    def test_totals_after_quantity_change(self, order_with_items, item_usd):
+        """Тест пересчета при изменении количества."""
+        order_item = OrderItem.objects.get(order=order_with_items, item=item_usd)
+        order_item.quantity = 1
+        order_item.save()
+
+        assert _stored(order_with_items)[3] == 8300
+
+    def test_totals_after_item_removed(self, order_with_items, item_eur):
+        """Тест пересчета при удалении позиции."""
+        OrderItem.objects.get(order=order_with_items, item=item_eur).delete()
+
+        assert _stored(order_with_items)[3] == 10000
+
+    def test_totals_after_discount_and_tax_assigned(
+        self, order_with_items, discount_10, tax_20
+    ):
+        """Тест пересчета при назначении скидки и налога."""
+        order = Order.objects.get(pk=order_with_items.pk)
+        order.discount = discount_10
+        order.tax = tax_20
+        order.save()
+
+        assert _stored(order) == (13300, 1330, 2394, 14364)
+
+    def test_totals_after_currency_change(self, order_with_items):
+        """Тест пересчета при смене валюты оплаты."""
+        order = Order.objects.get(pk=order_with_items.pk)
+        order.payment_currency = "eur"
+        order.save()
+
+        # $50 → €45.45 (x2) + €30
+        assert _stored(order)[0] == 4545 * 2 + 3000
+
+    def test_totals_after_discount_percent_edited(self, order_with_discount_tax):
+        """Тест пересчета при изменении процента скидки."""
+        discount = order_with_discount_tax.discount
+        discount.percent = Decimal("50.00")
+        discount.save()
+
+        # $50 - 50% = $25, налог 20% = $5
+        assert _stored(order_with_discount_tax) == (5000, 2500, 500, 3000)
+
+    def test_totals_after_tax_deleted(self, order_with_discount_tax):
+        """Тест пересчета при удалении налога."""
+        order_with_discount_tax.tax.delete()
+
+        assert _stored(order_with_discount_tax) == (5000, 500, 0, 4500)
+
+    def test_totals_after_item_price_change(self, order_with_items, item_usd):
+        """Тест пересчета при изменении цены товара."""
+        item_usd.price = 1000
+        item_usd.save()
+
+        assert _stored(order_with_items)[0] == 2000 + 3300
+
+    @pytest.mark.parametrize("status", Order.SETTLED_STATUSES)
+    def test_item_price_change_keeps_settled_totals(
+        self, order_with_items, item_usd, status
+    ):
+        """Тест что изменение цены не меняет итоги оплаченного заказа."""
+        Order.objects.filter(pk=order_with_items.pk).update(status=status)
+        item_usd.price = 1000
+        item_usd.save()
+
+        assert _stored(order_with_items) == (13300, 0, 0, 13300)
+
+    def test_discount_change_keeps_paid_totals(self, order_with_discount_tax):
+        """Тест что изменение скидки не меняет итоги оплаченного заказа."""
+        order_with_discount_tax.status = Order.STATUS_PAID
+        order_with_discount_tax.save()
+        discount = order_with_discount_tax.discount
+        discount.percent = Decimal("50.00")
+        discount.save()
+
+        assert _stored(order_with_discount_tax) == (5000, 500, 900, 5400)
+
+    def test_line_change_keeps_paid_totals(self, order_with_items, item_usd):
+        """Тест что изменение позиций оплаченного заказа не меняет его итоги."""
+        Order.objects.filter(pk=order_with_items.pk).update(status=Order.STATUS_PAID)
+        line = OrderItem.objects.get(order=order_with_items, item=item_usd)
+        line.quantity = 5
+        line.save()
+
+        assert _stored(order_with_items) == (13300, 0, 0, 13300)
+
+    def test_settled_order_reads_stored_totals(self, order_with_discount_tax):
+        """Тест что суммы оплаченного заказа берутся из сохраненных полей."""
+        Order.objects.filter(pk=order_with_discount_tax.pk).update(
+            status=Order.STATUS_PAID,
+            subtotal=4000,
+            discount_amount=400,
+            tax_amount=720,
+            total=4320,
+        )
+        order = Order.objects.get(pk=order_with_discount_tax.pk)
+
+        assert order.get_subtotal() == 4000
+        assert order.get_discount_amount() == 400
+        assert order.get_tax_amount() == 720
+        assert order.get_total_price() == 4320
+        assert order.get_display_total() == "$43.20"
+        assert order.pricing.total == 5400
+
+    def test_unrelated_save_does_not_recalculate(
+        self, order_with_items, django_assert_num_queries
+    ):
+        """Тест что сохранение без изменения параметров не пересчитывает итоги."""
+        order = Order.objects.get(pk=order_with_items.pk)
+
+        with django_assert_num_queries(1):
+            order.save()
+
+    def test_order_sortable_by_total(self, order_with_items, order_with_discount_tax):
+        """Тест сортировки заказов по сохраненной сумме в SQL."""
+        ordered = list(Order.objects.order_by("total").values_list("pk", flat=True))
+        assert ordered == [order_with_discount_tax.pk, order_with_items.pk]
+
+
+@pytest.mark.django_db
+class TestTotalsCommands:
+    """Тесты для команд backfill и проверки итогов."""
+
+    def test_recalculate_totals(self, order_with_items, order_with_discount_tax):
+        """Тест пакетного пересчета итогов."""
+        Order.objects.update(subtotal=0, discount_amount=0, tax_amount=0, total=0)
+
+        updated = recalculate_totals(Order.objects.all(), batch_size=1)
+
+        assert updated == 2
+        assert _stored(order_with_items)[3] == 13300
+        assert _stored(order_with_discount_tax)[3] == 5400
+
+    def test_recalculate_totals_commits_each_batch(
+        self, order_with_items, order_with_discount_tax, mocker
+    ):
+        """Тест что сбой пакета не откатывает уже сохраненные пакеты."""
+        Order.objects.update(total=0)
+        bulk_update = Order.objects.bulk_update
+        calls = []
+
+        def fail_second_batch(*args, **kwargs):
+            calls.append(args)
+            if len(calls) > 1:
+                raise DatabaseError("connection lost")
+            return bulk_update(*args, **kwargs)
+
+        mocker.patch.object(Order.objects, "bulk_update", fail_second_batch)
+
+        with pytest.raises(DatabaseError):
+            recalculate_totals(Order.objects.all(), batch_size=1)
+
+        assert _stored(order_with_items)[3] == 13300
+        assert _stored(order_with_discount_tax)[3] == 0
+
+    def test_backfill_command(self, order_with_items, capsys):
+        """Тест команды backfill_order_totals."""
+        Order.objects.update(total=0)
+
+        call_command("backfill_order_totals")
+
+        assert _stored(order_with_items)[3] == 13300
+        assert "Обновлено заказов: 1" in capsys.readouterr().out
+
+    @pytest.mark.parametrize("status", Order.SETTLED_STATUSES)
+    def test_backfill_command_keeps_settled_totals(
+        self, order_with_items, item_usd, status, capsys
+    ):
+        """Тест что backfill не переписывает итоги оплаченного заказа."""
+        Order.objects.filter(pk=order_with_items.pk).update(status=status)
+        item_usd.price = 99999
+        item_usd.save()
+
+        call_command("backfill_order_totals")
+
+        assert _stored(order_with_items)[3] == 13300
+        assert "Обновлено заказов: 0" in capsys.readouterr().out
+
+    def test_find_inconsistent_totals(self, order_with_items):
+        """Тест поиска расхождений."""
+        Order.objects.update(total=1)
+
+        mismatches = list(find_inconsistent_totals(Order.objects.all()))
+
+        assert len(mismatches) == 1
+        assert mismatches[0].order_id == order_with_items.pk
+        assert mismatches[0].stored["total"] == 1
+        assert mismatches[0].expected["total"] == 13300
+
+    def test_check_command_consistent(self, order_with_items, capsys):
+        """Тест проверки без расхождений."""
+        call_command("check_order_totals")
+        assert "Расхождений не найдено" in capsys.readouterr().out
+
+    def test_check_command_reports_mismatch(self, order_with_items):
+        """Тест что проверка завершается ошибкой при расхождениях."""
+        Order.objects.update(total=1)
+
+        with pytest.raises(CommandError):
+            call_command("check_order_totals")
+
+    def test_check_command_fix(self, order_with_items, capsys):
+        """Тест исправления расхождений."""
+        Order.objects.update(total=1)
+
+        call_command("check_order_totals", "--fix")
+
+        assert _stored(order_with_items)[3] == 13300
+        assert "Исправлено заказов: 1" in capsys.readouterr().out
+
+    def test_check_command_skips_paid_orders(self, order_with_items, capsys):
+        """Тест что проверка не исправляет итоги оплаченных заказов."""
+        Order.objects.update(total=1, status=Order.STATUS_PAID)
+
+        call_command("check_order_totals", "--fix")
+
+        assert _stored(order_with_items)[3] == 1
+        assert "Расхождений не найдено" in capsys.readouterr().out
+
+    def test_recalculate_orders_by_id_skips_paid(self, order_with_items):
+        """Тест что пересчет по ID не трогает оплаченные заказы."""
+        Order.objects.update(total=1, status=Order.STATUS_PAID)
+
+        assert recalculate_orders_by_id([order_with_items.pk]) == 0
+        assert _stored(order_with_items)[3] == 1
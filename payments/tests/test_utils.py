@@ -2,9 +2,13 @@
 
 import pytest
 
-from payments.views import EUR_TO_USD_RATE, convert_to_base_currency
+from payments.pricing import convert_to_base_currency
+from payments.rates import DEFAULT_RATES
 
+EUR_TO_USD_RATE = DEFAULT_RATES[("eur", "usd")]
 
+
+@pytest.mark.django_db
 @pytest.mark.unit
 class TestCurrencyConversion:
     """Тесты для конвертации валют."""
@@ -42,6 +46,6 @@ class TestCurrencyConversion:
         expected = int(1000000 * EUR_TO_USD_RATE)
         assert result == expected
 
-    def test_eur_to_usd_rate_constant(self):
-        """Тест что курс конвертации определен."""
+    def test_eur_to_usd_default_rate(self):
+        """Тест курса EUR к USD по умолчанию."""
         assert EUR_TO_USD_RATE == 1.1
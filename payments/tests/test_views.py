@@ -1,9 +1,10 @@
 """Тесты для views приложения payments."""
 
 import pytest
+import stripe
 from django.urls import reverse
 
-from payments.models import Order
+from payments.models import Item, Order
 
 
 @pytest.mark.django_db
@@ -24,11 +25,10 @@ class TestIndexView:
     def test_index_view_context(self, client, item_usd, item_eur):
         """Тест контекста главной страницы."""
         response = client.get(reverse("payments:index"))
-        assert "items" in response.context
-        items = list(response.context["items"])
-        assert len(items) == 2
-        assert item_usd in items
-        assert item_eur in items
+        assert "items" not in response.context
+        items_html = response.context["items_html"]
+        assert item_usd.name in items_html
+        assert item_eur.name in items_html
 
 
 @pytest.mark.django_db
@@ -56,6 +56,16 @@ class TestOrderDetailView:
         assert response.context["order"] == order_with_items
         assert "stripe_public_key" in response.context
 
+    def test_paid_order_shows_charged_total(self, client, order_with_items, item_usd):
+        """Тест что оплаченный заказ показывает сохраненную сумму, а не пересчет."""
+        Order.objects.filter(pk=order_with_items.pk).update(status=Order.STATUS_PAID)
+        Item.objects.filter(pk=item_usd.pk).update(price=99999, price_rate_version=None)
+
+        url = reverse("payments:order_detail", args=[order_with_items.id])
+        content = client.get(url).content.decode()
+
+        assert "$133.00" in content
+
     def test_order_detail_view_404(self, client):
         """Тест 404 для несуществующего заказа."""
         url = reverse("payments:order_detail", args=[99999])
@@ -120,7 +130,7 @@ class TestCreateOrderCheckoutSession:
         """Тест обработки ошибки Stripe API."""
         # Мокаем Stripe чтобы выбросить исключение
         mock_stripe = mocker.patch("stripe.PaymentIntent.create")
-        mock_stripe.side_effect = Exception("Stripe API Error")
+        mock_stripe.side_effect = stripe.InvalidRequestError("Stripe API Error", None)
 
         url = reverse(
             "payments:create_order_checkout_session", args=[order_with_items.id]
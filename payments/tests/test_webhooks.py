@@ -0,0 +1,412 @@
+"""Тесты для webhook Stripe и входящей очереди событий."""
+
+import hashlib
+import hmac
+import json
+import time
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+
+from payments.metrics import registry
+from payments.models import Order, StripeEvent
+from payments.webhooks import (
+    InvalidWebhook,
+    drain_batch,
+    drain_inbox,
+    record_event,
+    replay_events,
+)
+
+SECRET = "whsec_test"
+
+
+def make_event(event_id: str, event_type: str, obj: dict, created: int = 0) -> bytes:
+    """Тело события Stripe."""
+    event = {
+        "id": event_id,
+        "object": "event",
+        "type": event_type,
+        "created": created or int(time.time()),
+        "data": {"object": obj},
+    }
+    return json.dumps(event).encode()
+
+
+def sign(payload: bytes, secret: str = SECRET, timestamp: int | None = None) -> str:
+    """Заголовок Stripe-Signature для тела события."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signed = f"{timestamp}.".encode() + payload
+    digest = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def intent_event(event_id: str, event_type: str, order: Order) -> bytes:
+    return make_event(
+        event_id,
+        event_type,
+        {
+            "id": order.payment_intent_id,
+            "object": "payment_intent",
+            "metadata": {"order_id": str(order.id)},
+        },
+    )
+
+
+@pytest.fixture(autouse=True)
+def webhook_secret(settings):
+    settings.STRIPE_WEBHOOK_SECRET = SECRET
+    settings.STRIPE_WEBHOOK_MAX_ATTEMPTS = 3
+
+
+@pytest.fixture
+def order(order_with_items):
+    order_with_items.payment_intent_id = "pi_test_123"
+    order_with_items.save(update_fields=["payment_intent_id"])
+    return order_with_items
+
+
+def deliver(event_id: str, event_type: str, order: Order) -> None:
+    payload = intent_event(event_id, event_type, order)
+    record_event(payload, sign(payload))
+
+
+@pytest.mark.django_db
+class TestWebhookEndpoint:
+    """Тесты приема webhook."""
+
+    url = reverse("payments:stripe_webhook")
+
+    def test_valid_event_recorded(self, client, order):
+        """Тест сохранения события без обработки заказа."""
+        payload = intent_event("evt_1", "payment_intent.succeeded", order)
+
+        response = client.post(
+            self.url,
+            payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=sign(payload),
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {"received": True}
+        event = StripeEvent.objects.get()
+        assert event.event_id == "evt_1"
+        assert event.processed_at is None
+        order.refresh_from_db()
+        assert order.status == Order.STATUS_PENDING
+
+    def test_duplicate_delivery_stored_once(self, client, order):
+        """Тест что повторная доставка не создает второе событие."""
+        payload = intent_event("evt_1", "payment_intent.succeeded", order)
+
+        for _ in range(3):
+            response = client.post(
+                self.url,
+                payload,
+                content_type="application/json",
+                HTTP_STRIPE_SIGNATURE=sign(payload),
+            )
+            assert response.status_code == 200
+
+        assert StripeEvent.objects.count() == 1
+        assert registry.counter("webhooks.received") == 3
+
+    def test_invalid_signature_rejected(self, client, order):
+        """Тест отказа при неверной подписи."""
+        payload = intent_event("evt_1", "payment_intent.succeeded", order)
+
+        response = client.post(
+            self.url,
+            payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=sign(payload, secret="whsec_other"),
+        )
+
+        assert response.status_code == 400
+        assert not StripeEvent.objects.exists()
+
+    def test_missing_signature_rejected(self, client):
+        """Тест отказа без заголовка подписи."""
+        response = client.post(self.url, b"{}", content_type="application/json")
+
+        assert response.status_code == 400
+
+    def test_stale_event_rejected(self, client, order):
+        """Тест отказа для подписи старше допустимого возраста."""
+        payload = intent_event("evt_1", "payment_intent.succeeded", order)
+        old = int(time.time()) - 3600
+
+        response = client.post(
+            self.url,
+            payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=sign(payload, timestamp=old),
+        )
+
+        assert response.status_code == 400
+
+    def test_get_not_allowed(self, client):
+        """Тест что endpoint принимает только POST."""
+        assert client.get(self.url).status_code == 405
+
+    def test_secret_required(self, settings, order):
+        """Тест отказа, если секрет webhook не настроен."""
+        settings.STRIPE_WEBHOOK_SECRET = ""
+        payload = intent_event("evt_1", "payment_intent.succeeded", order)
+
+        with pytest.raises(InvalidWebhook):
+            record_event(payload, sign(payload))
+
+    def test_malformed_body_rejected(self):
+        """Тест отказа для подписанного тела без ID события."""
+        payload = b'{"type": "payment_intent.succeeded"}'
+
+        with pytest.raises(InvalidWebhook):
+            record_event(payload, sign(payload))
+
+
+@pytest.mark.django_db
+class TestDrainInbox:
+    """Тесты обработки очереди событий."""
+
+    def test_payment_succeeded_marks_paid(self, order):
+        """Тест отметки заказа оплаченным."""
+        deliver("evt_1", "payment_intent.succeeded", order)
+
+        result = drain_inbox()
+
+        assert result.processed == 1
+        order.refresh_from_db()
+        assert order.status == Order.STATUS_PAID
+        assert order.paid_at is not None
+        assert StripeEvent.objects.get().processed_at is not None
+
+    def test_order_matched_by_metadata(self, order_with_items):
+        """Тест поиска заказа по metadata, если ID интента еще не сохранен."""
+        payload = make_event(
+            "evt_1",
+            "payment_intent.succeeded",
+            {"id": "pi_new", "metadata": {"order_id": str(order_with_items.id)}},
+        )
+        record_event(payload, sign(payload))
+
+        drain_inbox()
+
+        order_with_items.refresh_from_db()
+        assert order_with_items.status == Order.STATUS_PAID
+
+    def test_failed_payment_does_not_override_paid(self, order):
+        """Тест что поздняя ошибка оплаты не отменяет успешную."""
+        deliver("evt_1", "payment_intent.succeeded", order)
+        deliver("evt_2", "payment_intent.payment_failed", order)
+
+        drain_inbox()
+
+        order.refresh_from_db()
+        assert order.status == Order.STATUS_PAID
+
+    def test_failed_payment_marks_failed(self, order):
+        """Тест отметки неудачной оплаты."""
+        deliver("evt_1", "payment_intent.payment_failed", order)
+
+        drain_inbox()
+
+        order.refresh_from_db()
+        assert order.status == Order.STATUS_FAILED
+
+    def test_canceled_intent_forgotten(self, order):
+        """Тест что client_secret отмененного Intent больше не выдается."""
+        Order.objects.filter(pk=order.pk).update(
+            payment_intent_client_secret="pi_test_secret", payment_intent_amount=100
+        )
+        deliver("evt_1", "payment_intent.canceled", order)
+
+        drain_inbox()
+
+        order.refresh_from_db()
+        assert order.payment_intent_id == "pi_test_123"
+        assert order.payment_intent_client_secret == ""
+        assert order.payment_intent_amount is None
+
+    def test_full_refund(self, order):
+        """Тест отметки возврата и устойчивости к повтору успеха."""
+        deliver("evt_1", "payment_intent.succeeded", order)
+        payload = make_event(
+            "evt_2",
+            "charge.refunded",
+            {"id": "ch_1", "payment_intent": order.payment_intent_id, "refunded": True},
+        )
+        record_event(payload, sign(payload))
+        drain_inbox()
+
+        replay_events(StripeEvent.objects.filter(event_id="evt_1"))
+        drain_inbox()
+
+        order.refresh_from_db()
+        assert order.status == Order.STATUS_REFUNDED
+
+    def test_refund_matched_by_metadata(self, order_with_items):
+        """Тест возврата заказа, в котором ID интента не сохранен."""
+        metadata = {"order_id": str(order_with_items.id)}
+        for event_id, event_type, obj in [
+            (
+                "evt_1",
+                "payment_intent.succeeded",
+                {"id": "pi_new", "metadata": metadata},
+            ),
+            (
+                "evt_2",
+                "charge.refunded",
+                {
+                    "id": "ch_1",
+                    "payment_intent": "pi_new",
+                    "refunded": True,
+                    "metadata": metadata,
+                },
+            ),
+        ]:
+            payload = make_event(event_id, event_type, obj)
+            record_event(payload, sign(payload))
+
+        drain_inbox()
+
+        order_with_items.refresh_from_db()
+        assert order_with_items.payment_intent_id == ""
+        assert order_with_items.status == Order.STATUS_REFUNDED
+
+    def test_unknown_type_processed(self):
+        """Тест что события других типов помечаются обработанными."""
+        payload = make_event("evt_1", "customer.created", {"id": "cus_1"})
+        record_event(payload, sign(payload))
+
+        assert drain_inbox().processed == 1
+
+    def test_batches_and_bounded_queries(self, order, django_assert_max_num_queries):
+        """Тест обработки пакетами с постоянным числом запросов на пакет."""
+        for index in range(5):
+            deliver(f"evt_{index}", "payment_intent.succeeded", order)
+
+        with django_assert_max_num_queries(2 + 5 * 4):
+            first = drain_batch(batch_size=3)
+        second = drain_batch(batch_size=3, after_id=first.last_id)
+
+        assert (first.processed, second.processed) == (3, 2)
+        assert not StripeEvent.objects.filter(processed_at__isnull=True).exists()
+
+    def test_handler_error_recorded_and_retried(self, order, mocker):
+        """Тест что ошибка сохраняется, а событие повторяется позже."""
+        deliver("evt_1", "payment_intent.succeeded", order)
+        deliver("evt_2", "payment_intent.payment_failed", order)
+        mocker.patch.dict(
+            "payments.webhooks.EVENT_HANDLERS",
+            {"payment_intent.succeeded": mocker.Mock(side_effect=RuntimeError("db"))},
+        )
+
+        result = drain_inbox()
+
+        assert (result.processed, result.failed) == (1, 1)
+        failed = StripeEvent.objects.get(event_id="evt_1")
+        assert failed.attempts == 1
+        assert "RuntimeError" in failed.last_error
+        assert registry.counter("webhooks.failed") == 1
+
+    def test_attempts_are_bounded(self, order, mocker):
+        """Тест что событие перестает обрабатываться после лимита попыток."""
+        deliver("evt_1", "payment_intent.succeeded", order)
+        handler = mocker.Mock(side_effect=RuntimeError("db"))
+        mocker.patch.dict(
+            "payments.webhooks.EVENT_HANDLERS", {"payment_intent.succeeded": handler}
+        )
+
+        for _ in range(5):
+            drain_inbox()
+
+        assert handler.call_count == 3
+        assert StripeEvent.objects.get().attempts == 3
+
+
+@pytest.mark.django_db
+class TestWebhookCommands:
+    """Тесты команд drain_webhooks и replay_webhooks."""
+
+    def test_drain_command(self, order):
+        """Тест однократного разбора очереди."""
+        deliver("evt_1", "payment_intent.succeeded", order)
+        out = StringIO()
+
+        call_command("drain_webhooks", stdout=out)
+
+        assert "Обработано событий: 1" in out.getvalue()
+        order.refresh_from_db()
+        assert order.status == Order.STATUS_PAID
+
+    def test_replay_requires_filter(self):
+        """Тест что повтор без фильтра требует --all."""
+        with pytest.raises(CommandError):
+            call_command("replay_webhooks", stdout=StringIO())
+
+    def test_replay_by_id_and_drain(self, order):
+        """Тест повтора выбранного события с немедленной обработкой."""
+        deliver("evt_1", "payment_intent.succeeded", order)
+        drain_inbox()
+        Order.objects.filter(pk=order.pk).update(status=Order.STATUS_PENDING)
+        out = StringIO()
+
+        call_command("replay_webhooks", "--event-id", "evt_1", "--drain", stdout=out)
+
+        assert "Возвращено в очередь: 1" in out.getvalue()
+        order.refresh_from_db()
+        assert order.status == Order.STATUS_PAID
+
+    def test_replay_filters(self, order):
+        """Тест фильтров по типу, дате и ошибке."""
+        deliver("evt_1", "payment_intent.succeeded", order)
+        deliver("evt_2", "payment_intent.payment_failed", order)
+        drain_inbox()
+        StripeEvent.objects.filter(event_id="evt_2").update(last_error="boom")
+        out = StringIO()
+
+        call_command(
+            "replay_webhooks",
+            "--type",
+            "payment_intent.payment_failed",
+            "--since",
+            "2000-01-01",
+            "--failed",
+            stdout=out,
+        )
+
+        assert "Возвращено в очередь: 1" in out.getvalue()
+        assert StripeEvent.objects.get(processed_at__isnull=True).event_id == "evt_2"
+
+    def test_replay_invalid_date(self):
+        """Тест ошибки для некорректной даты."""
+        with pytest.raises(CommandError):
+            call_command("replay_webhooks", "--since", "yesterday", stdout=StringIO())
+
+
+@pytest.mark.django_db
+class TestStripeEventAdmin:
+    """Тесты админки очереди событий."""
+
+    def test_changelist_and_replay_action(self, admin_client, order):
+        """Тест списка событий и действия повторной обработки."""
+        deliver("evt_1", "payment_intent.succeeded", order)
+        drain_inbox()
+        event = StripeEvent.objects.get()
+
+        response = admin_client.get(reverse("admin:payments_stripeevent_changelist"))
+        assert response.status_code == 200
+        assert b"evt_1" in response.content
+
+        response = admin_client.post(
+            reverse("admin:payments_stripeevent_changelist"),
+            {"action": "replay", "_selected_action": [event.pk]},
+        )
+
+        assert response.status_code == 302
+        event.refresh_from_db()
+        assert event.processed_at is None
@@ -0,0 +1,155 @@
+"""Хранимые итоги заказов: пересчет, backfill и проверка согласованности."""
+
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import F, QuerySet
+
+from .models import Order, OrderItem
+from .pricing import OrderPricing
+from .rates import get_rate_table
+
+# Поля Order, в которых хранятся рассчитанные суммы
+TOTAL_FIELDS = ("subtotal", "discount_amount", "tax_amount", "total")
+
+# Поля, обновляемые при пересчете: суммы и версия курсов, по которой они получены
+STORED_FIELDS = (*TOTAL_FIELDS, "rate_version")
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def totals_from_pricing(pricing: OrderPricing) -> dict[str, int]:
+    """Возвращает значения хранимых полей по разбивке стоимости."""
+    return {
+        "subtotal": pricing.subtotal,
+        "discount_amount": pricing.discount_amount,
+        "tax_amount": pricing.tax_amount,
+        "total": pricing.total,
+    }
+
+
+def stored_totals(order: Order) -> dict[str, int]:
+    """Возвращает суммы, сохраненные в заказе."""
+    return {field: getattr(order, field) for field in TOTAL_FIELDS}
+
+
+def apply_pricing(order: Order) -> bool:
+    """Записывает рассчитанные суммы и версию курсов в поля заказа.
+
+    Возвращает True, если хотя бы одно значение изменилось.
+    """
+    pricing = order.pricing
+    totals = totals_from_pricing(pricing)
+    changed = (
+        totals != stored_totals(order) or order.rate_version != pricing.rate_version
+    )
+    for field, value in totals.items():
+        setattr(order, field, value)
+    order.rate_version = pricing.rate_version
+    return changed
+
+
+def recalculate_order_totals(order: Order) -> None:
+    """Пересчитывает и сохраняет итоги одного заказа.
+
+    Строка заказа блокируется на время пересчета, поэтому параллельные
+    изменения позиций не перезапишут итоги устаревшими значениями.
+    Итоги оплаченного или возвращенного заказа не меняются.
+    """
+    with transaction.atomic():
+        locked = Order.objects.select_for_update().filter(pk=order.pk).unsettled()
+        if not locked.exists():
+            return
+        order.invalidate_pricing()
+        apply_pricing(order)
+        Order.objects.filter(pk=order.pk).update(
+            rate_version=order.rate_version, **stored_totals(order)
+        )
+
+
+def _pricing_queryset(orders: QuerySet[Order]) -> QuerySet[Order]:
+    """Добавляет к выборке заказов все данные, нужные для расчета."""
+    return (
+        orders.select_related("discount", "tax")
+        .prefetch_related("order_items__item")
+        .order_by("pk")
+    )
+
+
+def recalculate_totals(
+    orders: QuerySet[Order], batch_size: int = DEFAULT_BATCH_SIZE
+) -> int:
+    """Пересчитывает итоги неоплаченных заказов из набора пакетами.
+
+    Оплаченные и возвращенные заказы пропускаются: их итоги равны сумме,
+    списанной Stripe, и не должны меняться вслед за ценами и курсами.
+    Каждый пакет пересчитывается и сохраняется в своей транзакции,
+    а его строки заблокированы только до ее завершения, поэтому долгий
+    пересчет не держит блокировки всех заказов сразу.
+
+    Возвращает количество заказов, у которых изменились суммы.
+    """
+    orders = orders.unsettled()
+    updated = 0
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                _pricing_queryset(orders.filter(pk__gt=last_pk)).select_for_update(
+                    of=("self",)
+                )[:batch_size]
+            )
+            changed = [order for order in batch if apply_pricing(order)]
+            Order.objects.bulk_update(changed, STORED_FIELDS)
+        updated += len(changed)
+        if len(batch) < batch_size:
+            return updated
+        last_pk = batch[-1].pk
+
+
+@dataclass(frozen=True)
+class TotalsMismatch:
+    """Расхождение между сохраненными и рассчитанными итогами заказа."""
+
+    order_id: int
+    stored: dict[str, int]
+    expected: dict[str, int]
+
+
+def find_inconsistent_totals(
+    orders: QuerySet[Order], batch_size: int = DEFAULT_BATCH_SIZE
+) -> Iterator[TotalsMismatch]:
+    """Находит заказы, у которых сохраненные итоги устарели."""
+    for order in _pricing_queryset(orders).iterator(chunk_size=batch_size):
+        expected = totals_from_pricing(order.pricing)
+        stored = stored_totals(order)
+        if expected != stored:
+            yield TotalsMismatch(order_id=order.pk, stored=stored, expected=expected)
+
+
+def reprice_for_current_rates(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Пересчитывает заказы с конвертацией валют, рассчитанные по старым курсам.
+
+    Заказы, где все товары в валюте оплаты, от курсов не зависят
+    и не пересчитываются. Оплаченные и возвращенные заказы сохраняют
+    сумму и версию курсов, по которым прошел платеж.
+    """
+    version = get_rate_table().version
+    cross_currency = OrderItem.objects.exclude(
+        item__currency=F("order__payment_currency")
+    ).values("order_id")
+    orders = (
+        Order.objects.unsettled()
+        .filter(pk__in=cross_currency)
+        .exclude(rate_version=version)
+    )
+    return recalculate_totals(orders, batch_size=batch_size)
+
+
+def recalculate_orders_by_id(order_ids: Iterable[int]) -> int:
+    """Пересчитывает итоги неоплаченных заказов по списку ID."""
+    order_ids = list(order_ids)
+    if not order_ids:
+        return 0
+    return recalculate_totals(Order.objects.unsettled().filter(pk__in=order_ids))
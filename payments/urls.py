@@ -6,12 +6,18 @@ app_name = "payments"
 
 urlpatterns = [
     path("", views.index, name="index"),
+    path("api/items/", views.catalog_api, name="catalog_api"),
     path("order/<int:id>/", views.order_detail, name="order_detail"),
     path(
         "buy-order/<int:id>/",
         views.create_order_checkout_session,
         name="create_order_checkout_session",
     ),
+    path(
+        "buy-order/<int:id>/async/",
+        views.create_order_checkout_session_async,
+        name="create_order_checkout_session_async",
+    ),
     path("cart/", views.view_cart, name="view_cart"),
     path("cart/add/<int:id>/", views.add_to_cart, name="add_to_cart"),
     path("cart/remove/<int:id>/", views.remove_from_cart, name="remove_from_cart"),
@@ -28,4 +34,6 @@ urlpatterns = [
     ),
     path("cart/checkout/", views.create_order_from_cart, name="checkout_cart"),
     path("success/", views.success, name="success"),
+    path("stripe/webhook/", views.stripe_webhook, name="stripe_webhook"),
+    path("metrics/", views.process_metrics, name="process_metrics"),
 ]
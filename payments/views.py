@@ -1,117 +1,241 @@
+import hashlib
 from typing import Any
 
 import stripe
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import router
+from django.http import (
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.views.decorators.csrf import csrf_exempt
-
-from .models import Item, Order
-
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from django.views.decorators.http import condition, require_POST
+
+from .cart import DEFAULT_CURRENCY, create_order, get_cart_currency, load_cart
+from .cart_store import get_cart_store
+from .catalog import (
+    CATALOG_API_FIELDS,
+    as_json_array,
+    as_ndjson,
+    item_exists,
+    stream_catalog,
+)
+from .coupons import get_coupon_registry
+from .db_pool import pool_stats
+from .metrics import registry
+from .models import CatalogRevision, Item, Order
+from .pagination import DEFAULT_SORT, SORTS, InvalidCursor, decode_cursor
+from .payment_intents import (
+    OrderAlreadyPaid,
+    aensure_payment_intent,
+    ensure_payment_intent,
+)
+from .pricing import price_cart
+from .storefront import get_storefront_cache
+from .stripe_calls import StripeUnavailable
+from .webhooks import InvalidWebhook, record_event
 
 
 def index(request: HttpRequest) -> HttpResponse:
-    """Отображает главную страницу со списком товаров."""
-    items = Item.objects.all()
+    """Отображает главную страницу со страницей каталога.
+
+    В общем кеше хранится только фрагмент каталога: шапка с корзиной
+    и ссылкой для персонала рендерится для каждой сессии, поэтому
+    страница целиком не кешируется ни nginx, ни браузером.
+    """
+    sort = request.GET.get("sort", DEFAULT_SORT)
+    if sort not in SORTS:
+        sort = DEFAULT_SORT
+    cursor = request.GET.get("cursor") or None
+    if cursor is not None:
+        try:
+            decode_cursor(cursor, sort)
+        except InvalidCursor:
+            # Устаревшая или поврежденная ссылка: показываем первую страницу
+            cursor = None
+
     context: dict[str, Any] = {
-        "items": items,
+        "items_html": get_storefront_cache().get(sort, cursor),
+        "cart_count": get_cart_store().count(request),
     }
-    return render(request, "payments/index.html", context)
+    response = render(request, "payments/index.html", context)
+    # Шапка зависит от корзины и пользователя из сессии
+    patch_cache_control(response, private=True, max_age=0)
+    patch_vary_headers(response, ("Cookie",))
+    return response
+
+
+def _catalog_api_params(request: HttpRequest) -> tuple[str, str, tuple[str, ...]]:
+    """Разбирает формат, сортировку и список полей запроса к API каталога."""
+    output_format = request.GET.get("format", "ndjson")
+    sort = request.GET.get("sort", DEFAULT_SORT)
+    fields_param = request.GET.get("fields")
+    fields = (
+        tuple(field.strip() for field in fields_param.split(",") if field.strip())
+        if fields_param
+        else CATALOG_API_FIELDS
+    )
+    return output_format, sort, fields
+
+
+def _catalog_etag(request: HttpRequest) -> str:
+    """ETag ответа API каталога: ревизия каталога в БД и параметры запроса.
+
+    Версия каталога из кеша не подходит: она своя у каждого процесса
+    с локальным кешем и обнуляется при его очистке.
+    """
+    output_format, sort, fields = _catalog_api_params(request)
+    params = hashlib.md5(
+        f"{output_format}|{sort}|{','.join(fields)}".encode(), usedforsecurity=False
+    ).hexdigest()[:12]
+    return f"{CatalogRevision.objects.current()}-{params}"
+
+
+@condition(etag_func=_catalog_etag)
+def catalog_api(request: HttpRequest) -> HttpResponse:
+    """Отдает каталог товаров потоком в формате NDJSON или JSON.
+
+    Параметры: format=ndjson|json, fields=id,name,... и sort (как на главной).
+    Товары читаются серверным курсором пачками, поэтому память воркера
+    не зависит от размера каталога.
+    """
+    output_format, sort, fields = _catalog_api_params(request)
+    if output_format not in ("ndjson", "json"):
+        return JsonResponse(
+            {"error": f"Неизвестный формат: {output_format}"}, status=400
+        )
+    if sort not in SORTS:
+        return JsonResponse({"error": f"Неизвестная сортировка: {sort}"}, status=400)
+    unknown = [field for field in fields if field not in CATALOG_API_FIELDS]
+    if unknown or not fields:
+        return JsonResponse(
+            {"error": f"Недопустимые поля: {', '.join(unknown)}"}, status=400
+        )
+
+    # Алиас выбирается сейчас: тело ответа читается после middleware,
+    # которое к тому времени уже сбросило маршрутизацию на реплики.
+    using = router.db_for_read(Item)
+    rows = stream_catalog(fields, sort, settings.CATALOG_STREAM_CHUNK_SIZE, using=using)
+    if output_format == "json":
+        return StreamingHttpResponse(
+            as_json_array(rows), content_type="application/json"
+        )
+    return StreamingHttpResponse(as_ndjson(rows), content_type="application/x-ndjson")
 
 
 def order_detail(request: HttpRequest, id: int) -> HttpResponse:
     """Отображает страницу заказа с Payment Intent формой."""
-    order = get_object_or_404(Order, pk=id)
+    order = get_object_or_404(Order.objects.select_related("discount", "tax"), pk=id)
+    checkout_view = (
+        "payments:create_order_checkout_session_async"
+        if settings.CHECKOUT_ASYNC
+        else "payments:create_order_checkout_session"
+    )
     context: dict[str, Any] = {
         "order": order,
         "stripe_public_key": settings.STRIPE_PUBLIC_KEY,
+        "checkout_url": reverse(checkout_view, args=[order.id]),
     }
     return render(request, "payments/order_detail.html", context)
 
 
+def _stripe_unavailable_response(error: StripeUnavailable) -> JsonResponse:
+    """Ответ 503, когда Stripe недоступен или не уложился в бюджет времени."""
+    response = JsonResponse({"error": str(error)}, status=503)
+    response["Retry-After"] = error.retry_after_header
+    return response
+
+
 @csrf_exempt
 def create_order_checkout_session(
     request: HttpRequest,  # noqa: ARG001
     id: int,  # noqa: A002
 ) -> JsonResponse:
-    """Создает Stripe Payment Intent для покупки заказа."""
-    order = get_object_or_404(Order, pk=id)
+    """Возвращает client_secret Stripe Payment Intent для оплаты заказа."""
+    order = get_object_or_404(Order.objects.select_related("discount", "tax"), pk=id)
 
     try:
-        # Получаем детальный breakdown из модели
-        subtotal = order.get_subtotal()
-        discount_amount = order.get_discount_amount()
-        tax_amount = order.get_tax_amount()
-        total_amount = order.get_total_price()
-        currency = order.get_currency()
-
-        # Детальный metadata для Stripe Dashboard
-        metadata: dict[str, Any] = {
-            "order_id": order.id,
-            "items_count": order.items.count(),
-            "subtotal": subtotal,
-            "discount_percent": (
-                float(order.discount.percent) if order.discount else 0
-            ),
-            "discount_amount": discount_amount,
-            "tax_percent": float(order.tax.percent) if order.tax else 0,
-            "tax_amount": tax_amount,
-            "total": total_amount,
-            "currency": currency,
-        }
-
-        payment_intent_params: dict[str, Any] = {
-            "amount": total_amount,
-            "currency": currency,
-            "metadata": metadata,
-            "automatic_payment_methods": {"enabled": True},
-        }
-
-        # Детальное описание
-        description_parts = [f"Заказ #{order.id}"]
-        if order.discount:
-            discount_text = (
-                f"Скидка: {order.discount.percent}% (-{order.get_display_discount()})"
-            )
-            description_parts.append(discount_text)
-        if order.tax:
-            tax_text = f"Налог: {order.tax.percent}% (+{order.get_display_tax()})"
-            description_parts.append(tax_text)
-        payment_intent_params["description"] = " | ".join(description_parts)
-
-        payment_intent = stripe.PaymentIntent.create(**payment_intent_params)
-        return JsonResponse({"clientSecret": payment_intent.client_secret})
-    except Exception as e:
+        client_secret = ensure_payment_intent(order, order.pricing)
+    except OrderAlreadyPaid as e:
+        return JsonResponse({"error": str(e)}, status=409)
+    except StripeUnavailable as e:
+        return _stripe_unavailable_response(e)
+    except stripe.StripeError as e:
         return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"clientSecret": client_secret})
 
 
-def create_stripe_coupon(name: str, percent: float) -> str:
-    """Создает купон в Stripe и возвращает его ID."""
+@csrf_exempt
+async def create_order_checkout_session_async(
+    request: HttpRequest,  # noqa: ARG001
+    id: int,  # noqa: A002
+) -> JsonResponse:
+    """Асинхронная версия create_order_checkout_session для ASGI.
+
+    Заказ с позициями загружается асинхронным ORM, а запрос к Stripe
+    выполняется асинхронным HTTP-клиентом библиотеки stripe, поэтому
+    ожидание ответа Stripe не занимает поток воркера.
+    """
+    queryset = Order.objects.select_related("discount", "tax").prefetch_related(
+        "order_items__item"
+    )
     try:
-        coupon = stripe.Coupon.create(
-            name=name,
-            percent_off=float(percent),
-            duration="once",
-        )
-        return coupon.id
-    except Exception:
-        # Если купон уже существует, создаем с уникальным именем
-        import time
-
-        coupon = stripe.Coupon.create(
-            name=f"{name}_{int(time.time())}",
-            percent_off=float(percent),
-            duration="once",
-        )
-        return coupon.id
+        order = await queryset.aget(pk=id)
+    except Order.DoesNotExist as error:
+        raise Http404("Заказ не найден") from error
+
+    # Позиции уже загружены, но курсы могут потребовать запроса к БД
+    pricing = await sync_to_async(lambda: order.pricing)()
+    try:
+        client_secret = await aensure_payment_intent(order, pricing)
+    except OrderAlreadyPaid as e:
+        return JsonResponse({"error": str(e)}, status=409)
+    except StripeUnavailable as e:
+        return _stripe_unavailable_response(e)
+    except stripe.StripeError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"clientSecret": client_secret})
+
+
+def create_stripe_coupon(name: str, percent: float, duration: str = "once") -> str:
+    """Возвращает ID купона Stripe для скидки, создавая его при первом вызове."""
+    return get_coupon_registry().get(percent, duration, name=name)
+
+
+@csrf_exempt
+@require_POST
+def stripe_webhook(request: HttpRequest) -> JsonResponse:
+    """Принимает webhook Stripe и сохраняет событие во входящую очередь.
+
+    Заказы здесь не обновляются: очередь разбирает drain_webhooks,
+    поэтому ответ Stripe не зависит от нагрузки на обработку.
+    """
+    try:
+        record_event(request.body, request.headers.get("Stripe-Signature", ""))
+    except InvalidWebhook as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"received": True})
+
+
+@staff_member_required
+def process_metrics(request: HttpRequest) -> JsonResponse:  # noqa: ARG001
+    """Отдает метрики текущего воркера в JSON (только для персонала)."""
+    return JsonResponse({**registry.snapshot(), "db_pools": pool_stats()})
 
 
 def success(request: HttpRequest) -> HttpResponse:
     """Отображает страницу успешной оплаты."""
     # Очищаем корзину после успешной оплаты
     if "pending_order_id" in request.session:
-        request.session["cart"] = {}
+        get_cart_store().clear(request)
         del request.session["pending_order_id"]
 
     return render(request, "payments/success.html")
@@ -119,84 +243,39 @@ def success(request: HttpRequest) -> HttpResponse:
 
 # Cart Views
 
-# Фиксированный курс конвертации (EUR к USD)
-EUR_TO_USD_RATE = 1.1
-
 
-def convert_to_base_currency(price: int, currency: str, base_currency: str) -> int:
-    """Конвертирует цену в базовую валюту."""
-    if currency == base_currency:
-        return price
-
-    if base_currency == "usd" and currency == "eur":
-        return int(price * EUR_TO_USD_RATE)
-    elif base_currency == "eur" and currency == "usd":
-        return int(price / EUR_TO_USD_RATE)
-
-    return price
+def _ensure_item_exists(id: int) -> None:  # noqa: A002
+    """Проверяет существование товара по индексу каталога, иначе 404."""
+    if not item_exists(id):
+        raise Http404("Товар не найден")
 
 
 def add_to_cart(request: HttpRequest, id: int) -> HttpResponse:
     """Добавляет товар в корзину."""
-    get_object_or_404(Item, pk=id)  # Проверяем существование товара
-
-    cart = request.session.get("cart", {})
-    item_id = str(id)
-
-    if item_id in cart:
-        cart[item_id]["quantity"] += 1
-    else:
-        cart[item_id] = {"quantity": 1}
-
-    request.session["cart"] = cart
+    _ensure_item_exists(id)
+    get_cart_store().add(request, id)
     return redirect("payments:index")
 
 
 def view_cart(request: HttpRequest) -> HttpResponse:
     """Отображает содержимое корзины."""
-    cart = request.session.get("cart", {})
-    cart_items = []
-    total = 0
-
-    # Получаем выбранную валюту из сессии
-    selected_currency = request.session.get("payment_currency")
-
-    # Определяем базовую валюту (первый товар)
-    base_currency = None
-    for item_id in cart:
-        item = Item.objects.get(pk=int(item_id))
-        base_currency = item.currency
-        break
-
-    # Используем выбранную валюту или базовую
-    display_currency = selected_currency if selected_currency else base_currency
-
-    for item_id, data in cart.items():
-        item = Item.objects.get(pk=int(item_id))
-        quantity = data["quantity"]
-
-        # Конвертируем цену в выбранную валюту
-        converted_price = convert_to_base_currency(
-            item.price, item.currency, display_currency or "usd"
-        )
-        subtotal = converted_price * quantity
+    entries, _ = load_cart(request)
+    pricing = price_cart(entries, get_cart_currency(request, entries))
 
-        cart_items.append(
+    context: dict[str, Any] = {
+        "cart_items": [
             {
-                "item": item,
-                "quantity": quantity,
-                "subtotal": subtotal,
-                "original_currency": item.currency,
-                "converted": item.currency != display_currency,
+                "item": line.item,
+                "quantity": line.quantity,
+                "subtotal": line.total,
+                "original_currency": line.item.currency,
+                "converted": line.converted,
             }
-        )
-        total += subtotal
-
-    context: dict[str, Any] = {
-        "cart_items": cart_items,
-        "total": total,
-        "currency": display_currency or "usd",
-        "cart_count": sum(data["quantity"] for data in cart.values()),
+            for line in pricing.lines
+        ],
+        "total": pricing.total,
+        "currency": pricing.currency,
+        "cart_count": pricing.items_count,
     }
     return render(request, "payments/cart.html", context)
 
@@ -210,64 +289,44 @@ def change_currency(request: HttpRequest, currency: str) -> HttpResponse:
 
 def remove_from_cart(request: HttpRequest, id: int) -> HttpResponse:
     """Удаляет товар из корзины."""
-    cart = request.session.get("cart", {})
-    item_id = str(id)
-
-    if item_id in cart:
-        del cart[item_id]
-
-    request.session["cart"] = cart
+    get_cart_store().remove(request, id)
     return redirect("payments:view_cart")
 
 
 def buy_now(request: HttpRequest, id: int) -> HttpResponse:
     """Добавляет товар в корзину и сразу переходит к оформлению."""
-    get_object_or_404(Item, pk=id)
+    _ensure_item_exists(id)
 
     # Очищаем корзину и добавляем только этот товар
-    request.session["cart"] = {str(id): {"quantity": 1}}
+    get_cart_store().replace(request, {id: 1})
 
     return redirect("payments:view_cart")
 
 
 def update_cart_quantity(request: HttpRequest, id: int, action: str) -> HttpResponse:
     """Изменяет количество товара в корзине."""
-    cart = request.session.get("cart", {})
-    item_id = str(id)
-
-    if item_id in cart:
-        if action == "increase":
-            cart[item_id]["quantity"] += 1
-        elif action == "decrease":
-            cart[item_id]["quantity"] -= 1
-            if cart[item_id]["quantity"] <= 0:
-                del cart[item_id]
-
-    request.session["cart"] = cart
+    if action == "increase":
+        get_cart_store().change(request, id, 1)
+    elif action == "decrease":
+        get_cart_store().change(request, id, -1)
     return redirect("payments:view_cart")
 
 
 def create_order_from_cart(request: HttpRequest) -> HttpResponse:
     """Создает заказ из корзины и редиректит на оплату."""
-    cart = request.session.get("cart", {})
+    entries, removed = load_cart(request)
+
+    # Если часть товаров пропала из каталога, показываем обновленную корзину
+    if removed:
+        return redirect("payments:view_cart")
 
-    if not cart:
+    if not entries:
         return redirect("payments:index")
 
     # Получаем выбранную валюту оплаты
-    payment_currency = request.session.get("payment_currency", "usd")
-
-    # Создаем заказ с выбранной валютой
-    order = Order.objects.create(payment_currency=payment_currency)
-
-    # Добавляем товары с учетом количества через OrderItem
-    from payments.models import OrderItem
-
-    for item_id, data in cart.items():
-        item = Item.objects.get(pk=int(item_id))
-        quantity = data["quantity"]
+    payment_currency = request.session.get("payment_currency", DEFAULT_CURRENCY)
 
-        OrderItem.objects.create(order=order, item=item, quantity=quantity)
+    order = create_order(entries, payment_currency)
 
     # Сохраняем ID заказа в сессии для очистки корзины после оплаты
     request.session["pending_order_id"] = order.id
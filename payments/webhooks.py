@@ -0,0 +1,227 @@
+"""Webhook Stripe: прием событий во входящую очередь и их обработка.
+
+Endpoint только проверяет подпись и сохраняет событие в StripeEvent,
+поэтому отвечает Stripe за несколько миллисекунд. Заказы обновляются
+командой drain_webhooks, которая разбирает очередь пакетами.
+"""
+
+import json
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any
+
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from .metrics import registry
+from .models import Order, StripeEvent
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+
+
+class InvalidWebhook(ValueError):
+    """Запрос не является корректным подписанным событием Stripe."""
+
+
+def parse_event(payload: bytes, signature: str) -> tuple[str, str]:
+    """Проверяет подпись и возвращает ID и тип события.
+
+    Тело события целиком не разбирается в объекты stripe: для записи
+    в очередь достаточно его ID и типа.
+    """
+    secret = settings.STRIPE_WEBHOOK_SECRET
+    if not secret:
+        raise InvalidWebhook("STRIPE_WEBHOOK_SECRET не задан")
+    try:
+        body = payload.decode("utf-8")
+        stripe.WebhookSignature.verify_header(
+            body, signature, secret, settings.STRIPE_WEBHOOK_TOLERANCE
+        )
+        data = json.loads(body)
+        return data["id"], data["type"]
+    except stripe.SignatureVerificationError as error:
+        raise InvalidWebhook("Некорректная подпись события") from error
+    except (UnicodeDecodeError, ValueError, KeyError, TypeError) as error:
+        raise InvalidWebhook("Некорректное тело события") from error
+
+
+def record_event(payload: bytes, signature: str) -> None:
+    """Сохраняет подписанное событие во входящую очередь.
+
+    Повторная доставка того же события игнорируется на уровне БД
+    (уникальный event_id), поэтому запись выполняется одним INSERT.
+    """
+    event_id, event_type = parse_event(payload, signature)
+    StripeEvent.objects.bulk_create(
+        [StripeEvent(event_id=event_id, type=event_type, payload=payload.decode())],
+        ignore_conflicts=True,
+    )
+    registry.increment("webhooks.received")
+
+
+def _event_time(event: dict[str, Any]) -> datetime:
+    """Время создания события в Stripe."""
+    created = event.get("created")
+    if created is None:
+        return timezone.now()
+    return datetime.fromtimestamp(created, tz=UTC)
+
+
+def _orders_for_intent(
+    intent_id: str, metadata: dict[str, Any] | None
+) -> QuerySet[Order]:
+    """Заказы, к которым относится Payment Intent.
+
+    Заказ ищется по сохраненному ID Intent и по order_id из metadata:
+    ID Intent мог не сохраниться в заказе, если ответ Stripe не дошел.
+    Stripe копирует metadata Intent в его платежи (Charge).
+    """
+    condition = Q(payment_intent_id=intent_id)
+    order_id = str((metadata or {}).get("order_id", ""))
+    if order_id.isdigit():
+        condition |= Q(pk=int(order_id))
+    return Order.objects.filter(condition)
+
+
+def handle_payment_succeeded(event: dict[str, Any]) -> None:
+    """Отмечает заказ оплаченным."""
+    intent = event["data"]["object"]
+    _orders_for_intent(intent["id"], intent.get("metadata")).exclude(
+        status=Order.STATUS_REFUNDED
+    ).update(status=Order.STATUS_PAID, paid_at=_event_time(event))
+
+
+def handle_payment_failed(event: dict[str, Any]) -> None:
+    """Отмечает неудачную попытку оплаты, если заказ еще не оплачен."""
+    intent = event["data"]["object"]
+    _orders_for_intent(intent["id"], intent.get("metadata")).filter(
+        status=Order.STATUS_PENDING
+    ).update(status=Order.STATUS_FAILED)
+
+
+def handle_payment_canceled(event: dict[str, Any]) -> None:
+    """Забывает client_secret отмененного Intent.
+
+    Следующая оплата заказа не вернет его клиенту, а запросит Intent
+    у Stripe и создаст вместо него новый.
+    """
+    intent = event["data"]["object"]
+    Order.objects.filter(payment_intent_id=intent["id"]).update(
+        payment_intent_client_secret="", payment_intent_amount=None
+    )
+
+
+def handle_charge_refunded(event: dict[str, Any]) -> None:
+    """Отмечает заказ возвращенным после полного возврата платежа."""
+    charge = event["data"]["object"]
+    if not charge.get("refunded") or not charge.get("payment_intent"):
+        return
+    _orders_for_intent(charge["payment_intent"], charge.get("metadata")).update(
+        status=Order.STATUS_REFUNDED
+    )
+
+
+EVENT_HANDLERS: dict[str, Callable[[dict[str, Any]], None]] = {
+    "payment_intent.succeeded": handle_payment_succeeded,
+    "payment_intent.payment_failed": handle_payment_failed,
+    "payment_intent.canceled": handle_payment_canceled,
+    "charge.refunded": handle_charge_refunded,
+}
+
+
+def handle_event(event: dict[str, Any]) -> None:
+    """Применяет событие к заказам. События других типов пропускаются."""
+    handler = EVENT_HANDLERS.get(event["type"])
+    if handler is not None:
+        handler(event)
+
+
+def pending_events(max_attempts: int | None = None) -> QuerySet[StripeEvent]:
+    """Необработанные события, у которых остались попытки."""
+    if max_attempts is None:
+        max_attempts = settings.STRIPE_WEBHOOK_MAX_ATTEMPTS
+    return StripeEvent.objects.filter(
+        processed_at__isnull=True, attempts__lt=max_attempts
+    ).order_by("id")
+
+
+@dataclass(frozen=True)
+class DrainResult:
+    """Итог разбора очереди событий."""
+
+    processed: int = 0
+    failed: int = 0
+    # ID последнего просмотренного события
+    last_id: int = 0
+
+    def __add__(self, other: "DrainResult") -> "DrainResult":
+        return DrainResult(
+            processed=self.processed + other.processed,
+            failed=self.failed + other.failed,
+            last_id=max(self.last_id, other.last_id),
+        )
+
+
+def drain_batch(batch_size: int = DEFAULT_BATCH_SIZE, after_id: int = 0) -> DrainResult:
+    """Обрабатывает один пакет событий с ID больше after_id.
+
+    События обрабатываются в порядке получения. Строки пакета блокируются
+    с SKIP LOCKED, поэтому несколько обработчиков могут разбирать очередь
+    параллельно. Ошибка в одном событии откатывает только его изменения
+    и не останавливает пакет.
+    """
+    processed = failed = 0
+    with transaction.atomic():
+        queryset = pending_events().filter(id__gt=after_id)
+        events = list(queryset.select_for_update(skip_locked=True)[:batch_size])
+        now = timezone.now()
+        for event in events:
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    handle_event(json.loads(event.payload))
+            except Exception as error:
+                logger.exception("Не удалось обработать событие %s", event.event_id)
+                event.last_error = repr(error)
+                failed += 1
+            else:
+                event.processed_at = now
+                event.last_error = ""
+                processed += 1
+        StripeEvent.objects.bulk_update(
+            events, ["processed_at", "attempts", "last_error"]
+        )
+    registry.increment("webhooks.processed", processed)
+    registry.increment("webhooks.failed", failed)
+    last_id = events[-1].id if events else after_id
+    return DrainResult(processed=processed, failed=failed, last_id=last_id)
+
+
+def drain_inbox(batch_size: int = DEFAULT_BATCH_SIZE) -> DrainResult:
+    """Разбирает очередь пакетами до конца.
+
+    За один проход каждое событие обрабатывается не больше одного раза:
+    события с ошибкой повторяются при следующем вызове.
+    """
+    result = DrainResult()
+    while True:
+        batch = drain_batch(batch_size, after_id=result.last_id)
+        result += batch
+        if batch.processed + batch.failed < batch_size:
+            return result
+
+
+def replay_events(events: QuerySet[StripeEvent]) -> int:
+    """Возвращает события в очередь для повторной обработки.
+
+    Обработчики идемпотентны, поэтому повтор уже примененного события
+    не меняет заказ.
+    """
+    return events.update(processed_at=None, attempts=0, last_error="")
@@ -51,7 +51,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "payments.middleware.ReplicaPinMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "payments.middleware.CartCookieMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -75,9 +77,13 @@ if not DEBUG:
 
     # CSRF trusted origins for non-standard ports
     CSRF_TRUSTED_ORIGINS = [
-        f"https://{host}:8443" for host in ALLOWED_HOSTS if host not in ["localhost", "127.0.0.1"]
+        f"https://{host}:8443"
+        for host in ALLOWED_HOSTS
+        if host not in ["localhost", "127.0.0.1"]
     ] + [
-        f"https://{host}" for host in ALLOWED_HOSTS if host not in ["localhost", "127.0.0.1"]
+        f"https://{host}"
+        for host in ALLOWED_HOSTS
+        if host not in ["localhost", "127.0.0.1"]
     ]
 
 ROOT_URLCONF = "stripe_payment.urls"
@@ -111,9 +117,54 @@ DATABASES = {
         "PASSWORD": os.getenv("DB_PASSWORD", ""),
         "HOST": os.getenv("DB_HOST", "localhost"),
         "PORT": os.getenv("DB_PORT", "5433"),
+        # Проверка соединения из пула перед выдачей запросу
+        "CONN_HEALTH_CHECKS": os.getenv("DB_POOL_HEALTH_CHECK", "True") == "True",
     }
 }
 
+# Пул соединений psycopg в каждом воркере. Размер считается на процесс:
+# воркеры gunicorn * DB_POOL_MAX_SIZE вместе с остальными процессами
+# должны помещаться в max_connections Postgres. Время — в секундах
+if os.getenv("DB_POOL", "True") == "True":
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "4")),
+            "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+            "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+            # Сколько запрос ждет свободное соединение, прежде чем получить ошибку
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        }
+    }
+# Сколько секунд воркер при старте ждет открытия DB_POOL_MIN_SIZE соединений
+DB_POOL_WARMUP_TIMEOUT = float(os.getenv("DB_POOL_WARMUP_TIMEOUT", "10"))
+
+# Реплики Postgres только для чтения (хосты через запятую): безопасные
+# запросы читают с них, записи и запросы после записи идут в default
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+    filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(",")), start=1
+):
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        "PORT": os.getenv("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica{number}")
+
+DATABASE_ROUTERS = ["payments.db_router.ReplicaRouter"]
+# Отставание реплики в секундах, после которого чтения уходят в default
+DATABASE_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+# Как часто воркер проверяет отставание каждой реплики
+DATABASE_REPLICA_LAG_CHECK_INTERVAL = float(
+    os.getenv("DB_REPLICA_LAG_CHECK_INTERVAL", "2")
+)
+# Сколько секунд после записи запросы клиента читают из default. Должно быть
+# больше DATABASE_REPLICA_MAX_LAG + DATABASE_REPLICA_LAG_CHECK_INTERVAL
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv("DB_REPLICA_PIN_SECONDS", "10"))
+DATABASE_REPLICA_PIN_COOKIE = "db_primary"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -160,6 +211,97 @@ MEDIA_ROOT = BASE_DIR / "mediafiles"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Sessions
+# Компактный двоичный формат сессий; сессии в JSON читаются без миграции
+SESSION_SERIALIZER = "payments.sessions.CompactSessionSerializer"
+
+# Cache
+# Общий кеш воркеров. По умолчанию кеш в памяти процесса, он подходит только
+# для одного процесса: gunicorn с несколькими воркерами не стартует с ним
+# (см. gunicorn.conf.py). В docker-compose.prod.yml задан RedisCache
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+# Индекс ID товаров в памяти воркера: максимальный возраст в секундах,
+# после которого индекс перечитывается даже без смены версии каталога
+CATALOG_INDEX_MAX_AGE = int(os.getenv("CATALOG_INDEX_MAX_AGE", "60"))
+
+# Главная страница: сколько секунд список товаров хранится в кеше
+STOREFRONT_CACHE_TIMEOUT = int(os.getenv("STOREFRONT_CACHE_TIMEOUT", "300"))
+# Количество товаров на странице каталога
+CATALOG_PAGE_SIZE = int(os.getenv("CATALOG_PAGE_SIZE", "50"))
+# Размер пачки серверного курсора при потоковой выдаче API каталога
+CATALOG_STREAM_CHUNK_SIZE = int(os.getenv("CATALOG_STREAM_CHUNK_SIZE", "2000"))
+
+# Корзина
+# Хранилище строк корзины: payments.cart_store.SessionCartStore (в сессии),
+# payments.cart_store.CacheCartStore (в кеше CART_CACHE_ALIAS, для нескольких
+# серверов нужен общий бэкенд) или payments.cart_store.DatabaseCartStore
+# (таблица CartLine). По умолчанию корзина хранится в кеше, если он общий
+# для воркеров, а при кеше в памяти процесса — в сессии
+CART_CACHE_ALIAS = os.getenv("CART_CACHE_ALIAS", "default")
+CART_STORE = os.getenv(
+    "CART_STORE",
+    "payments.cart_store.SessionCartStore"
+    if CACHES.get(CART_CACHE_ALIAS, {}).get("BACKEND")
+    in (
+        "django.core.cache.backends.locmem.LocMemCache",
+        "django.core.cache.backends.dummy.DummyCache",
+    )
+    else "payments.cart_store.CacheCartStore",
+)
+# Сколько секунд хранится корзина после последнего изменения и имя ее cookie
+CART_TTL = int(os.getenv("CART_TTL", str(60 * 60 * 24 * 14)))
+CART_COOKIE_NAME = "cart_id"
+
+# Exchange rates
+# Источник курсов: payments.rates.DatabaseRateProvider (таблица ExchangeRate)
+# или payments.rates.FileRateProvider (JSON-файл EXCHANGE_RATE_FILE)
+EXCHANGE_RATE_PROVIDER = os.getenv(
+    "EXCHANGE_RATE_PROVIDER", "payments.rates.DatabaseRateProvider"
+)
+EXCHANGE_RATE_FILE = os.getenv("EXCHANGE_RATE_FILE", "")
+# Сколько секунд курсы в памяти воркера считаются свежими
+EXCHANGE_RATE_CACHE_TTL = int(os.getenv("EXCHANGE_RATE_CACHE_TTL", "300"))
+# Сколько секунд после TTL отдаются старые курсы, пока идет фоновое обновление
+EXCHANGE_RATE_STALE_TTL = int(os.getenv("EXCHANGE_RATE_STALE_TTL", "3600"))
+# Через сколько секунд после ошибки источника курсов пробовать снова
+EXCHANGE_RATE_ERROR_TTL = int(os.getenv("EXCHANGE_RATE_ERROR_TTL", "10"))
+
 # Stripe settings
 STRIPE_PUBLIC_KEY = os.getenv("STRIPE_PUBLIC_KEY", "")
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY", "")
+# Адрес Stripe API; для нагрузочных тестов — локальный сервер run_fake_stripe
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE", "")
+# Webhook: секрет подписи из Stripe Dashboard и допустимый возраст события
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "")
+STRIPE_WEBHOOK_TOLERANCE = int(os.getenv("STRIPE_WEBHOOK_TOLERANCE", "300"))
+# Сколько раз drain_webhooks пробует обработать событие, прежде чем отложить его
+STRIPE_WEBHOOK_MAX_ATTEMPTS = int(os.getenv("STRIPE_WEBHOOK_MAX_ATTEMPTS", "5"))
+# Пул соединений к Stripe в каждом воркере: таймауты в секундах, размер пула
+# и сколько секунд держать простаивающее keep-alive соединение
+STRIPE_CONNECT_TIMEOUT = float(os.getenv("STRIPE_CONNECT_TIMEOUT", "5"))
+STRIPE_READ_TIMEOUT = float(os.getenv("STRIPE_READ_TIMEOUT", "20"))
+STRIPE_MAX_CONNECTIONS = int(os.getenv("STRIPE_MAX_CONNECTIONS", "10"))
+STRIPE_KEEPALIVE_EXPIRY = float(os.getenv("STRIPE_KEEPALIVE_EXPIRY", "30"))
+# Бюджет времени на вызов Stripe вместе с повторами (меньше таймаута gunicorn)
+STRIPE_DEADLINE = float(os.getenv("STRIPE_DEADLINE", "10"))
+# Повторы при сетевых ошибках, 429 и 5xx: количество и экспоненциальная пауза
+STRIPE_MAX_RETRIES = int(os.getenv("STRIPE_MAX_RETRIES", "2"))
+STRIPE_RETRY_BACKOFF = float(os.getenv("STRIPE_RETRY_BACKOFF", "0.5"))
+STRIPE_RETRY_BACKOFF_MAX = float(os.getenv("STRIPE_RETRY_BACKOFF_MAX", "4"))
+# Circuit breaker: доля ошибок среди последних STRIPE_BREAKER_WINDOW вызовов
+# (не меньше STRIPE_BREAKER_MIN_CALLS), после которой вызовы отклоняются
+# на STRIPE_BREAKER_RESET_TIMEOUT секунд
+STRIPE_BREAKER_FAILURE_RATE = float(os.getenv("STRIPE_BREAKER_FAILURE_RATE", "0.5"))
+STRIPE_BREAKER_WINDOW = int(os.getenv("STRIPE_BREAKER_WINDOW", "20"))
+STRIPE_BREAKER_MIN_CALLS = int(os.getenv("STRIPE_BREAKER_MIN_CALLS", "10"))
+STRIPE_BREAKER_RESET_TIMEOUT = float(os.getenv("STRIPE_BREAKER_RESET_TIMEOUT", "30"))
+# Страница заказа использует асинхронный endpoint оплаты (для запуска под ASGI)
+CHECKOUT_ASYNC = os.getenv("CHECKOUT_ASYNC", "False") == "True"